@@ -3,27 +3,105 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
+import functools
+import hashlib
 import html
+import io
 import json
 import os
+import select
 import shutil
+import signal
+import struct
 import subprocess
 import sys
+import threading
+import time
 import urllib.parse
 import urllib.request
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, Iterable, Iterator, Optional, Union
 
-from PIL import Image, ImageChops, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps, ImageStat
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps, ImageStat
 
 
-MODEL_URLS = {
-    "EDSR_x4.pb": "https://raw.githubusercontent.com/Saafke/EDSR_Tensorflow/master/models/EDSR_x4.pb",
-    "FSRCNN_x4.pb": "https://raw.githubusercontent.com/Saafke/FSRCNN_Tensorflow/master/models/FSRCNN_x4.pb",
-    "FSRCNN_x2.pb": "https://raw.githubusercontent.com/Saafke/FSRCNN_Tensorflow/master/models/FSRCNN_x2.pb",
+@dataclass(frozen=True)
+class SrModel:
+    file: str
+    algo: str  # name passed to DnnSuperResImpl.setModel()
+    label: str
+    scale: int
+    url: str
+    speed: int  # relative, 1 (slowest) .. 5 (fastest) on CPU
+    quality: int  # relative, 1 (softest) .. 5 (most detail)
+    memory: str  # "low" | "medium" | "high" peak RAM on large inputs
+    note: str = ""
+
+
+_EDSR_BASE = "https://raw.githubusercontent.com/Saafke/EDSR_Tensorflow/master/models"
+_FSRCNN_BASE = "https://raw.githubusercontent.com/Saafke/FSRCNN_Tensorflow/master/models"
+_ESPCN_BASE = "https://raw.githubusercontent.com/fannymonori/TF-ESPCN/master/export"
+_LAPSRN_BASE = "https://raw.githubusercontent.com/fannymonori/TF-LapSRN/master/export"
+
+# All cv2.dnn_superres families we know how to fetch. Modes pick from here by
+# (scale, prefer) instead of naming files, see `_select_sr_model`.
+SR_MODELS: dict[str, SrModel] = {
+    m.file: m
+    for m in (
+        SrModel("EDSR_x4.pb", "edsr", "EDSR", 4, f"{_EDSR_BASE}/EDSR_x4.pb", 1, 5, "high", "Best quality (CPU, heavy RAM)"),
+        SrModel("FSRCNN_x4.pb", "fsrcnn", "FSRCNN", 4, f"{_FSRCNN_BASE}/FSRCNN_x4.pb", 5, 3, "low", "Fast / low memory"),
+        SrModel("FSRCNN_x2.pb", "fsrcnn", "FSRCNN", 2, f"{_FSRCNN_BASE}/FSRCNN_x2.pb", 5, 3, "low", "Fast / low memory"),
+        SrModel("ESPCN_x2.pb", "espcn", "ESPCN", 2, f"{_ESPCN_BASE}/ESPCN_x2.pb", 5, 2, "low", "Fastest / softest"),
+        SrModel("ESPCN_x3.pb", "espcn", "ESPCN", 3, f"{_ESPCN_BASE}/ESPCN_x3.pb", 5, 2, "low", "Fastest / softest"),
+        SrModel("ESPCN_x4.pb", "espcn", "ESPCN", 4, f"{_ESPCN_BASE}/ESPCN_x4.pb", 5, 2, "low", "Fastest / softest"),
+        SrModel("LapSRN_x2.pb", "lapsrn", "LapSRN", 2, f"{_LAPSRN_BASE}/LapSRN_x2.pb", 3, 4, "medium", "Balanced"),
+        SrModel("LapSRN_x4.pb", "lapsrn", "LapSRN", 4, f"{_LAPSRN_BASE}/LapSRN_x4.pb", 3, 4, "medium", "Balanced"),
+        SrModel("LapSRN_x8.pb", "lapsrn", "LapSRN", 8, f"{_LAPSRN_BASE}/LapSRN_x8.pb", 2, 4, "medium", "Single-pass ×8"),
+    )
 }
 
+MODEL_URLS = {name: m.url for name, m in SR_MODELS.items()}
+
+
+@dataclass(frozen=True)
+class SrCapability:
+    scale: int
+    prefer: str = "quality"  # "quality" | "speed"
+
+
+# ×4 variants each AI mode renders (cheapest first).
+MODE_SR_VARIANTS: dict[str, tuple[SrCapability, ...]] = {
+    "best-text": (SrCapability(4, "speed"), SrCapability(4, "quality")),
+    "quality": (SrCapability(4, "quality"),),
+    "fast": (SrCapability(4, "speed"),),
+}
+
+# best-text ×8 paths: two-stage chain over a ×4 intermediate, or one LapSRN pass.
+X8_PATHS: dict[str, tuple[SrCapability, ...]] = {
+    "chain": (SrCapability(4, "quality"), SrCapability(2, "speed")),
+    "lapsrn": (SrCapability(8, "quality"),),
+}
+
+
+def _select_sr_model(cap: SrCapability) -> SrModel:
+    candidates = [m for m in SR_MODELS.values() if m.scale == int(cap.scale)]
+    if not candidates:
+        raise RuntimeError(f"No SR model registered for ×{cap.scale}")
+    if cap.prefer == "speed":
+        key = lambda m: (m.speed, m.quality)  # noqa: E731
+    else:
+        key = lambda m: (m.quality, m.speed)  # noqa: E731
+    return max(candidates, key=key)
+
+
+def _print_model_registry(start: Path, *, model_dir: Optional[Path]) -> None:
+    print(f"{'file':<14} {'algo':<7} {'scale':>5} {'speed':>5} {'quality':>7} {'memory':<7} local")
+    for m in sorted(SR_MODELS.values(), key=lambda m: (m.algo, m.scale)):
+        found = _find_model_file(m.file, start, explicit_dir=model_dir)
+        print(f"{m.file:<14} {m.algo:<7} {m.scale:>5} {m.speed:>5} {m.quality:>7} {m.memory:<7} {found or '-'}")
+
 
 def _ts() -> str:
     return dt.datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -139,19 +217,26 @@ def _find_model_file(name: str, start: Path, *, explicit_dir: Optional[Path] = N
     return None
 
 
+_DOWNLOAD_LOCK = threading.Lock()
+
+
 def _download_model(name: str, dest_dir: Path) -> Path:
     url = MODEL_URLS.get(name)
     if not url:
         raise RuntimeError(f"Unknown model file: {name}")
     _safe_mkdir(dest_dir)
     dest = dest_dir / name
-    _eprint(f"Downloading {name} -> {dest}")
-    tmp = dest.with_suffix(dest.suffix + ".part")
-    with urllib.request.urlopen(url) as r:  # noqa: S310
-        if r.status != 200:
-            raise RuntimeError(f"Download failed: {url} ({r.status})")
-        tmp.write_bytes(r.read())
-    tmp.replace(dest)
+    with _DOWNLOAD_LOCK:
+        # Another thread may have fetched it while we waited.
+        if dest.exists():
+            return dest
+        _eprint(f"Downloading {name} -> {dest}")
+        tmp = dest.with_suffix(dest.suffix + ".part")
+        with urllib.request.urlopen(url) as r:  # noqa: S310
+            if r.status != 200:
+                raise RuntimeError(f"Download failed: {url} ({r.status})")
+            tmp.write_bytes(r.read())
+        tmp.replace(dest)
     return dest
 
 
@@ -194,13 +279,37 @@ def _cv2_traditional_clahe_unsharp_x8(cv2, bgr) -> "object":
     return sharpened
 
 
+# Loaded DnnSuperResImpl instances, reused across calls. A dnn Net is not safe to run
+# from several threads at once, so each entry carries its own lock.
+_SR_CACHE: dict[tuple[str, str, int], tuple[Any, threading.Lock]] = {}
+_SR_CACHE_LOCK = threading.Lock()
+
+
+def _get_superres(cv2, *, model_path: Path, model_name: str, scale: int) -> tuple[Any, threading.Lock]:
+    key = (str(model_path), str(model_name).lower(), int(scale))
+    with _SR_CACHE_LOCK:
+        entry = _SR_CACHE.get(key)
+        if entry is None:
+            sr = cv2.dnn_superres.DnnSuperResImpl_create()
+            sr.readModel(str(model_path))
+            sr.setModel(key[1], key[2])
+            entry = (sr, threading.Lock())
+            _SR_CACHE[key] = entry
+    return entry
+
+
+def clear_model_cache() -> None:
+    """Drop all loaded SR models (frees their memory; next call reloads)."""
+    with _SR_CACHE_LOCK:
+        _SR_CACHE.clear()
+
+
 def _cv2_superres_upscale(cv2, bgr, *, model_path: Path, model_name: str, scale: int):
     if not hasattr(cv2, "dnn_superres"):
         raise RuntimeError("OpenCV missing dnn_superres (need opencv-contrib-python).")
-    sr = cv2.dnn_superres.DnnSuperResImpl_create()
-    sr.readModel(str(model_path))
-    sr.setModel(str(model_name).lower(), int(scale))
-    return sr.upsample(bgr)
+    sr, lock = _get_superres(cv2, model_path=model_path, model_name=model_name, scale=scale)
+    with lock:
+        return sr.upsample(bgr)
 
 
 def _pick_font_path(explicit: Optional[str]) -> Optional[Path]:
@@ -237,19 +346,28 @@ class OcrWord:
     text: str
 
 
-def _run_tesseract_tsv(image_path: Path, *, lang: str, psm: int) -> str:
+def _run_tesseract_tsv(image: Union[Path, Image.Image], *, lang: str, psm: int) -> str:
+    # In-memory images are piped through stdin so OCR never touches disk.
     exe = shutil.which("tesseract")
     if not exe:
         raise RuntimeError("tesseract not found in PATH")
-    cmd = [exe, str(image_path), "stdout", "--psm", str(psm), "-l", str(lang), "tsv"]
-    proc = subprocess.run(cmd, capture_output=True, text=True)  # noqa: S603
+    stdin_data = None
+    source = str(image)
+    if isinstance(image, Image.Image):
+        buf = io.BytesIO()
+        image.save(buf, format="PNG", compress_level=1)
+        stdin_data = buf.getvalue()
+        source = "stdin"
+    cmd = [exe, source, "stdout", "--psm", str(psm), "-l", str(lang), "tsv"]
+    proc = subprocess.run(cmd, input=stdin_data, capture_output=True)  # noqa: S603
+    stdout = proc.stdout.decode("utf-8", errors="replace")
     if proc.returncode != 0:
         raise RuntimeError(
             "tesseract failed:\n"
             f"cmd: {' '.join(cmd)}\n"
-            f"stderr: {proc.stderr.strip()}"
+            f"stderr: {proc.stderr.decode('utf-8', errors='replace').strip()}"
         )
-    return proc.stdout
+    return stdout
 
 
 def _parse_tesseract_tsv(tsv: str, *, min_conf: float) -> list[OcrWord]:
@@ -295,6 +413,40 @@ def _mean_luma(img_rgb: Image.Image, box: tuple[int, int, int, int]) -> float:
     return float(stat.mean[0]) if stat.mean else 255.0
 
 
+def _ocr_word_style(img_rgb: Image.Image, w: OcrWord, *, min_size: int) -> Optional[tuple[bool, int]]:
+    # Returns (on_dark_background, font_size), or None when the box is empty.
+    box = (w.left, w.top, w.left + w.width, w.top + w.height)
+    if box[2] <= box[0] or box[3] <= box[1]:
+        return None
+    on_dark = _mean_luma(img_rgb, box) < 110
+    return on_dark, max(min_size, int(w.height * 0.92))
+
+
+def _build_ocr_svg(base_rgb: Image.Image, words: Iterable[OcrWord], *, min_size: int = 10) -> str:
+    # Vector text layer in base-image pixel coordinates; scales with the image via viewBox.
+    svg_parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{base_rgb.width}" height="{base_rgb.height}" viewBox="0 0 {base_rgb.width} {base_rgb.height}">',
+        "<style>",
+        "text{font-family:-apple-system,BlinkMacSystemFont,'Segoe UI','PingFang SC','Hiragino Sans GB','Microsoft YaHei','Noto Sans CJK SC',sans-serif;font-weight:650;}",
+        "</style>",
+    ]
+
+    for w in words:
+        style = _ocr_word_style(base_rgb, w, min_size=min_size)
+        if style is None:
+            continue
+        on_dark, font_size = style
+        svg_fill, svg_stroke = ("#fafafa", "#0a0a0a") if on_dark else ("#0a0a0a", "#fafafa")
+        x = w.left
+        y = w.top + int(w.height * 0.92)
+        svg_parts.append(
+            f'<text x="{x}" y="{y}" font-size="{font_size}" fill="{svg_fill}" stroke="{svg_stroke}" stroke-width="{max(1, int(font_size * 0.06))}" paint-order="stroke fill">{html.escape(w.text)}</text>'
+        )
+
+    svg_parts.append("</svg>")
+    return "\n".join(svg_parts) + "\n"
+
+
 def _draw_ocr_overlay(
     base_rgb: Image.Image,
     words: Iterable[OcrWord],
@@ -302,6 +454,7 @@ def _draw_ocr_overlay(
     font_path: Optional[Path],
     min_size: int = 10,
 ) -> tuple[Image.Image, str]:
+    words = list(words)
     img = base_rgb.copy()
     draw = ImageDraw.Draw(img)
 
@@ -320,65 +473,88 @@ def _draw_ocr_overlay(
         font_cache[px] = ImageFont.load_default()
         return font_cache[px]
 
-    svg_parts = [
-        f'<svg xmlns="http://www.w3.org/2000/svg" width="{img.width}" height="{img.height}" viewBox="0 0 {img.width} {img.height}">',
-        "<style>",
-        "text{font-family:-apple-system,BlinkMacSystemFont,'Segoe UI','PingFang SC','Hiragino Sans GB','Microsoft YaHei','Noto Sans CJK SC',sans-serif;font-weight:650;}",
-        "</style>",
-    ]
+    # Build the SVG from the untouched base so luma is not skewed by words drawn earlier.
+    svg_text = _build_ocr_svg(base_rgb, words, min_size=min_size)
 
     for w in words:
-        box = (w.left, w.top, w.left + w.width, w.top + w.height)
-        if box[2] <= box[0] or box[3] <= box[1]:
+        style = _ocr_word_style(img, w, min_size=min_size)
+        if style is None:
             continue
-        luma = _mean_luma(img, box)
-        if luma < 110:
-            fill = (250, 250, 250)
-            stroke = (10, 10, 10)
-            svg_fill = "#fafafa"
-            svg_stroke = "#0a0a0a"
-        else:
-            fill = (10, 10, 10)
-            stroke = (250, 250, 250)
-            svg_fill = "#0a0a0a"
-            svg_stroke = "#fafafa"
-
-        font_size = max(min_size, int(w.height * 0.92))
-        font = get_font(font_size)
+        on_dark, font_size = style
+        fill, stroke = ((250, 250, 250), (10, 10, 10)) if on_dark else ((10, 10, 10), (250, 250, 250))
         stroke_w = max(1, int(font_size * 0.08))
-
         draw.text(
             (w.left, w.top),
             w.text,
-            font=font,
+            font=get_font(font_size),
             fill=fill,
             stroke_width=stroke_w,
             stroke_fill=stroke,
         )
 
-        x = w.left
-        y = w.top + int(w.height * 0.92)
-        svg_parts.append(
-            f'<text x="{x}" y="{y}" font-size="{font_size}" fill="{svg_fill}" stroke="{svg_stroke}" stroke-width="{max(1, int(font_size * 0.06))}" paint-order="stroke fill">{html.escape(w.text)}</text>'
-        )
+    return img, svg_text
 
-    svg_parts.append("</svg>")
-    return img, "\n".join(svg_parts) + "\n"
+
+def _save_ocr_base(base_rgb: Image.Image, out_dir: Path, *, fmt: str, quality: int) -> Path:
+    # Lossy base for the vector overlay: far cheaper to encode/upload than another ×8 PNG.
+    if fmt == "webp":
+        path = out_dir / "ocr_base_x8.webp"
+        base_rgb.save(path, format="WEBP", quality=int(quality), method=4)
+    else:
+        path = out_dir / "ocr_base_x8.jpg"
+        base_rgb.save(path, format="JPEG", quality=int(quality), optimize=True, progressive=True)
+    return path
+
+
+def _write_ocr_overlay_html(
+    out_path: Path,
+    *,
+    title: str,
+    base_src: str,
+    svg_text: str,
+) -> None:
+    # Standalone viewer: inline SVG keeps the OCR text selectable/searchable over the base image.
+    svg_inline = svg_text.replace("<svg ", '<svg class="layer" preserveAspectRatio="none" ', 1)
+    html_text = f"""<!doctype html>
+<html lang="zh-Hans">
+  <head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+    <title>{html.escape(title)}</title>
+    <style>
+      body {{ margin: 0; background: #fafafa; }}
+      .stack {{ position: relative; max-width: 100%; }}
+      .stack img {{ display: block; width: 100%; height: auto; }}
+      .stack .layer {{ position: absolute; inset: 0; width: 100%; height: 100%; }}
+    </style>
+  </head>
+  <body>
+    <div class="stack">
+      <img src="{html.escape(base_src)}" alt="{html.escape(title)}" />
+      {svg_inline.strip()}
+    </div>
+  </body>
+</html>
+"""
+    out_path.write_text(html_text, encoding="utf-8")
 
 
 def _write_compare_html(out_path: Path, *, title: str, items: list[dict[str, str]]) -> None:
-    # items: {label, src, note, href}
+    # items: {label, src, note, href, overlay?}; overlay is an SVG layer stacked over src.
     cards = []
     for it in items:
         label = html.escape(it.get("label", ""))
         src = html.escape(it.get("src", ""))
         note = html.escape(it.get("note", ""))
         href = html.escape(it.get("href", it.get("src", "")))
+        overlay = html.escape(it.get("overlay", ""))
+        layer = f'<img class="layer" src="{overlay}" alt="" loading="lazy" />' if overlay else ""
         cards.append(
             f"""
             <figure class="card">
               <a class="imglink" href="{href}" target="_blank" rel="noreferrer">
                 <img src="{src}" alt="{label}" loading="lazy" />
+                {layer}
               </a>
               <figcaption>
                 <div class="label">{label}</div>
@@ -462,7 +638,8 @@ def _write_compare_html(out_path: Path, *, title: str, items: list[dict[str, str
         padding: 12px;
         overflow: hidden;
       }}
-      .imglink {{ display: block; border: 0; }}
+      .imglink {{ display: block; border: 0; position: relative; }}
+      .imglink .layer {{ position: absolute; inset: 0; width: 100%; height: 100%; }}
       figcaption {{
         margin-top: 10px;
         display: grid;
@@ -592,160 +769,803 @@ def _upload_to_r2(files: list[Path], *, prefix: str) -> dict[str, str]:
     return out
 
 
-def main() -> int:
-    ap = argparse.ArgumentParser(description="Local-first upscale + clarity pipeline (EDSR/FSRCNN + OCR overlay).")
-    ap.add_argument("--in", dest="input_path", required=True, help="Input image path")
-    ap.add_argument(
-        "--mode",
-        default="best-text",
-        choices=["best-text", "quality", "fast", "traditional"],
-        help="best-text: EDSR×4→×2 + OCR overlay; quality: EDSR×4; fast: FSRCNN×4; traditional: CLAHE+Unsharp×8",
-    )
-    ap.add_argument("--out-dir", default="tmp/image-upscale-best", help="Output directory root")
-    ap.add_argument("--model-dir", default="", help="Optional directory containing SR models (.pb)")
-    ap.add_argument("--download-models", action="store_true", help="Download missing models (needs network)")
-    ap.add_argument("--font", default="", help="Optional TTF/TTC path for OCR overlay rendering")
-    ap.add_argument("--ocr-lang", default="eng", help="Tesseract language (default: eng)")
-    ap.add_argument("--ocr-psm", type=int, default=6, help="Tesseract PSM (default: 6)")
-    ap.add_argument("--ocr-min-conf", type=float, default=70.0, help="Min OCR confidence (0-100, default: 70)")
-    ap.add_argument("--upload-r2", action="store_true", help="Upload outputs to Cloudflare R2 (needs env + network)")
-    ap.add_argument("--r2-prefix", default="", help="R2 key prefix, e.g. image-upscale/case/20260123-xxxxxx")
-    args = ap.parse_args()
+MODES = ("best-text", "quality", "fast", "traditional")
 
-    input_path = Path(args.input_path).expanduser()
-    if not input_path.exists():
-        _eprint("Input not found:", input_path)
-        return 2
 
-    out_root = Path(args.out_dir)
-    stamp = _ts()
-    out_dir = out_root / stamp
-    _safe_mkdir(out_dir)
+@dataclass(frozen=True)
+class UpscaleOptions:
+    model_dir: Optional[Path] = None
+    download_models: bool = False
+    x8: str = "chain"  # key of X8_PATHS
+    benchmark_x8: bool = False
+    ocr: bool = True  # best-text only
+    ocr_lang: str = "eng"
+    ocr_psm: int = 6
+    ocr_min_conf: float = 70.0
+    ocr_raster: bool = False  # also composite the text into an image (default: SVG layer only)
+    font: Optional[str] = None
+    metrics: bool = True  # per-variant quality metrics (needs numpy)
+    target_quality: Optional[float] = None  # stop at the first (cheapest) variant whose quality reaches this
+
+
+@dataclass
+class Variant:
+    name: str  # stable id, also the CLI file stem (e.g. "ai_edsr_x4")
+    label: str
+    note: str
+    image: Any  # BGR ndarray from OpenCV, or an RGB PIL image on the PIL-only fallback
+    seconds: float = 0.0
+
+    @property
+    def size(self) -> tuple[int, int]:
+        if isinstance(self.image, Image.Image):
+            return self.image.size
+        return int(self.image.shape[1]), int(self.image.shape[0])
+
+    def to_array(self):
+        """RGB uint8 array of shape (H, W, 3)."""
+        if isinstance(self.image, Image.Image):
+            import numpy as np
+
+            return np.asarray(self.image)
+        return self.image[:, :, ::-1].copy()
+
+    def to_pil(self) -> Image.Image:
+        if isinstance(self.image, Image.Image):
+            return self.image
+        return Image.fromarray(self.to_array())
+
+    def save(self, path: Path) -> None:
+        if isinstance(self.image, Image.Image):
+            self.image.save(path, format="PNG", optimize=True)
+        else:
+            _try_import_cv2().imwrite(str(path), self.image)
 
-    # Normalize input to stable RGB PNG.
-    src = Image.open(input_path)
-    src.load()
-    rgb = _flatten_to_rgb(src)
-    original_path = out_dir / "original.png"
-    rgb.save(original_path, format="PNG", optimize=True)
 
-    items_local: list[dict[str, str]] = [
-        {"label": "Original", "src": "original.png", "note": f"{rgb.width}×{rgb.height}", "href": "original.png"}
-    ]
+@dataclass
+class UpscaleResult:
+    mode: str
+    original: Image.Image
+    variants: list[Variant] = field(default_factory=list)
+    words: list[OcrWord] = field(default_factory=list)
+    ocr_source: str = ""  # name of the variant OCR ran on (and the SVG layer's coordinate space)
+    ocr_svg: str = ""
+    ocr_overlay: Optional[Image.Image] = None  # only with UpscaleOptions.ocr_raster
+    timings: dict[str, float] = field(default_factory=dict)
+    benchmark_x8: dict[str, dict[str, Any]] = field(default_factory=dict)
+    metrics: dict[str, dict[str, float]] = field(default_factory=dict)  # variant name -> _variant_metrics()
+    selected: str = ""  # with target_quality: the variant that met it (or the best one if none did)
+    warnings: list[str] = field(default_factory=list)
 
-    cv2 = _try_import_cv2()
-    model_dir = Path(args.model_dir).expanduser() if str(args.model_dir).strip() else None
+    def variant(self, name: str) -> Optional[Variant]:
+        return next((v for v in self.variants if v.name == name), None)
 
-    # Traditional baseline.
-    traditional_path = out_dir / "traditional_x8.png"
-    if cv2 is not None:
-        bgr = cv2.imread(str(original_path))
-        if bgr is not None:
-            trad = _cv2_traditional_clahe_unsharp_x8(cv2, bgr)
-            cv2.imwrite(str(traditional_path), trad)
-        else:
-            _eprint("OpenCV failed to read image; fallback to PIL traditional.")
-            _pil_unsharp_autocontrast_x8(rgb).save(traditional_path, format="PNG", optimize=True)
-    else:
-        _pil_unsharp_autocontrast_x8(rgb).save(traditional_path, format="PNG", optimize=True)
-    if traditional_path.exists():
-        items_local.append(
-            {
-                "label": "Traditional CLAHE+Unsharp ×8",
-                "src": traditional_path.name,
-                "note": "Fast baseline (no hallucinated detail)",
-                "href": traditional_path.name,
-            }
-        )
 
-    ai_edsr_x4_path = out_dir / "ai_edsr_x4.png"
-    ai_fsrcnn_x4_path = out_dir / "ai_fsrcnn_x4.png"
-    ai_pipeline_x8_path = out_dir / "ai_pipeline_x8.png"
+def _coerce_rgb(image: Any) -> Image.Image:
+    if isinstance(image, Image.Image):
+        image.load()
+        return _flatten_to_rgb(image)
+    if hasattr(image, "__array_interface__"):
+        return _flatten_to_rgb(Image.fromarray(image))
+    raise TypeError(f"Expected a PIL image or a uint8 array, got {type(image).__name__}")
 
-    wants_ai = args.mode in ("best-text", "quality", "fast")
-    wants_edsr = args.mode in ("best-text", "quality")
-    wants_fsrcnn = args.mode in ("best-text", "fast")
 
-    if wants_ai:
+def _pil_to_bgr(cv2, rgb: Image.Image):
+    import numpy as np  # OpenCV depends on numpy, so it is present whenever cv2 is
+
+    return cv2.cvtColor(np.asarray(rgb), cv2.COLOR_RGB2BGR)
+
+
+# Metrics are computed on luma at a common analysis scale so ×4 and ×8 outputs compare fairly;
+# the cap keeps float32 working arrays bounded on large inputs.
+METRIC_ANALYSIS_SCALE = 4
+_METRIC_MAX_PIXELS = 4_000_000
+
+
+def _try_import_numpy():
+    try:
+        import numpy as np  # type: ignore
+
+        return np
+    except Exception:
+        return None
+
+
+def _luma(np, img: Image.Image, size: tuple[int, int]):
+    gray = img.convert("L")
+    if gray.size != size:
+        down = size[0] < gray.width
+        gray = gray.resize(size, resample=Image.Resampling.BOX if down else Image.Resampling.LANCZOS)
+    return np.asarray(gray, dtype=np.float32)
+
+
+def _box_mean(np, a, k: int):
+    # Mean over every k×k window ("valid" region) via a summed-area table. The table is
+    # float64: in float32 its corner sums lose the precision window differences need on
+    # large images, and SSIM comes out meaningless.
+    c = np.pad(a.astype(np.float64), ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    return ((c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]) / float(k * k)).astype(a.dtype)
+
+
+def _ssim(np, a, b, *, k: int = 7) -> float:
+    if min(a.shape) < k:
+        k = max(1, min(a.shape))
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_a, mu_b = _box_mean(np, a, k), _box_mean(np, b, k)
+    var_a = _box_mean(np, a * a, k) - mu_a * mu_a
+    var_b = _box_mean(np, b * b, k) - mu_b * mu_b
+    cov = _box_mean(np, a * b, k) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a**2 + mu_b**2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+
+def _psnr(np, a, b) -> float:
+    mse = float(np.mean((a - b) ** 2))
+    return 99.0 if mse <= 1e-10 else float(10.0 * np.log10(255.0**2 / mse))
+
+
+def _laplacian_var(np, a) -> float:
+    if min(a.shape) < 3:
+        return 0.0
+    lap = a[:-2, 1:-1] + a[2:, 1:-1] + a[1:-1, :-2] + a[1:-1, 2:] - 4.0 * a[1:-1, 1:-1]
+    return float(lap.var())
+
+
+def _edge_contrast(np, a) -> float:
+    # Mean 3×3 luma range (0..1) at the strongest 10% gradients, i.e. how crisp text edges are.
+    if min(a.shape) < 3:
+        return 0.0
+    gx = a[1:-1, 2:] - a[1:-1, :-2]
+    gy = a[2:, 1:-1] - a[:-2, 1:-1]
+    mag = np.hypot(gx, gy)
+    thresh = max(float(np.percentile(mag, 90)), 1.0)
+    edges = mag >= thresh
+    if not edges.any():
+        return 0.0
+    h, w = a.shape
+    shifts = [a[dy : h - 2 + dy, dx : w - 2 + dx] for dy in range(3) for dx in range(3)]
+    # Pairwise folds keep peak memory at two arrays instead of stacking all nine shifts.
+    local_range = functools.reduce(np.maximum, shifts) - functools.reduce(np.minimum, shifts)
+    return float(local_range[edges].mean() / 255.0)
+
+
+class _MetricReference:
+    """Source-side arrays shared by every variant's metrics."""
+
+    def __init__(self, np, rgb: Image.Image) -> None:
+        self.np = np
+        self.size = rgb.size
+        scale = min(float(METRIC_ANALYSIS_SCALE), (_METRIC_MAX_PIXELS / float(rgb.width * rgb.height)) ** 0.5)
+        scale = max(1.0, scale)
+        self.analysis_size = (max(1, round(rgb.width * scale)), max(1, round(rgb.height * scale)))
+        self.source = _luma(np, rgb, self.size)
+        # Plain Lanczos at the analysis scale is the "no enhancement" sharpness baseline.
+        lanczos = _luma(np, rgb, self.analysis_size)
+        self.lanczos_sharpness = _laplacian_var(np, lanczos)
+        self.source_edge_contrast = _edge_contrast(np, self.source)
+
+
+def _variant_metrics(ref: _MetricReference, img: Image.Image) -> dict[str, float]:
+    np = ref.np
+    down = _luma(np, img, ref.size)
+    analysis = _luma(np, img, ref.analysis_size)
+    ssim = _ssim(np, down, ref.source)
+    sharpness = _laplacian_var(np, analysis)
+    edge = _edge_contrast(np, analysis)
+    edge_retention = min(1.0, edge / ref.source_edge_contrast) if ref.source_edge_contrast > 0 else 0.0
+    # Fidelity (re-downscaled SSIM) × crispness (edge contrast kept at the analysis scale).
+    # Laplacian variance is reported but not scored: it also rewards ringing and noise.
+    quality = (max(ssim, 0.0) * edge_retention) ** 0.5
+    return {
+        "ssim": round(ssim, 4),
+        "psnr": round(_psnr(np, down, ref.source), 2),
+        "sharpness": round(sharpness, 2),
+        "sharpness_gain": round(sharpness / ref.lanczos_sharpness, 3) if ref.lanczos_sharpness > 0 else 0.0,
+        "edge_contrast": round(edge, 4),
+        "edge_retention": round(edge_retention, 4),
+        "quality": round(quality, 4),
+    }
+
+
+def _format_metrics_note(m: dict[str, float]) -> str:
+    return (
+        f"Q {m['quality']:.3f} · SSIM {m['ssim']:.3f} · PSNR {m['psnr']:.1f}dB"
+        f" · sharp ×{m['sharpness_gain']:.2f} · edge {m['edge_contrast']:.3f}"
+    )
+
+
+def _render_variants(rgb: Image.Image, mode: str, opts: UpscaleOptions, result: UpscaleResult) -> Iterator[Variant]:
+    # Yields variants cheapest first; warnings and the ×8 benchmark are recorded on `result`.
+    cv2 = _try_import_cv2()
+
+    # Traditional baseline.
+    t0 = time.perf_counter()
+    bgr = _pil_to_bgr(cv2, rgb) if cv2 is not None else None
+    trad = _cv2_traditional_clahe_unsharp_x8(cv2, bgr) if bgr is not None else _pil_unsharp_autocontrast_x8(rgb)
+    seconds = time.perf_counter() - t0
+    yield Variant("traditional_x8", "Traditional CLAHE+Unsharp ×8", "Fast baseline (no hallucinated detail)", trad, seconds)
+
+    if mode in MODE_SR_VARIANTS:
         if cv2 is None:
             raise RuntimeError("OpenCV (cv2) not available. Install opencv-contrib-python or use a Python env that has it.")
         if not hasattr(cv2, "dnn_superres"):
             raise RuntimeError("cv2.dnn_superres missing. Install opencv-contrib-python (not opencv-python).")
 
-        bgr = cv2.imread(str(original_path))
-        if bgr is None:
-            raise RuntimeError("OpenCV failed to read the normalized PNG.")
+        # Results keyed by model file so the ×8 chain can reuse its ×4 intermediate.
+        sr_outputs: dict[str, tuple[Any, float]] = {}
 
-        if wants_fsrcnn:
-            fsrcnn_x4 = _require_model("FSRCNN_x4.pb", Path.cwd(), model_dir=model_dir, download=args.download_models)
-            out_fsrcnn = _cv2_superres_upscale(cv2, bgr, model_path=fsrcnn_x4, model_name="fsrcnn", scale=4)
-            cv2.imwrite(str(ai_fsrcnn_x4_path), out_fsrcnn)
-            items_local.append(
-                {"label": "AI Super-Resolution FSRCNN ×4", "src": ai_fsrcnn_x4_path.name, "note": "Fast / low memory", "href": ai_fsrcnn_x4_path.name}
+        def run_model(model: SrModel, src_bgr, *, required: bool = True):
+            if required:
+                path = _require_model(model.file, Path.cwd(), model_dir=opts.model_dir, download=opts.download_models)
+            else:
+                path = _find_model_file(model.file, Path.cwd(), explicit_dir=opts.model_dir)
+                if path is None and opts.download_models:
+                    path = _download_model(model.file, dest_dir=Path.cwd() / "tmp" / "opencv_sr_models")
+                if path is None:
+                    return None, 0.0
+            t0 = time.perf_counter()
+            out = _cv2_superres_upscale(cv2, src_bgr, model_path=path, model_name=model.algo, scale=model.scale)
+            return out, time.perf_counter() - t0
+
+        for cap in MODE_SR_VARIANTS[mode]:
+            model = _select_sr_model(cap)
+            out, seconds = run_model(model, bgr)
+            sr_outputs[model.file] = (out, seconds)
+            name = f"ai_{model.algo}_x{model.scale}"
+            yield Variant(name, f"AI Super-Resolution {model.label} ×{model.scale}", model.note, out, seconds)
+
+        def run_x8(path_name: str):
+            # Returns (bgr, seconds, stage labels). The first stage reuses a ×4 variant already rendered
+            # from the source; the last stage of a multi-step chain may fall back to Lanczos.
+            steps = [_select_sr_model(cap) for cap in X8_PATHS[path_name]]
+            cur, total, stages = bgr, 0.0, []
+            for i, model in enumerate(steps):
+                optional = len(steps) > 1 and i == len(steps) - 1
+                if i == 0 and model.file in sr_outputs:
+                    out, seconds = sr_outputs[model.file]
+                else:
+                    out, seconds = run_model(model, cur, required=not optional)
+                label = f"{model.label}×{model.scale}"
+                if out is None:
+                    result.warnings.append(f"{model.file} not found; fallback to Lanczos ×{model.scale} for the last step.")
+                    h, w = cur.shape[:2]
+                    t0 = time.perf_counter()
+                    out = cv2.resize(cur, (w * model.scale, h * model.scale), interpolation=cv2.INTER_LANCZOS4)
+                    seconds = time.perf_counter() - t0
+                    label = f"Lanczos×{model.scale}"
+                stages.append(label)
+                cur, total = out, total + seconds
+            return cur, total, stages
+
+        if mode == "best-text":
+            out_x8, x8_seconds, x8_stages = run_x8(opts.x8)
+            yield Variant(
+                "ai_pipeline_x8",
+                f"AI Pipeline ×8 ({' → '.join(x8_stages)})",
+                f"Bigger base for OCR · {x8_seconds:.2f}s",
+                out_x8,
+                x8_seconds,
             )
 
-        if wants_edsr:
-            edsr_x4 = _require_model("EDSR_x4.pb", Path.cwd(), model_dir=model_dir, download=args.download_models)
-            out_edsr = _cv2_superres_upscale(cv2, bgr, model_path=edsr_x4, model_name="edsr", scale=4)
-            cv2.imwrite(str(ai_edsr_x4_path), out_edsr)
-            items_local.append(
-                {"label": "AI Super-Resolution EDSR ×4", "src": ai_edsr_x4_path.name, "note": "Best quality (CPU, heavy RAM)", "href": ai_edsr_x4_path.name}
-            )
+            if opts.benchmark_x8:
+                bench = {opts.x8: {"seconds": round(x8_seconds, 4), "stages": x8_stages, "size": [int(out_x8.shape[1]), int(out_x8.shape[0])]}}
+                result.benchmark_x8 = bench
+                for other in sorted(set(X8_PATHS) - {opts.x8}):
+                    try:
+                        alt, alt_seconds, alt_stages = run_x8(other)
+                    except Exception as e:
+                        result.warnings.append(f"×8 benchmark ({other}) failed: {e}")
+                        bench[other] = {"error": str(e)}
+                        continue
+                    bench[other] = {"seconds": round(alt_seconds, 4), "stages": alt_stages, "size": [int(alt.shape[1]), int(alt.shape[0])]}
+                    yield Variant(
+                        f"ai_pipeline_x8.{other}",
+                        f"×8 Benchmark ({' → '.join(alt_stages)})",
+                        f"{alt_seconds:.2f}s vs {x8_seconds:.2f}s ({opts.x8})",
+                        alt,
+                        alt_seconds,
+                    )
 
-        if args.mode == "best-text":
-            # Preferred: FSRCNN×2 on top of EDSR×4 (×8).
-            if not ai_edsr_x4_path.exists():
-                raise RuntimeError("best-text requires EDSR×4 output, but it was not produced.")
-            edsr_bgr = cv2.imread(str(ai_edsr_x4_path))
-            if edsr_bgr is None:
-                raise RuntimeError("OpenCV failed to read ai_edsr_x4.png")
 
-            x2_model = _find_model_file("FSRCNN_x2.pb", Path.cwd(), explicit_dir=model_dir)
-            if x2_model is None and args.download_models:
-                x2_model = _download_model("FSRCNN_x2.pb", dest_dir=Path.cwd() / "tmp" / "opencv_sr_models")
+def upscale(image: Any, mode: str = "best-text", options: Optional[UpscaleOptions] = None) -> UpscaleResult:
+    """Run the pipeline in memory and return every variant, OCR words and per-stage timings.
+
+    `image` is a PIL image or an RGB/RGBA/grayscale uint8 array. Nothing is written to disk
+    except models fetched with `download_models`. Loaded SR models are cached and shared,
+    so repeat calls skip model loading; calls from several threads are safe.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode: {mode} (expected one of {', '.join(MODES)})")
+    opts = options or UpscaleOptions()
+    if opts.x8 not in X8_PATHS:
+        raise ValueError(f"Unknown x8 path: {opts.x8} (expected one of {', '.join(sorted(X8_PATHS))})")
+
+    if opts.target_quality is not None and not 0.0 < float(opts.target_quality) <= 1.0:
+        raise ValueError("target_quality must be in (0, 1]")
+
+    t_start = time.perf_counter()
+    rgb = _coerce_rgb(image)
+    result = UpscaleResult(mode=mode, original=rgb)
+
+    ref = None
+    if opts.metrics or opts.target_quality is not None:
+        np = _try_import_numpy()
+        if np is not None:
+            ref = _MetricReference(np, rgb)
+        elif opts.target_quality is not None:
+            raise RuntimeError("target_quality needs numpy for image metrics.")
+        else:
+            result.warnings.append("Metrics skipped: numpy not available.")
 
-            if x2_model is not None:
-                out_x8 = _cv2_superres_upscale(cv2, edsr_bgr, model_path=x2_model, model_name="fsrcnn", scale=2)
-            else:
-                _eprint("FSRCNN_x2.pb not found; fallback to Lanczos ×2 for the last step.")
-                h4, w4 = edsr_bgr.shape[:2]
-                out_x8 = cv2.resize(edsr_bgr, (w4 * 2, h4 * 2), interpolation=cv2.INTER_LANCZOS4)
-            cv2.imwrite(str(ai_pipeline_x8_path), out_x8)
-            items_local.append(
-                {"label": "AI Pipeline ×8 (EDSR×4 → ×2)", "src": ai_pipeline_x8_path.name, "note": "Bigger base for OCR", "href": ai_pipeline_x8_path.name}
-            )
+    # Variants are rendered lazily, cheapest first, so a met target skips the expensive stages.
+    for v in _render_variants(rgb, mode, opts, result):
+        result.variants.append(v)
+        result.timings[v.name] = v.seconds
+        if ref is None:
+            continue
+        t0 = time.perf_counter()
+        result.metrics[v.name] = _variant_metrics(ref, v.to_pil())
+        result.timings["metrics"] = result.timings.get("metrics", 0.0) + time.perf_counter() - t0
+        if opts.target_quality is not None and result.metrics[v.name]["quality"] >= float(opts.target_quality):
+            result.selected = v.name
+            break
+
+    if opts.target_quality is not None and not result.selected and result.metrics:
+        result.selected = max(result.metrics, key=lambda name: result.metrics[name]["quality"])
+        result.warnings.append(
+            f"No variant reached target quality {opts.target_quality}; best was {result.selected} "
+            f"({result.metrics[result.selected]['quality']:.3f})."
+        )
 
-    # OCR overlay (only in best-text mode).
-    ocr_png = out_dir / "ocr_overlay_x8.png"
-    ocr_svg = out_dir / "ocr_overlay_x8_text.svg"
-    if args.mode == "best-text":
-        ocr_source = None
-        for candidate in [ai_pipeline_x8_path, ai_edsr_x4_path, ai_fsrcnn_x4_path, traditional_path]:
-            if candidate.exists():
-                ocr_source = candidate
-                break
-
-        if ocr_source is None:
-            _eprint("OCR skipped: no source image produced.")
-        elif not shutil.which("tesseract"):
-            _eprint("OCR skipped: tesseract not found in PATH.")
+    # OCR (only in best-text mode) on the selected variant, else the largest output:
+    # ×8 pipeline, best ×4, then baseline.
+    if mode == "best-text" and opts.ocr:
+        ai_x4 = [v for v in result.variants if v.name.startswith("ai_") and v.name != "ai_pipeline_x8" and "." not in v.name]
+        source = (
+            result.variant(result.selected)
+            or result.variant("ai_pipeline_x8")
+            or (ai_x4[-1] if ai_x4 else None)
+            or result.variants[0]
+        )
+        if not shutil.which("tesseract"):
+            result.warnings.append("OCR skipped: tesseract not found in PATH.")
         else:
+            t0 = time.perf_counter()
             try:
-                tsv = _run_tesseract_tsv(ocr_source, lang=args.ocr_lang, psm=args.ocr_psm)
-                words = _parse_tesseract_tsv(tsv, min_conf=args.ocr_min_conf)
+                base = source.to_pil()
+                tsv = _run_tesseract_tsv(base, lang=opts.ocr_lang, psm=opts.ocr_psm)
+                words = _parse_tesseract_tsv(tsv, min_conf=opts.ocr_min_conf)
                 if not words:
-                    _eprint("OCR produced no words above confidence threshold; skipping overlay.")
+                    result.warnings.append("OCR produced no words above confidence threshold; skipping overlay.")
                 else:
-                    base = Image.open(ocr_source).convert("RGB")
-                    font_path = _pick_font_path(args.font.strip() or None)
-                    overlay_img, overlay_svg = _draw_ocr_overlay(base, words, font_path=font_path)
-                    overlay_img.save(ocr_png, format="PNG", optimize=True)
-                    ocr_svg.write_text(overlay_svg, encoding="utf-8")
-                    items_local.append(
-                        {"label": "OCR Text Overlay ×8", "src": ocr_png.name, "note": "Best readability for small text", "href": ocr_png.name}
-                    )
+                    result.words = words
+                    result.ocr_source = source.name
+                    if opts.ocr_raster:
+                        font_path = _pick_font_path(opts.font)
+                        result.ocr_overlay, result.ocr_svg = _draw_ocr_overlay(base, words, font_path=font_path)
+                    else:
+                        result.ocr_svg = _build_ocr_svg(base, words)
             except Exception as e:
-                _eprint("OCR overlay failed:", str(e))
+                result.warnings.append(f"OCR overlay failed: {e}")
+            result.timings["ocr"] = time.perf_counter() - t0
+
+    result.timings["total"] = time.perf_counter() - t_start
+    return result
+
+
+WATCH_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff")
+
+
+def _is_watchable(path: Path) -> bool:
+    return path.suffix.lower() in WATCH_EXTS and not path.name.startswith(".")
+
+
+def _job_id(path: Path, st: os.stat_result) -> str:
+    # Same file content (path + size + mtime) is queued once, even across restarts.
+    key = f"{path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _write_json_atomic(path: Path, data: dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+class _JobQueue:
+    """On-disk FIFO of jobs: one JSON file per job, moved between state dirs with atomic renames.
+
+    Files are named `<enqueued_ns>-<job_id>.json` so pending jobs sort in arrival order.
+    """
+
+    STATES = ("pending", "running", "done", "failed")
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        for state in self.STATES:
+            _safe_mkdir(root / state)
+        self._known = {f.stem.split("-", 1)[-1] for state in self.STATES for f in (root / state).glob("*.json")}
+
+    def recover(self, max_attempts: int) -> int:
+        # Jobs left in running/ by a crash or kill go back to the front of the queue, unless they
+        # already used every attempt (an input that kills the process must not loop forever).
+        moved = 0
+        for f in sorted((self.root / "running").glob("*.json")):
+            try:
+                attempts = int(json.loads(f.read_text(encoding="utf-8")).get("attempts", 0))
+            except (OSError, ValueError):
+                attempts = 0
+            f.replace(self.root / ("failed" if attempts >= max_attempts else "pending") / f.name)
+            moved += 1
+        return moved
+
+    def enqueue(self, path: Path, out_root: Path) -> Optional[dict[str, Any]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        job_id = _job_id(path, st)
+        with self._lock:
+            if job_id in self._known:
+                return None
+            self._known.add(job_id)
+        job = {
+            "id": job_id,
+            "input": str(path.resolve()),
+            "outDir": str(out_root / f"{path.stem}-{job_id[:8]}"),
+            "attempts": 0,
+            "enqueuedAt": dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00", "Z"),
+        }
+        _write_json_atomic(self.root / "pending" / f"{time.time_ns():020d}-{job_id}.json", job)
+        return job
+
+    def claim(self) -> Optional[tuple[Path, dict[str, Any]]]:
+        # The attempt is counted on disk as soon as the job is claimed, so a crash mid-job still uses it up.
+        now = time.time()
+        with self._lock:
+            for f in sorted((self.root / "pending").glob("*.json")):
+                dest = self.root / "running" / f.name
+                try:
+                    job = json.loads(f.read_text(encoding="utf-8"))
+                    if float(job.get("retryAt", 0)) > now:
+                        continue
+                    f.replace(dest)
+                    job["attempts"] = int(job.get("attempts", 0)) + 1
+                    _write_json_atomic(dest, job)
+                    return dest, job
+                except (OSError, ValueError):
+                    continue
+        return None
+
+    def finish(self, job_file: Path, job: dict[str, Any], state: str) -> None:
+        _write_json_atomic(job_file, job)
+        job_file.replace(self.root / state / job_file.name)
+
+    def pending_count(self) -> int:
+        return sum(1 for _ in (self.root / "pending").glob("*.json"))
+
+
+class _Inotify:
+    """Minimal Linux inotify reader via ctypes (no extra dependency); raises OSError elsewhere."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, directory: Path) -> None:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not available on this platform")
+        fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Only complete files: closed after writing, or renamed into the folder.
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(directory)), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if wd < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {directory}")
+        self.fd = fd
+        self.directory = directory
+
+    def read(self, timeout: float) -> list[Path]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        out: list[Path] = []
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            _wd, mask, _cookie, name_len = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset : offset + name_len].rstrip(b"\0").decode("utf-8", errors="surrogateescape")
+            offset += name_len
+            if name and mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                out.append(self.directory / name)
+        return out
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _PollScanner:
+    """Polling scan: a file is ready once its size and mtime have been unchanged for `settle` seconds."""
+
+    def __init__(self, directory: Path, *, settle: float) -> None:
+        self.directory = directory
+        self.settle = settle
+        self._seen: dict[Path, tuple[tuple[int, int], float]] = {}
+
+    def scan(self) -> list[Path]:
+        now = time.monotonic()
+        ready: list[Path] = []
+        seen: dict[Path, tuple[tuple[int, int], float]] = {}
+        for f in self.directory.iterdir():
+            if not f.is_file() or not _is_watchable(f):
+                continue
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            prev = self._seen.get(f)
+            since = prev[1] if prev and prev[0] == sig else now
+            seen[f] = (sig, since)
+            if now - since >= self.settle:
+                ready.append(f)
+        self._seen = seen
+        return ready
+
+
+def _warm_models(mode: str, options: UpscaleOptions) -> None:
+    # Load every SR model the mode needs once, so the first job doesn't pay for it.
+    cv2 = _try_import_cv2()
+    if mode not in MODE_SR_VARIANTS or cv2 is None or not hasattr(cv2, "dnn_superres"):
+        return
+    caps = list(MODE_SR_VARIANTS[mode])
+    if mode == "best-text":
+        caps += list(X8_PATHS[options.x8])
+    for cap in caps:
+        model = _select_sr_model(cap)
+        path = _find_model_file(model.file, Path.cwd(), explicit_dir=options.model_dir)
+        if path is None and options.download_models:
+            path = _download_model(model.file, dest_dir=Path.cwd() / "tmp" / "opencv_sr_models")
+        if path is not None:
+            _get_superres(cv2, model_path=path, model_name=model.algo, scale=model.scale)
+
+
+def _run_watch_job(
+    queue: _JobQueue,
+    job_file: Path,
+    job: dict[str, Any],
+    args: argparse.Namespace,
+    options: UpscaleOptions,
+) -> None:
+    out_dir = Path(job["outDir"])
+    status_path = out_dir / "status.json"
+    started = time.perf_counter()
+    status: dict[str, Any] = {
+        "state": "running",
+        "jobId": job["id"],
+        "input": job["input"],
+        "attempt": job["attempts"],
+        "startedAt": dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00", "Z"),
+    }
+    state = "pending"
+    try:
+        _safe_mkdir(out_dir)
+        _write_json_atomic(status_path, status)
+        result = upscale(Image.open(job["input"]), args.mode, options)
+        prefix = f"{args.r2_prefix.strip().strip('/')}/{out_dir.name}" if args.upload_r2 else ""
+        compare_html, _, _ = _write_run(result, out_dir, args, stamp=out_dir.name, r2_prefix=prefix)
+        status.update(
+            state="done",
+            compareHtml=str(compare_html),
+            selected=result.selected or None,
+            warnings=result.warnings,
+            timings={k: round(v, 4) for k, v in result.timings.items()},
+        )
+        state = "done"
+    except Exception as e:
+        job["error"] = f"{type(e).__name__}: {e}"
+        if job["attempts"] >= int(args.max_attempts):
+            state = "failed"
+            status.update(state="failed", error=job["error"])
+        else:
+            # Exponential backoff: the job stays in pending/ but is not claimed before retryAt.
+            delay = float(args.retry_delay) * 2 ** (job["attempts"] - 1)
+            job["retryAt"] = time.time() + delay
+            status.update(state="queued", error=job["error"], retryInSeconds=round(delay, 1))
+        _eprint(f"Job {job['id']} ({job['input']}) failed (attempt {job['attempts']}):", str(e))
+    finally:
+        # Always leave running/, even if writing the status file fails; otherwise the job would
+        # sit there until the next restart.
+        try:
+            status["seconds"] = round(time.perf_counter() - started, 4)
+            status["finishedAt"] = dt.datetime.now(dt.timezone.utc).isoformat().replace("+00:00", "Z")
+            _write_json_atomic(status_path, status)
+        except OSError as e:
+            _eprint(f"Job {job['id']}: could not write {status_path}:", str(e))
+        finally:
+            queue.finish(job_file, job, state)
+    print(f"JOB_{'RETRY' if state == 'pending' else state.upper()}=", job["input"], "->", out_dir, flush=True)
+
+
+def _watch(args: argparse.Namespace, options: UpscaleOptions) -> int:
+    watch_dir = Path(args.watch).expanduser()
+    if not watch_dir.is_dir():
+        _eprint("Watch directory not found:", watch_dir)
+        return 2
+    out_root = Path(args.out_dir)
+    queue = _JobQueue(Path(args.queue_dir).expanduser() if str(args.queue_dir).strip() else out_root / ".queue")
+    recovered = queue.recover(int(args.max_attempts))
+    if recovered:
+        _eprint(f"Recovered {recovered} job(s) interrupted by a previous run.")
+
+    watcher: Optional[_Inotify] = None
+    if not args.poll:
+        try:
+            watcher = _Inotify(watch_dir)
+        except OSError as e:
+            _eprint("inotify unavailable; falling back to polling:", str(e))
+    scanner = _PollScanner(watch_dir, settle=float(args.poll_interval))
+
+    def enqueue(paths: Iterable[Path]) -> int:
+        queued = 0
+        for f in paths:
+            if f.is_file() and _is_watchable(f) and queue.enqueue(f, out_root):
+                _eprint("Queued:", f)
+                queued += 1
+        return queued
+
+    workers = max(1, int(args.workers))
+    _warm_models(args.mode, options)
+    _eprint(f"Watching {watch_dir} ({'inotify' if watcher else 'polling'}, {workers} worker(s), queue: {queue.root})")
+
+    # Backpressure: a job is claimed from disk only when a worker slot is free, so a burst of files
+    # waits as small queue entries instead of decoded images held in memory.
+    slots = threading.BoundedSemaphore(workers)
+    in_flight: set[Any] = set()
+    stop = threading.Event()
+    started = time.monotonic()
+    queued = 0
+
+    def handle_signal(signum, frame):  # noqa: ARG001
+        stop.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upscale") as pool:
+        try:
+            while not stop.is_set():
+                while slots.acquire(blocking=False):
+                    claimed = queue.claim()
+                    if claimed is None:
+                        slots.release()
+                        break
+                    fut = pool.submit(_run_watch_job, queue, *claimed, args, options)
+                    in_flight.add(fut)
+                    fut.add_done_callback(lambda f: (in_flight.discard(f), slots.release()))
+
+                # --once: stop once every file present had time to settle and nothing is queued or running.
+                settled = time.monotonic() - started > 3 * scanner.settle
+                if args.once and settled and not queued and not in_flight and queue.pending_count() == 0:
+                    break
+
+                queued = 0
+                if watcher is not None:
+                    queued += enqueue(watcher.read(timeout=float(args.poll_interval)))
+                else:
+                    stop.wait(float(args.poll_interval))
+                # The scan also catches what inotify can miss: files present at startup (or added
+                # while we were down) and dropped events on queue overflow. Job ids dedupe repeats.
+                queued += enqueue(scanner.scan())
+        except KeyboardInterrupt:
+            stop.set()
+        if stop.is_set():
+            _eprint(f"Stopping: waiting for {len(in_flight)} running job(s); {queue.pending_count()} stay queued.")
+    if watcher is not None:
+        watcher.close()
+    return 0
+
+
+def _options_from_args(args: argparse.Namespace, *, model_dir: Optional[Path]) -> UpscaleOptions:
+    return UpscaleOptions(
+        model_dir=model_dir,
+        download_models=args.download_models,
+        x8=args.x8,
+        benchmark_x8=args.benchmark_x8,
+        ocr_lang=args.ocr_lang,
+        ocr_psm=args.ocr_psm,
+        ocr_min_conf=args.ocr_min_conf,
+        ocr_raster=args.ocr_output in ("raster", "both"),
+        font=args.font.strip() or None,
+        metrics=not args.no_metrics,
+        target_quality=args.target_quality,
+    )
+
+
+def _write_run(
+    result: UpscaleResult,
+    out_dir: Path,
+    args: argparse.Namespace,
+    *,
+    stamp: str,
+    r2_prefix: str,
+) -> tuple[Path, Path, dict[str, str]]:
+    # Writes every artifact of one run into out_dir; returns (compare.html, compare.r2.html, uploaded URLs).
+    # Normalized input as a stable RGB PNG.
+    rgb = result.original
+    original_path = out_dir / "original.png"
+    rgb.save(original_path, format="PNG", optimize=True)
+
+    items_local: list[dict[str, str]] = [
+        {"label": "Original", "src": "original.png", "note": f"{rgb.width}×{rgb.height}", "href": "original.png"}
+    ]
+    for v in result.variants:
+        path = out_dir / f"{v.name}.png"
+        v.save(path)
+        note = v.note
+        if v.name in result.metrics:
+            note = f"{note} · {_format_metrics_note(result.metrics[v.name])}"
+        if v.name == result.selected:
+            note = f"✓ Selected (target {args.target_quality}) · {note}"
+        items_local.append({"label": v.label, "src": path.name, "note": note, "href": path.name})
+
+    if result.metrics:
+        metrics_doc = {
+            "analysisScale": METRIC_ANALYSIS_SCALE,
+            "targetQuality": args.target_quality,
+            "selected": result.selected or None,
+            "variants": result.metrics,
+        }
+        (out_dir / "metrics.json").write_text(json.dumps(metrics_doc, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if result.benchmark_x8:
+        (out_dir / "benchmark_x8.json").write_text(json.dumps(result.benchmark_x8, ensure_ascii=False, indent=2), encoding="utf-8")
+        _eprint("×8 benchmark:", json.dumps(result.benchmark_x8, ensure_ascii=False))
+    (out_dir / "timings.json").write_text(
+        json.dumps({k: round(v, 4) for k, v in result.timings.items()}, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    # OCR overlay (only in best-text mode).
+    ocr_png = out_dir / "ocr_overlay_x8.png"
+    ocr_svg = out_dir / "ocr_overlay_x8_text.svg"
+    ocr_html = out_dir / "ocr_overlay_x8.html"
+    ocr_extra: list[Path] = []
+    if result.ocr_svg:
+        ocr_svg.write_text(result.ocr_svg, encoding="utf-8")
+        if result.ocr_overlay is not None:
+            result.ocr_overlay.save(ocr_png, format="PNG", optimize=True)
+            items_local.append(
+                {"label": "OCR Text Overlay ×8", "src": ocr_png.name, "note": "Best readability for small text", "href": ocr_png.name}
+            )
+        if args.ocr_output in ("vector", "both"):
+            if args.ocr_base == "pipeline":
+                base_path = out_dir / f"{result.ocr_source}.png"
+            else:
+                base_rgb = result.variant(result.ocr_source).to_pil()
+                base_path = _save_ocr_base(base_rgb, out_dir, fmt=args.ocr_base, quality=args.ocr_base_quality)
+                ocr_extra.append(base_path)
+            _write_ocr_overlay_html(ocr_html, title=f"OCR Text Layer · {stamp}", base_src=base_path.name, svg_text=result.ocr_svg)
+            ocr_extra.append(ocr_html)
+            items_local.append(
+                {
+                    "label": "OCR Text Layer ×8 (SVG)",
+                    "src": base_path.name,
+                    "overlay": ocr_svg.name,
+                    "note": f"Vector text over {base_path.name} (no raster re-encode)",
+                    "href": ocr_html.name,
+                }
+            )
 
     # Local compare page.
     compare_html = out_dir / "compare.html"
@@ -755,15 +1575,14 @@ def main() -> int:
     compare_r2_html = out_dir / "compare.r2.html"
     uploaded_urls: dict[str, str] = {}
     if args.upload_r2:
-        if not args.r2_prefix.strip():
-            raise RuntimeError("--upload-r2 requires --r2-prefix (for deterministic keys).")
         upload_files = [out_dir / it["src"] for it in items_local if (out_dir / it["src"]).exists()]
-        # Also upload the SVG text layer if present.
-        if ocr_svg.exists():
-            upload_files.append(ocr_svg)
+        # Also upload the SVG text layer (and its viewer/base) if present.
+        for extra in [ocr_svg, *ocr_extra]:
+            if extra.exists() and extra not in upload_files:
+                upload_files.append(extra)
         # Upload compare.html (optional) for sharing.
         upload_files.append(compare_html)
-        uploaded_urls = _upload_to_r2(upload_files, prefix=args.r2_prefix.strip())
+        uploaded_urls = _upload_to_r2(upload_files, prefix=r2_prefix)
 
         items_r2 = []
         for it in items_local:
@@ -772,12 +1591,110 @@ def main() -> int:
             if not url:
                 # Fall back to local relative paths in case public base is not set.
                 url = name
-            items_r2.append({**it, "src": url, "href": url})
+            r2_item = {**it, "src": url, "href": uploaded_urls.get(it.get("href", name), "") or it.get("href", name)}
+            if it.get("overlay"):
+                r2_item["overlay"] = uploaded_urls.get(it["overlay"], "") or it["overlay"]
+            items_r2.append(r2_item)
         # Compare page itself: link to uploaded compare.html if present.
         _write_compare_html(compare_r2_html, title=f"Image Upscale Best (R2) · {stamp}", items=items_r2)
 
+    return compare_html, compare_r2_html, uploaded_urls
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Local-first upscale + clarity pipeline (EDSR/FSRCNN + OCR overlay).")
+    ap.add_argument("--in", dest="input_path", default="", help="Input image path")
+    ap.add_argument(
+        "--mode",
+        default="best-text",
+        choices=list(MODES),
+        help="best-text: EDSR×4→×2 + OCR overlay; quality: EDSR×4; fast: FSRCNN×4; traditional: CLAHE+Unsharp×8",
+    )
+    ap.add_argument("--out-dir", default="tmp/image-upscale-best", help="Output directory root")
+    ap.add_argument("--model-dir", default="", help="Optional directory containing SR models (.pb)")
+    ap.add_argument("--download-models", action="store_true", help="Download missing models (needs network)")
+    ap.add_argument("--list-models", action="store_true", help="Print the SR model registry (and local availability) and exit")
+    ap.add_argument(
+        "--x8",
+        default="chain",
+        choices=sorted(X8_PATHS),
+        help="best-text ×8 path: chain (EDSR×4 → FSRCNN×2, default) or lapsrn (single LapSRN×8 pass)",
+    )
+    ap.add_argument(
+        "--benchmark-x8",
+        action="store_true",
+        help="best-text: also run the other ×8 path and write benchmark_x8.json with timings",
+    )
+    ap.add_argument(
+        "--target-quality",
+        type=float,
+        default=None,
+        help="Stop at the cheapest variant whose quality score (0-1, see metrics.json) reaches this, e.g. 0.8",
+    )
+    ap.add_argument("--no-metrics", action="store_true", help="Skip per-variant quality metrics (metrics.json)")
+    ap.add_argument("--font", default="", help="Optional TTF/TTC path for OCR overlay rendering")
+    ap.add_argument("--ocr-lang", default="eng", help="Tesseract language (default: eng)")
+    ap.add_argument("--ocr-psm", type=int, default=6, help="Tesseract PSM (default: 6)")
+    ap.add_argument("--ocr-min-conf", type=float, default=70.0, help="Min OCR confidence (0-100, default: 70)")
+    ap.add_argument(
+        "--ocr-output",
+        default="vector",
+        choices=["vector", "raster", "both"],
+        help="vector: SVG/HTML text layer over a base image (default); raster: composite ocr_overlay_x8.png; both",
+    )
+    ap.add_argument(
+        "--ocr-base",
+        default="pipeline",
+        choices=["pipeline", "jpeg", "webp"],
+        help="Base under the vector text layer: reuse the OCR source image (default) or write a compressed copy",
+    )
+    ap.add_argument("--ocr-base-quality", type=int, default=82, help="JPEG/WebP quality for --ocr-base (default: 82)")
+    ap.add_argument("--watch", default="", help="Watch a folder and upscale every new image (runs until Ctrl-C/SIGTERM)")
+    ap.add_argument("--queue-dir", default="", help="Persistent job queue for --watch (default: <out-dir>/.queue)")
+    ap.add_argument("--workers", type=int, default=1, help="--watch: max images processed concurrently (default: 1)")
+    ap.add_argument("--poll", action="store_true", help="--watch: force polling instead of inotify")
+    ap.add_argument("--poll-interval", type=float, default=2.0, help="--watch: seconds between polls/queue checks (default: 2)")
+    ap.add_argument("--max-attempts", type=int, default=2, help="--watch: attempts per job before it is marked failed")
+    ap.add_argument("--retry-delay", type=float, default=30.0, help="--watch: seconds before the first retry of a failed job; doubles on each further attempt")
+    ap.add_argument("--once", action="store_true", help="--watch: drain the folder and queue, then exit")
+    ap.add_argument("--upload-r2", action="store_true", help="Upload outputs to Cloudflare R2 (needs env + network)")
+    ap.add_argument("--r2-prefix", default="", help="R2 key prefix, e.g. image-upscale/case/20260123-xxxxxx")
+    args = ap.parse_args()
+
+    model_dir = Path(args.model_dir).expanduser() if str(args.model_dir).strip() else None
+    if args.list_models:
+        _print_model_registry(Path.cwd(), model_dir=model_dir)
+        return 0
+    if args.upload_r2 and not args.r2_prefix.strip():
+        ap.error("--upload-r2 requires --r2-prefix (for deterministic keys).")
+    options = _options_from_args(args, model_dir=model_dir)
+    if str(args.watch).strip():
+        return _watch(args, options)
+    if not str(args.input_path).strip():
+        ap.error("--in is required (or use --watch DIR)")
+
+    input_path = Path(args.input_path).expanduser()
+    if not input_path.exists():
+        _eprint("Input not found:", input_path)
+        return 2
+
+    out_root = Path(args.out_dir)
+    stamp = _ts()
+    out_dir = out_root / stamp
+    _safe_mkdir(out_dir)
+
+    result = upscale(Image.open(input_path), args.mode, options)
+    for msg in result.warnings:
+        _eprint(msg)
+
+    compare_html, compare_r2_html, uploaded_urls = _write_run(
+        result, out_dir, args, stamp=stamp, r2_prefix=args.r2_prefix.strip()
+    )
+
     print("OUT_DIR=", out_dir)
     print("COMPARE_HTML=", compare_html)
+    if result.selected:
+        print("SELECTED=", out_dir / f"{result.selected}.png")
     if uploaded_urls:
         print("R2_PREFIX=", args.r2_prefix.strip())
         if "compare.html" in uploaded_urls:
@@ -0,0 +1,26 @@
+import unittest
+
+import numpy as np
+
+from upscale_best import _ssim
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+class TestSsim(unittest.TestCase):
+
+    def test_flat_images_large(self):
+        """Two flat images have a closed-form SSIM; a 2000x2000 input must still reach it"""
+        a = np.full((2000, 2000), 230, dtype=np.float32)
+        b = np.full((2000, 2000), 200, dtype=np.float32)
+        c1 = (0.01 * 255) ** 2
+        expected = (2 * 230 * 200 + c1) / (230**2 + 200**2 + c1)
+        self.assertAlmostEqual(_ssim(np, a, b), expected, places=4)
+
+    def test_identical_images(self):
+        rng = np.random.default_rng(0)
+        a = (rng.random((500, 500)) * 255).astype(np.float32)
+        self.assertAlmostEqual(_ssim(np, a, a), 1.0, places=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
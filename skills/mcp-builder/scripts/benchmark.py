@@ -0,0 +1,251 @@
+"""Harness Benchmark Suite
+
+Measures the overhead of evaluation.py and connections.py themselves, using the bundled
+mock_server.py and the scripted mock_model client, so no network or API key is needed:
+
+- connection setup: time to start and initialize a session (stdio and/or streamable HTTP)
+- per-turn overhead: agent-loop time per turn beyond the raw tool call round trip
+- concurrency scaling: task throughput at increasing concurrency vs. the ideal
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from connections import create_connection, create_connection_pool
+from evaluation import evaluate_single_task
+from mock_model import ScriptedClient
+
+MOCK_SERVER = Path(__file__).with_name("mock_server.py")
+
+
+def _server_args(args: argparse.Namespace) -> list[str]:
+    return [
+        str(MOCK_SERVER),
+        "--latency-ms", str(args.tool_latency_ms),
+        "--payload-bytes", str(args.payload_bytes),
+        "--extra-tools", str(args.extra_tools),
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def http_server(args: argparse.Namespace):
+    """Run mock_server.py over streamable HTTP for the duration of the block; yields its URL."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, *_server_args(args), "--transport", "http", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            with socket.socket() as s:
+                if s.connect_ex(("127.0.0.1", port)) == 0:
+                    break
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError("mock_server.py did not start")
+            time.sleep(0.05)
+        yield f"http://127.0.0.1:{port}/mcp"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _connection_kwargs(transport: str, args: argparse.Namespace, url: str | None) -> dict[str, Any]:
+    if transport == "stdio":
+        return {"command": sys.executable, "args": _server_args(args)}
+    return {"url": url}
+
+
+def _ms(values: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": statistics.median(values) * 1000,
+        "mean_ms": statistics.fmean(values) * 1000,
+        "min_ms": min(values) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+async def bench_connection_setup(transport: str, kwargs: dict[str, Any], repeats: int) -> dict[str, Any]:
+    """Open -> initialize -> first list_tools -> close, `repeats` times."""
+    connect, first_list = [], []
+    for _ in range(repeats):
+        connection = create_connection(transport=transport, **kwargs)
+        start = time.perf_counter()
+        async with connection:
+            opened = time.perf_counter()
+            await connection.list_tools()
+            listed = time.perf_counter()
+        connect.append(opened - start)
+        first_list.append(listed - opened)
+    return {"connect": _ms(connect), "first_list_tools": _ms(first_list)}
+
+
+async def _run_tasks(
+    client: ScriptedClient,
+    connection: Any,
+    tools: list[dict[str, Any]],
+    count: int,
+    concurrency: int,
+    stream: bool,
+) -> list[dict[str, Any]]:
+    """Same scheduling as run_evaluation, on synthetic tasks, with the per-task output silenced."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(i: int) -> dict[str, Any]:
+        async with semaphore:
+            qa_pair = {"question": f"Benchmark task {i}", "answer": "mock"}
+            return await evaluate_single_task(client, "mock-model", qa_pair, tools, connection, i, stream=stream)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return await asyncio.gather(*(run(i) for i in range(count)))
+
+
+async def bench_turn_overhead(connection: Any, args: argparse.Namespace) -> dict[str, Any]:
+    """Per-turn agent-loop time vs. a bare call_tool round trip, with a zero-latency model."""
+    tools = await connection.list_tools()
+    raw = []
+    async with connection.lease() as session:
+        for i in range(args.repeats * 10):
+            start = time.perf_counter()
+            await session.call_tool("lookup", {"key": str(i)})
+            raw.append(time.perf_counter() - start)
+
+    client = ScriptedClient(turns=args.turns, tools_per_turn=1)
+    results = await _run_tasks(client, connection, tools, args.repeats, 1, args.stream)
+    per_turn = [
+        (r["total_duration"] - sum(t["model_seconds"] for t in r["api"]["turns"])) / args.turns for r in results
+    ]
+    raw_ms = _ms(raw)
+    turn_ms = _ms(per_turn)
+    return {
+        "raw_call_tool": raw_ms,
+        "turn_excluding_model": turn_ms,
+        "harness_overhead_per_turn_ms": turn_ms["p50_ms"] - raw_ms["p50_ms"],
+    }
+
+
+async def bench_concurrency(connection: Any, args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Task throughput at each concurrency level, with simulated model and tool latency."""
+    tools = await connection.list_tools()
+    client = ScriptedClient(turns=args.turns, tools_per_turn=args.tools_per_turn, latency_s=args.model_latency_ms / 1000)
+    rows = []
+    for level in args.concurrency:
+        tasks = max(args.tasks, level)
+        start = time.perf_counter()
+        results = await _run_tasks(client, connection, tools, tasks, level, args.stream)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "concurrency": level,
+            "tasks": tasks,
+            "seconds": elapsed,
+            "tasks_per_s": tasks / elapsed,
+            "task_p50_ms": statistics.median(r["total_duration"] for r in results) * 1000,
+        })
+    base = rows[0]["tasks_per_s"] / rows[0]["concurrency"]
+    for row in rows:
+        row["efficiency"] = row["tasks_per_s"] / (base * row["concurrency"])
+    return rows
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = ["# Harness Benchmark", ""]
+    for transport, section in report.items():
+        setup, turn = section["setup"], section["turn_overhead"]
+        lines += [
+            f"## {transport}",
+            "",
+            f"- **Connect + initialize**: p50 {setup['connect']['p50_ms']:.1f} ms (min {setup['connect']['min_ms']:.1f}, max {setup['connect']['max_ms']:.1f})",
+            f"- **First list_tools**: p50 {setup['first_list_tools']['p50_ms']:.1f} ms",
+            f"- **Raw call_tool round trip**: p50 {turn['raw_call_tool']['p50_ms']:.2f} ms",
+            f"- **Turn time excluding model**: p50 {turn['turn_excluding_model']['p50_ms']:.2f} ms",
+            f"- **Harness overhead per turn**: {turn['harness_overhead_per_turn_ms']:.2f} ms",
+            "",
+            "| Concurrency | Tasks | Seconds | Tasks/s | Task p50 (ms) | Scaling efficiency |",
+            "|---:|---:|---:|---:|---:|---:|",
+        ]
+        for row in section["concurrency"]:
+            lines.append(
+                f"| {row['concurrency']} | {row['tasks']} | {row['seconds']:.2f} | {row['tasks_per_s']:.1f} | "
+                f"{row['task_p50_ms']:.1f} | {row['efficiency'] * 100:.0f}% |"
+            )
+        lines.append("")
+    return "\n".join(lines)
+
+
+async def run_suite(args: argparse.Namespace) -> dict[str, Any]:
+    report = {}
+    transports = ["stdio", "http"] if args.transport == "both" else [args.transport]
+    for transport in transports:
+        print(f"⏱️  Benchmarking {transport}...")
+        with http_server(args) if transport == "http" else contextlib.nullcontext() as url:
+            kwargs = _connection_kwargs(transport, args, url)
+            section = {"setup": await bench_connection_setup(transport, kwargs, args.repeats)}
+            if args.pool_size > 1:
+                connection = create_connection_pool(args.pool_size, transport, **kwargs)
+            else:
+                connection = create_connection(transport=transport, **kwargs)
+            async with connection:
+                section["turn_overhead"] = await bench_turn_overhead(connection, args)
+                section["concurrency"] = await bench_concurrency(connection, args)
+        report[transport] = section
+    return report
+
+
+def _parse_levels(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the evaluation harness against the bundled mock server and mock model",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Pure harness overhead (zero-latency server and model), both transports
+  python benchmark.py --transport both --model-latency-ms 0
+
+  # Scaling with realistic-ish latencies and a large tool catalog
+  python benchmark.py --tool-latency-ms 20 --model-latency-ms 500 --extra-tools 50 --concurrency 1,8,32,128
+        """,
+    )
+    parser.add_argument("-t", "--transport", choices=["stdio", "http", "both"], default="stdio", help="Transport(s) to benchmark (default: stdio)")
+    parser.add_argument("--repeats", type=int, default=10, help="Repetitions for setup and per-turn measurements (default: 10)")
+    parser.add_argument("--turns", type=int, default=3, help="Tool-use turns per scripted task (default: 3)")
+    parser.add_argument("--tools-per-turn", type=int, default=2, help="Parallel tool calls per turn in the scaling test (default: 2)")
+    parser.add_argument("--tasks", type=int, default=32, help="Tasks per concurrency level (default: 32)")
+    parser.add_argument("--concurrency", type=_parse_levels, default=[1, 4, 16, 64], help="Concurrency levels (default: 1,4,16,64)")
+    parser.add_argument("--model-latency-ms", type=float, default=100.0, help="Simulated model latency per turn in the scaling test (default: 100)")
+    parser.add_argument("--tool-latency-ms", type=float, default=0.0, help="Mock server delay per tool call (default: 0)")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="Mock lookup result size (default: 256)")
+    parser.add_argument("--extra-tools", type=int, default=0, help="Extra no-op tools on the mock server (default: 0)")
+    parser.add_argument("--pool-size", type=int, default=1, help="Server sessions for the overhead and scaling tests (default: 1)")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming code path")
+    parser.add_argument("-o", "--output", type=Path, help="Also write the raw results as JSON")
+    args = parser.parse_args()
+
+    report = await run_suite(args)
+    print("\n" + format_report(report))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
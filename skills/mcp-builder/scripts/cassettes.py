@@ -0,0 +1,307 @@
+"""Record/replay cassettes for evaluation runs.
+
+A cassette is a JSONL file with one line per model call (`messages.create`) or MCP
+exchange (`list_tools`, `call_tool`). Recording wraps the real client and connection;
+replaying serves the recorded responses back through stand-ins, matched by a hash of
+the request, so a run can be repeated offline and at disk speed.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator
+
+from anthropic.types import Message
+from mcp import types
+
+from connections import ToolCallTimeout
+
+# Tracebacks in tool results depend on the code path that raised them (live connection vs
+# replay stand-in), so they are left out of request hashes.
+_TRACEBACK_RE = re.compile(r"Traceback \(most recent call last\):.*", re.DOTALL)
+
+
+class CassetteMiss(KeyError):
+    """A replayed run made a request that is not on the cassette."""
+
+
+def _jsonable(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, str):
+        return _TRACEBACK_RE.sub("", value)
+    return value
+
+
+def request_key(kind: str, request: dict[str, Any]) -> str:
+    """Stable hash of one request."""
+    canonical = json.dumps([kind, _jsonable(request)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded exchanges, keyed by request hash.
+
+    Identical requests are answered in the order they were recorded; once the recorded
+    answers run out the last one is repeated.
+    """
+
+    def __init__(self, path: Path, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._entries: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+        self._last: dict[str, dict[str, Any]] = {}
+        if mode == "record":
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("")
+        else:
+            for line in path.read_text().splitlines():
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def record(
+        self,
+        kind: str,
+        request: dict[str, Any],
+        response: Any = None,
+        error: str | None = None,
+        error_type: str | None = None,
+        is_error: bool = False,
+    ) -> None:
+        entry = {"kind": kind, "key": request_key(kind, request), "request": _jsonable(request)}
+        if error is not None:
+            entry["error"] = error
+            if error_type:
+                entry["error_type"] = error_type
+        else:
+            entry["response"] = _jsonable(response)
+            # A tool result the server flagged as an error (CallToolResult.isError)
+            if is_error:
+                entry["is_error"] = True
+        with self._lock:
+            with self.path.open("a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def play(self, kind: str, request: dict[str, Any]) -> dict[str, Any]:
+        key = request_key(kind, request)
+        with self._lock:
+            queue = self._entries.get(key)
+            if queue:
+                self._last[key] = queue.popleft()
+            elif key not in self._last:
+                raise CassetteMiss(f"No recorded {kind} matches this request ({key[:12]}) in {self.path}")
+            self.hits += 1
+            return self._last[key]
+
+    def find(self, kind: str) -> dict[str, Any] | None:
+        """First recorded entry of a kind, regardless of request."""
+        for queue in self._entries.values():
+            for entry in queue:
+                if entry["kind"] == kind:
+                    return entry
+        return None
+
+
+class _RecordingStream:
+    """Wraps a message stream; the final message is recorded like a messages.create response."""
+
+    def __init__(self, manager: Any, cassette: Cassette, request: dict[str, Any]):
+        self._manager = manager
+        self._cassette = cassette
+        self._request = request
+        self._stream = None
+
+    async def __aenter__(self):
+        self._stream = await self._manager.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return await self._manager.__aexit__(exc_type, exc_val, exc_tb)
+
+    def __aiter__(self):
+        return self._stream.__aiter__()
+
+    async def get_final_message(self) -> Any:
+        response = await self._stream.get_final_message()
+        self._cassette.record("messages.create", self._request, response)
+        return response
+
+
+class _RecordingMessages:
+    def __init__(self, messages: Any, cassette: Cassette):
+        self._messages = messages
+        self._cassette = cassette
+
+    async def create(self, **kwargs: Any) -> Any:
+        response = await self._messages.create(**kwargs)
+        self._cassette.record("messages.create", kwargs, response)
+        return response
+
+    def stream(self, **kwargs: Any) -> _RecordingStream:
+        return _RecordingStream(self._messages.stream(**kwargs), self._cassette, kwargs)
+
+
+class RecordingClient:
+    """Async Anthropic client wrapper that writes every model exchange to a cassette.
+
+    Streamed and non-streamed requests are recorded the same way, so a cassette can be
+    replayed either way.
+    """
+
+    def __init__(self, client: Any, cassette: Cassette):
+        self._client = client
+        self.messages = _RecordingMessages(client.messages, cassette)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class _ReplayStream:
+    """Replays a recorded message as a stream of content_block_stop events."""
+
+    def __init__(self, message: Message):
+        self._message = message
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aiter__(self):
+        for index, block in enumerate(self._message.content):
+            yield SimpleNamespace(type="content_block_stop", index=index, content_block=block)
+
+    async def get_final_message(self) -> Message:
+        return self._message
+
+
+class _ReplayMessages:
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    async def create(self, **kwargs: Any) -> Message:
+        entry = self._cassette.play("messages.create", kwargs)
+        return Message.model_validate(entry["response"])
+
+    def stream(self, **kwargs: Any) -> _ReplayStream:
+        entry = self._cassette.play("messages.create", kwargs)
+        return _ReplayStream(Message.model_validate(entry["response"]))
+
+
+class ReplayClient:
+    """Stand-in for the async Anthropic client that answers from a cassette."""
+
+    def __init__(self, cassette: Cassette):
+        self.messages = _ReplayMessages(cassette)
+
+
+class RecordingConnection:
+    """Connection (or pool) wrapper that writes every list_tools/call_tool exchange to a cassette."""
+
+    def __init__(self, connection: Any, cassette: Cassette):
+        self._connection = connection
+        self._cassette = cassette
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    async def __aenter__(self):
+        await self._connection.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return await self._connection.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def list_tools(self, refresh: bool = False) -> list[dict[str, Any]]:
+        tools = await self._connection.list_tools(refresh=refresh)
+        self._cassette.record("list_tools", {}, tools)
+        return tools
+
+    async def call_tool_result(
+        self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None
+    ) -> types.CallToolResult:
+        request = {"name": tool_name, "arguments": arguments}
+        try:
+            result = await self._connection.call_tool_result(tool_name, arguments, timeout)
+        except Exception as e:
+            self._cassette.record("call_tool", request, error=str(e), error_type=type(e).__name__)
+            raise
+        self._cassette.record("call_tool", request, result.content, is_error=result.isError)
+        return result
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None) -> Any:
+        return (await self.call_tool_result(tool_name, arguments, timeout)).content
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["RecordingConnection"]:
+        async with self._connection.lease() as connection:
+            yield RecordingConnection(connection, self._cassette)
+
+
+class ReplayedToolError(RuntimeError):
+    """A tool call that failed when the cassette was recorded."""
+
+
+class ReplayConnection:
+    """Stand-in for an MCP connection that answers from a cassette."""
+
+    server_info = None
+
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def server_key(self) -> str:
+        return f"cassette:{self._cassette.path}"
+
+    def invalidate_tools(self) -> None:
+        pass
+
+    def reconnect_stats(self) -> dict[str, Any]:
+        return {"reconnects": 0, "downtime_seconds": 0.0}
+
+    async def list_tools(self, refresh: bool = False) -> list[dict[str, Any]]:
+        entry = self._cassette.find("list_tools")
+        if entry is None:
+            raise CassetteMiss(f"No tool list recorded in {self._cassette.path}")
+        return entry["response"]
+
+    async def call_tool_result(
+        self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None
+    ) -> types.CallToolResult:
+        entry = self._cassette.play("call_tool", {"name": tool_name, "arguments": arguments})
+        if "error" in entry:
+            if entry.get("error_type") == "ToolCallTimeout":
+                raise ToolCallTimeout(entry["error"])
+            raise ReplayedToolError(entry["error"])
+        response = entry["response"]
+        if not isinstance(response, list):
+            response = [{"type": "text", "text": response if isinstance(response, str) else json.dumps(response)}]
+        return types.CallToolResult.model_validate({"content": response, "isError": entry.get("is_error", False)})
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None) -> Any:
+        return (await self.call_tool_result(tool_name, arguments, timeout)).content
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["ReplayConnection"]:
+        yield self
@@ -1,80 +1,317 @@
 """Lightweight connection handling for MCP servers."""
 
+import asyncio
+import collections
+import datetime as dt
+import functools
+import hashlib
+import json
+import random
+import time
 from abc import ABC, abstractmethod
-from contextlib import AsyncExitStack
-from typing import Any
-
-from mcp import ClientSession, StdioServerParameters
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+
+import anyio
+import httpx
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.shared.exceptions import McpError
 from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
 from mcp.client.streamable_http import streamablehttp_client
 
 
+# Errors that mean the transport is gone rather than that a request failed.
+TRANSPORT_ERRORS = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    httpx.TransportError,
+)
+
+
+class ToolCallTimeout(TimeoutError):
+    """A tool call got no response within its deadline (the request was cancelled)."""
+
+
+def _is_transport_error(error: BaseException) -> bool:
+    if isinstance(error, McpError):
+        return error.error.code == types.CONNECTION_CLOSED
+    return isinstance(error, TRANSPORT_ERRORS)
+
+
 class MCPConnection(ABC):
-    """Base class for MCP server connections."""
+    """Base class for MCP server connections.
 
-    def __init__(self):
+    The transport and session live in a dedicated owner task (anyio contexts must be
+    exited by the task that entered them). When the transport dies — the stdio process
+    exits, or the HTTP/SSE stream fails — the owner task rebuilds it with jittered
+    exponential backoff, and `list_tools` plus idempotent `call_tool`s are retried on the
+    new session. `reconnects` and `downtime_seconds` record what happened.
+    """
+
+    def __init__(
+        self,
+        max_reconnect_attempts: int = 5,
+        reconnect_base_delay: float = 0.5,
+        reconnect_max_delay: float = 30.0,
+        retry_tool_calls: bool = False,
+    ):
         self.session = None
-        self._stack = None
+        self.server_info = None
+        self._tools_cache = None
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.reconnect_base_delay = reconnect_base_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        # Tool calls are retried after a reconnect only if the tool is annotated read-only or
+        # idempotent, or if this is set (e.g. for evaluations, which must be read-only anyway).
+        self.retry_tool_calls = retry_tool_calls
+        self.reconnects = 0
+        self.downtime_seconds = 0.0
+        self._idempotent_tools: set[str] = set()
+        self._cancellations: set[asyncio.Task] = set()
+        self._owner: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+        self._reconnect: asyncio.Event | None = None
+        self._lost: asyncio.Event | None = None
+        self._closing = False
+        self._error: BaseException | None = None
+        self._generation = 0
 
     @abstractmethod
     def _create_context(self):
         """Create the connection context based on connection type."""
 
+    @abstractmethod
+    def server_key(self) -> str:
+        """Stable identity of the server this connects to (command line or URL)."""
+
+    def invalidate_tools(self) -> None:
+        """Drop the cached tool list; the next list_tools() asks the server again."""
+        self._tools_cache = None
+
+    def reconnect_stats(self) -> dict[str, Any]:
+        return {"reconnects": self.reconnects, "downtime_seconds": self.downtime_seconds}
+
+    async def _handle_message(self, message: Any) -> None:
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self.invalidate_tools()
+
+    def _transport_lost(self, generation: int) -> None:
+        """Ask the owner task to rebuild the session, unless that already happened."""
+        if generation == self._generation and not self._closing:
+            self._ready.clear()
+            self._lost.set()
+            self._reconnect.set()
+
+    async def _open(self, stack: AsyncExitStack) -> ClientSession:
+        """Enter transport and session on `stack`, in the owner task."""
+        result = await stack.enter_async_context(self._create_context())
+
+        if len(result) == 2:
+            read, write = result
+        elif len(result) == 3:
+            read, write, _ = result
+        else:
+            raise ValueError(f"Unexpected context result: {result}")
+
+        # Messages pass through a pump so a closed read stream, or a transport error the
+        # client delivers in-band, is noticed even while no request is waiting.
+        generation = self._generation + 1
+        forward, session_read = anyio.create_memory_object_stream(0)
+        task_group = await stack.enter_async_context(anyio.create_task_group())
+        stack.callback(task_group.cancel_scope.cancel)
+
+        async def pump() -> None:
+            async with forward:
+                async for message in read:
+                    await forward.send(message)
+                    if isinstance(message, TRANSPORT_ERRORS):
+                        break
+            self._transport_lost(generation)
+
+        task_group.start_soon(pump)
+
+        session_ctx = ClientSession(session_read, write, message_handler=self._handle_message)
+        session = await stack.enter_async_context(session_ctx)
+        init_result = await session.initialize()
+        self.server_info = init_result.serverInfo
+        return session
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.reconnect_max_delay, self.reconnect_base_delay * 2**attempt))
+
+    async def _own(self) -> None:
+        attempt = 0
+        down_since = None
+        while not self._closing:
+            try:
+                async with AsyncExitStack() as stack:
+                    self.session = await self._open(stack)
+                    self._generation += 1
+                    self._lost = asyncio.Event()
+                    if down_since is not None:
+                        self.reconnects += 1
+                        self.downtime_seconds += time.monotonic() - down_since
+                        down_since = None
+                    attempt = 0
+                    self._error = None
+                    self._reconnect.clear()
+                    self._ready.set()
+                    await self._reconnect.wait()
+            except Exception as e:
+                self._error = e
+            self.session = None
+            self._ready.clear()
+            if self._closing:
+                break
+            if self._generation == 0:
+                # Never connected: report the error to __aenter__ instead of retrying.
+                break
+            if down_since is None:
+                down_since = time.monotonic()
+            if attempt >= self.max_reconnect_attempts:
+                self._error = ConnectionError(
+                    f"MCP server unreachable after {attempt} reconnect attempts: {self._error}"
+                )
+                break
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+        self._ready.set()
+
+    async def _session(self) -> tuple[ClientSession, int, asyncio.Event]:
+        """The live session (waiting out a reconnect), its generation and its lost event."""
+        await self._ready.wait()
+        if self.session is None:
+            raise self._error or ConnectionError("MCP connection is closed")
+        return self.session, self._generation, self._lost
+
+    async def _request(self, fn: Callable[[ClientSession], Any], idempotent: bool) -> Any:
+        """Run `fn(session)`; on a transport failure reconnect, and retry if idempotent."""
+        while True:
+            session, generation, lost = await self._session()
+            # A request in flight when the transport dies would never be answered, so it
+            # races the session's lost event.
+            call = asyncio.ensure_future(fn(session))
+            lost_wait = asyncio.ensure_future(lost.wait())
+            try:
+                await asyncio.wait({call, lost_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                lost_wait.cancel()
+                if not call.done():
+                    call.cancel()
+            try:
+                if not call.done() or call.cancelled():
+                    raise ConnectionError("MCP transport lost during request")
+                return call.result()
+            except Exception as e:
+                if not _is_transport_error(e):
+                    raise
+                self._transport_lost(generation)
+                if not idempotent:
+                    raise
+
     async def __aenter__(self):
         """Initialize MCP server connection."""
-        self._stack = AsyncExitStack()
-        await self._stack.__aenter__()
-
-        try:
-            ctx = self._create_context()
-            result = await self._stack.enter_async_context(ctx)
-
-            if len(result) == 2:
-                read, write = result
-            elif len(result) == 3:
-                read, write, _ = result
-            else:
-                raise ValueError(f"Unexpected context result: {result}")
-
-            session_ctx = ClientSession(read, write)
-            self.session = await self._stack.enter_async_context(session_ctx)
-            await self.session.initialize()
-            return self
-        except BaseException:
-            await self._stack.__aexit__(None, None, None)
-            raise
+        self._closing = False
+        self._ready = asyncio.Event()
+        self._reconnect = asyncio.Event()
+        self._owner = asyncio.create_task(self._own())
+        await self._ready.wait()
+        if self.session is None:
+            await self._owner
+            raise self._error
+        return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Clean up MCP server connection resources."""
-        if self._stack:
-            await self._stack.__aexit__(exc_type, exc_val, exc_tb)
+        self._closing = True
+        if self._owner is not None:
+            self._reconnect.set()
+            await asyncio.gather(self._owner, return_exceptions=True)
+        self._owner = None
         self.session = None
-        self._stack = None
-
-    async def list_tools(self) -> list[dict[str, Any]]:
-        """Retrieve available tools from the MCP server."""
-        response = await self.session.list_tools()
-        return [
-            {
-                "name": tool.name,
-                "description": tool.description,
-                "input_schema": tool.inputSchema,
+        self._tools_cache = None
+
+    async def list_tools(self, refresh: bool = False) -> list[dict[str, Any]]:
+        """Retrieve available tools from the MCP server (cached until invalidated)."""
+        if self._tools_cache is None or refresh:
+            response = await self._request(lambda session: session.list_tools(), idempotent=True)
+            self._idempotent_tools = {
+                tool.name
+                for tool in response.tools
+                if tool.annotations and (tool.annotations.readOnlyHint or tool.annotations.idempotentHint)
             }
-            for tool in response.tools
-        ]
-
-    async def call_tool(self, tool_name: str, arguments: dict[str, Any]) -> Any:
+            self._tools_cache = [
+                {
+                    "name": tool.name,
+                    "description": tool.description,
+                    "input_schema": tool.inputSchema,
+                }
+                for tool in response.tools
+            ]
+        return self._tools_cache
+
+    async def _cancel_request(self, session: ClientSession, request_id: int, reason: str) -> None:
+        """Tell the server to stop working on a request we no longer wait for (best effort)."""
+        notification = types.CancelledNotification(
+            method="notifications/cancelled",
+            params=types.CancelledNotificationParams(requestId=request_id, reason=reason),
+        )
+        try:
+            await session.send_notification(types.ClientNotification(notification))
+        except Exception:
+            pass
+
+    async def call_tool_result(
+        self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None
+    ) -> types.CallToolResult:
+        """Call a tool and return the full CallToolResult (including isError).
+
+        With `timeout`, a call that gets no response in time is cancelled on the server and
+        raises ToolCallTimeout. A call abandoned by the caller is cancelled on the server too.
+        """
+        read_timeout = dt.timedelta(seconds=timeout) if timeout else None
+
+        async def call(session: ClientSession) -> types.CallToolResult:
+            # send_request takes the next id synchronously, before its first await.
+            request_id = session._request_id
+            try:
+                return await session.call_tool(tool_name, arguments=arguments, read_timeout_seconds=read_timeout)
+            except McpError as e:
+                if e.error.code != httpx.codes.REQUEST_TIMEOUT:
+                    raise
+                await self._cancel_request(session, request_id, f"No response within {timeout:g}s")
+                raise ToolCallTimeout(f"Tool {tool_name} did not respond within {timeout:g}s") from None
+            except asyncio.CancelledError:
+                task = asyncio.ensure_future(self._cancel_request(session, request_id, "Cancelled by the client"))
+                self._cancellations.add(task)
+                task.add_done_callback(self._cancellations.discard)
+                raise
+
+        return await self._request(call, idempotent=self.retry_tool_calls or tool_name in self._idempotent_tools)
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None) -> Any:
         """Call a tool on the MCP server with provided arguments."""
-        result = await self.session.call_tool(tool_name, arguments=arguments)
+        result = await self.call_tool_result(tool_name, arguments, timeout)
         return result.content
 
+    async def send_ping(self) -> Any:
+        return await self._request(lambda session: session.send_ping(), idempotent=True)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator["MCPConnection"]:
+        """Yield a connection for one task. A single connection is shared by all tasks."""
+        yield self
+
 
 class MCPConnectionStdio(MCPConnection):
     """MCP connection using standard input/output."""
 
-    def __init__(self, command: str, args: list[str] = None, env: dict[str, str] = None):
-        super().__init__()
+    def __init__(self, command: str, args: list[str] = None, env: dict[str, str] = None, **options: Any):
+        super().__init__(**options)
         self.command = command
         self.args = args or []
         self.env = env
@@ -84,30 +321,347 @@ class MCPConnectionStdio(MCPConnection):
             StdioServerParameters(command=self.command, args=self.args, env=self.env)
         )
 
+    def server_key(self) -> str:
+        return "stdio:" + " ".join([self.command, *self.args])
+
 
 class MCPConnectionSSE(MCPConnection):
     """MCP connection using Server-Sent Events."""
 
-    def __init__(self, url: str, headers: dict[str, str] = None):
-        super().__init__()
+    def __init__(self, url: str, headers: dict[str, str] = None, **options: Any):
+        super().__init__(**options)
         self.url = url
         self.headers = headers or {}
 
     def _create_context(self):
         return sse_client(url=self.url, headers=self.headers)
 
+    def server_key(self) -> str:
+        return f"sse:{self.url}"
+
 
 class MCPConnectionHTTP(MCPConnection):
     """MCP connection using Streamable HTTP."""
 
-    def __init__(self, url: str, headers: dict[str, str] = None):
-        super().__init__()
+    def __init__(self, url: str, headers: dict[str, str] = None, **options: Any):
+        super().__init__(**options)
         self.url = url
         self.headers = headers or {}
 
     def _create_context(self):
         return streamablehttp_client(url=self.url, headers=self.headers)
 
+    def server_key(self) -> str:
+        return f"http:{self.url}"
+
+
+class _ConnectionTask:
+    """Holds a connection open inside its own task.
+
+    The MCP transports are anyio contexts that must be exited by the task that entered them,
+    so each connection lives in a dedicated task that keeps the context open until stopped.
+    The task finishing early means the transport died.
+    """
+
+    def __init__(self, connection: MCPConnection):
+        self.connection = connection
+        self.last_checked = time.monotonic()
+        self.suspect = False
+        self._ready = asyncio.Event()
+        self._close = asyncio.Event()
+        self._error: BaseException | None = None
+        self._task: asyncio.Task | None = None
+
+    def launch(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def wait_ready(self) -> None:
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def start(self) -> None:
+        self.launch()
+        await self.wait_ready()
+
+    async def _run(self) -> None:
+        try:
+            async with self.connection:
+                self._ready.set()
+                await self._close.wait()
+        except BaseException as e:
+            self._error = e
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def stop(self) -> None:
+        self._close.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class MCPConnectionPool:
+    """N independent MCP sessions (N stdio processes or N HTTP/SSE sessions) behind the
+    MCPConnection interface.
+
+    `lease()` hands one session to a task exclusively; `list_tools`/`call_tool` lease one per call.
+    Leases are granted first come, first served: a released session goes straight to the
+    longest-waiting task.
+    Sessions are health-checked with a ping when leased after an error or after
+    `health_check_interval` seconds, and dead ones are replaced.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], MCPConnection],
+        size: int,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 10.0,
+    ):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.factory = factory
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+        self.replacements = 0
+        # Reconnects and downtime of sessions already replaced, so the totals never go down.
+        self._retired = {"reconnects": 0, "downtime_seconds": 0.0}
+        self.server_info = None
+        self._tools_cache = None
+        self._server_key = factory().server_key()
+        self._slots: list[_ConnectionTask] = []
+        self._idle: collections.deque[_ConnectionTask] = collections.deque()
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+
+    async def __aenter__(self):
+        """Open all sessions concurrently."""
+        self._idle.clear()
+        self._slots = [_ConnectionTask(self.factory()) for _ in range(self.size)]
+        results = await asyncio.gather(*(slot.start() for slot in self._slots), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            await asyncio.gather(*(slot.stop() for slot in self._slots))
+            raise errors[0]
+        self._idle.extend(self._slots)
+        self.server_info = self._slots[0].connection.server_info
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Close all sessions."""
+        await asyncio.gather(*(slot.stop() for slot in self._slots))
+        self._slots = []
+        self._idle.clear()
+
+    async def _is_healthy(self, slot: _ConnectionTask) -> bool:
+        if not slot.alive:
+            return False
+        if not slot.suspect and time.monotonic() - slot.last_checked < self.health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(slot.connection.send_ping(), timeout=self.ping_timeout)
+        except Exception:
+            return False
+        slot.last_checked = time.monotonic()
+        slot.suspect = False
+        return True
+
+    async def _replace(self, slot: _ConnectionTask) -> _ConnectionTask:
+        await slot.stop()
+        for key, value in slot.connection.reconnect_stats().items():
+            self._retired[key] += value
+        fresh = _ConnectionTask(self.factory())
+        await fresh.start()
+        self._slots[self._slots.index(slot)] = fresh
+        self.replacements += 1
+        return fresh
+
+    async def _acquire(self) -> _ConnectionTask:
+        # Queue behind existing waiters even when a session is idle, so a task that just
+        # released one can't take it back ahead of them.
+        if self._idle and not self._waiters:
+            return self._idle.popleft()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release(waiter.result())
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self, slot: _ConnectionTask) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(slot)
+                return
+        self._idle.append(slot)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[MCPConnection]:
+        """Yield a healthy session for exclusive use until the block exits."""
+        slot = await self._acquire()
+        try:
+            if not await self._is_healthy(slot):
+                slot = await self._replace(slot)
+            try:
+                yield slot.connection
+            except BaseException:
+                slot.suspect = True
+                raise
+        finally:
+            self._release(slot)
+
+    def server_key(self) -> str:
+        return self._server_key
+
+    def invalidate_tools(self) -> None:
+        """Drop the cached tool list; the next list_tools() asks the server again."""
+        self._tools_cache = None
+
+    async def list_tools(self, refresh: bool = False) -> list[dict[str, Any]]:
+        """Retrieve available tools from the MCP server (cached until invalidated)."""
+        if self._tools_cache is None or refresh:
+            async with self.lease() as connection:
+                self._tools_cache = await connection.list_tools(refresh=True)
+        return self._tools_cache
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None) -> Any:
+        """Call a tool on any free session."""
+        async with self.lease() as connection:
+            return await connection.call_tool(tool_name, arguments, timeout)
+
+    async def call_tool_result(
+        self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None
+    ) -> types.CallToolResult:
+        """Call a tool on any free session and return the full CallToolResult."""
+        async with self.lease() as connection:
+            return await connection.call_tool_result(tool_name, arguments, timeout)
+
+    def reconnect_stats(self) -> dict[str, Any]:
+        """Reconnects and downtime summed over every session the pool has had, plus sessions replaced."""
+        stats = [slot.connection.reconnect_stats() for slot in self._slots] + [self._retired]
+        return {
+            "reconnects": sum(s["reconnects"] for s in stats),
+            "downtime_seconds": sum(s["downtime_seconds"] for s in stats),
+            "replacements": self.replacements,
+        }
+
+
+class _BackgroundConnection:
+    """Proxy for a connection that is still opening; every call first waits until it is ready."""
+
+    def __init__(self, holder: _ConnectionTask):
+        self._holder = holder
+
+    @property
+    def server_info(self):
+        return self._holder.connection.server_info
+
+    def server_key(self) -> str:
+        return self._holder.connection.server_key()
+
+    def invalidate_tools(self) -> None:
+        self._holder.connection.invalidate_tools()
+
+    async def list_tools(self, refresh: bool = False) -> list[dict[str, Any]]:
+        await self._holder.wait_ready()
+        return await self._holder.connection.list_tools(refresh=refresh)
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None) -> Any:
+        await self._holder.wait_ready()
+        return await self._holder.connection.call_tool(tool_name, arguments, timeout)
+
+    async def call_tool_result(self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None) -> Any:
+        await self._holder.wait_ready()
+        return await self._holder.connection.call_tool_result(tool_name, arguments, timeout)
+
+    def reconnect_stats(self) -> dict[str, Any]:
+        return self._holder.connection.reconnect_stats()
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Any]:
+        await self._holder.wait_ready()
+        async with self._holder.connection.lease() as connection:
+            yield connection
+
+
+@asynccontextmanager
+async def open_in_background(connection: Any) -> AsyncIterator[Any]:
+    """Start opening `connection` (or a pool) and yield a proxy immediately.
+
+    Lets callers do useful work (e.g. the first model turn) while the server starts; the
+    first call that needs the server waits for it, and raises if opening failed.
+    """
+    holder = _ConnectionTask(connection)
+    holder.launch()
+    try:
+        yield _BackgroundConnection(holder)
+    finally:
+        await holder.stop()
+
+
+def _snapshot_path(snapshot_dir: Path, server_key: str) -> Path:
+    digest = hashlib.sha256(server_key.encode("utf-8")).hexdigest()[:16]
+    return snapshot_dir / f"{digest}.json"
+
+
+def load_tools_snapshot(snapshot_dir: Path, server_key: str) -> dict[str, Any] | None:
+    """Load the last saved tool catalog for this server, or None.
+
+    Snapshots are looked up by server command/URL (the only identity known before
+    connecting) and record the server name/version they were taken from.
+    """
+    try:
+        snapshot = json.loads(_snapshot_path(snapshot_dir, server_key).read_text())
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("server_key") != server_key or not isinstance(snapshot.get("tools"), list):
+        return None
+    return snapshot
+
+
+def save_tools_snapshot(
+    snapshot_dir: Path,
+    server_key: str,
+    tools: list[dict[str, Any]],
+    server_info: Any = None,
+) -> Path:
+    """Persist a tool catalog for the next run."""
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path(snapshot_dir, server_key)
+    snapshot = {
+        "server_key": server_key,
+        "server_name": getattr(server_info, "name", None),
+        "server_version": getattr(server_info, "version", None),
+        "saved_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "tools": tools,
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot, indent=2))
+    tmp.replace(path)
+    return path
+
+
+def diff_tools(old: list[dict[str, Any]], new: list[dict[str, Any]]) -> dict[str, list[str]]:
+    """Tool names added, removed, or whose description/schema changed between two catalogs."""
+    old_by_name = {tool["name"]: tool for tool in old}
+    new_by_name = {tool["name"]: tool for tool in new}
+    return {
+        "added": sorted(new_by_name.keys() - old_by_name.keys()),
+        "removed": sorted(old_by_name.keys() - new_by_name.keys()),
+        "changed": sorted(
+            name for name in old_by_name.keys() & new_by_name.keys()
+            if json.dumps(old_by_name[name], sort_keys=True) != json.dumps(new_by_name[name], sort_keys=True)
+        ),
+    }
+
 
 def create_connection(
     transport: str,
@@ -116,6 +670,7 @@ def create_connection(
     env: dict[str, str] = None,
     url: str = None,
     headers: dict[str, str] = None,
+    **options: Any,
 ) -> MCPConnection:
     """Factory function to create the appropriate MCP connection.
 
@@ -126,6 +681,8 @@ def create_connection(
         env: Environment variables (stdio only)
         url: Server URL (sse and http only)
         headers: HTTP headers (sse and http only)
+        **options: Reconnect settings passed to MCPConnection (max_reconnect_attempts,
+            reconnect_base_delay, reconnect_max_delay, retry_tool_calls)
 
     Returns:
         MCPConnection instance
@@ -135,17 +692,27 @@ def create_connection(
     if transport == "stdio":
         if not command:
             raise ValueError("Command is required for stdio transport")
-        return MCPConnectionStdio(command=command, args=args, env=env)
+        return MCPConnectionStdio(command=command, args=args, env=env, **options)
 
     elif transport == "sse":
         if not url:
             raise ValueError("URL is required for sse transport")
-        return MCPConnectionSSE(url=url, headers=headers)
+        return MCPConnectionSSE(url=url, headers=headers, **options)
 
     elif transport in ["http", "streamable_http", "streamable-http"]:
         if not url:
             raise ValueError("URL is required for http transport")
-        return MCPConnectionHTTP(url=url, headers=headers)
+        return MCPConnectionHTTP(url=url, headers=headers, **options)
 
     else:
         raise ValueError(f"Unsupported transport type: {transport}. Use 'stdio', 'sse', or 'http'")
+
+
+def create_connection_pool(size: int, transport: str, **kwargs: Any) -> MCPConnectionPool:
+    """Create a pool of `size` connections; takes the same arguments as create_connection.
+
+    Raises ValueError for invalid arguments before any session is opened.
+    """
+    factory = functools.partial(create_connection, transport, **kwargs)
+    factory()
+    return MCPConnectionPool(factory, size)
@@ -5,18 +5,33 @@ This script evaluates MCP servers by running test questions against them using C
 
 import argparse
 import asyncio
+import datetime as dt
+import hashlib
 import json
+import math
+import random
 import re
+import statistics
 import sys
 import time
 import traceback
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Any
-
-from anthropic import Anthropic
-
-from connections import create_connection
+from typing import Any, Callable
+
+from anthropic import AsyncAnthropic
+
+from cassettes import Cassette, RecordingClient, RecordingConnection, ReplayClient, ReplayConnection
+from connections import (
+    ToolCallTimeout,
+    create_connection,
+    create_connection_pool,
+    diff_tools,
+    load_tools_snapshot,
+    open_in_background,
+    save_tools_snapshot,
+)
+from history import record_run
 
 EVALUATION_PROMPT = """You are an AI assistant with access to tools.
 
@@ -53,6 +68,44 @@ Response Requirements:
 - Your response should go last"""
 
 
+DEFAULT_TOOLS_SNAPSHOT_DIR = Path.home() / ".cache" / "mcp-eval" / "tool-snapshots"
+
+# Rough uncached prompt-processing rate, used only to estimate the latency a cache read saved.
+PREFILL_TOKENS_PER_S = 5000
+
+# Tool results are measured and budgeted in estimated tokens.
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_TOOL_RESULT_TOKENS = 25000
+
+# Per-task duration stddev/mean above which repeated trials flag the latency as noisy.
+HIGH_VARIANCE_CV = 0.5
+
+# USD per million tokens (input, output), matched by longest model name prefix. Cache
+# writes and reads are billed as multiples of the input rate. Extend or override with
+# --pricing when rates change or for models not listed here.
+MODEL_PRICING = {
+    "claude-opus-4-5": (5.0, 25.0),
+    "claude-opus-4": (15.0, 75.0),
+    "claude-sonnet-4": (3.0, 15.0),
+    "claude-haiku-4-5": (1.0, 5.0),
+    "claude-3-7-sonnet": (3.0, 15.0),
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-opus": (15.0, 75.0),
+    "claude-3-haiku": (0.25, 1.25),
+}
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+TOP_COSTLY_TASKS = 5
+
+# The harness is the only retry layer: clients are created with max_retries=0 so the SDK's
+# own retries don't multiply these attempts.
+RETRYABLE_STATUS_CODES = {429, 529}  # rate limited, overloaded
+MAX_API_RETRIES = 6
+RETRY_BASE_DELAY_S = 1.0
+RETRY_MAX_DELAY_S = 60.0
+
+
 def parse_evaluation_file(file_path: Path) -> list[dict[str, Any]]:
     """Parse XML evaluation file with qa_pair elements."""
     try:
@@ -83,88 +136,423 @@ def extract_xml_content(text: str, tag: str) -> str | None:
     return matches[-1].strip() if matches else None
 
 
-async def agent_loop(
-    client: Anthropic,
-    model: str,
-    question: str,
-    tools: list[dict[str, Any]],
-    connection: Any,
-) -> tuple[str, dict[str, Any]]:
-    """Run the agent loop with MCP tools."""
-    messages = [{"role": "user", "content": question}]
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Backoff for a retryable API error: honor retry-after, else exponential with full jitter."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY_S)
+        except ValueError:
+            pass
+    return random.uniform(0, min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * 2**attempt))
 
-    response = await asyncio.to_thread(
-        client.messages.create,
-        model=model,
-        max_tokens=4096,
-        system=EVALUATION_PROMPT,
-        messages=messages,
-        tools=tools,
-    )
 
-    messages.append({"role": "assistant", "content": response.content})
+async def _backoff(e: Exception, attempt: int) -> None:
+    """Sleep before retrying a retryable API error; re-raise anything else or the last attempt."""
+    status = getattr(e, "status_code", None)
+    if status not in RETRYABLE_STATUS_CODES or attempt == MAX_API_RETRIES:
+        raise e
+    delay = _retry_delay(e, attempt)
+    print(f"⏳ API returned {status}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_API_RETRIES})")
+    await asyncio.sleep(delay)
 
-    tool_metrics = {}
 
-    while response.stop_reason == "tool_use":
-        tool_use = next(block for block in response.content if block.type == "tool_use")
-        tool_name = tool_use.name
-        tool_input = tool_use.input
+async def create_message(client: AsyncAnthropic, **kwargs: Any) -> Any:
+    """Call client.messages.create, retrying 429/529 responses with backoff."""
+    for attempt in range(MAX_API_RETRIES + 1):
+        try:
+            return await client.messages.create(**kwargs)
+        except Exception as e:
+            await _backoff(e, attempt)
 
-        tool_start_ts = time.time()
+
+async def stream_message(
+    client: AsyncAnthropic,
+    on_tool_use: Callable[[Any], None],
+    **kwargs: Any,
+) -> tuple[Any, float | None, float | None]:
+    """Stream one response, handing each tool_use block to `on_tool_use` as soon as it is complete.
+
+    Returns (message, first_token_ts, first_tool_use_ts). 429/529 errors are retried as long
+    as no tool call has been dispatched yet.
+    """
+    for attempt in range(MAX_API_RETRIES + 1):
+        first_token_ts = first_tool_use_ts = None
         try:
-            tool_result = await connection.call_tool(tool_name, tool_input)
-            tool_response = json.dumps(tool_result) if isinstance(tool_result, (dict, list)) else str(tool_result)
+            async with client.messages.stream(**kwargs) as stream:
+                async for event in stream:
+                    if first_token_ts is None and event.type == "content_block_delta":
+                        first_token_ts = time.time()
+                    if event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                        if first_tool_use_ts is None:
+                            first_tool_use_ts = time.time()
+                        on_tool_use(event.content_block)
+                return await stream.get_final_message(), first_token_ts, first_tool_use_ts
         except Exception as e:
-            tool_response = f"Error executing tool {tool_name}: {str(e)}\n"
-            tool_response += traceback.format_exc()
-        tool_duration = time.time() - tool_start_ts
-
-        if tool_name not in tool_metrics:
-            tool_metrics[tool_name] = {"count": 0, "durations": []}
-        tool_metrics[tool_name]["count"] += 1
-        tool_metrics[tool_name]["durations"].append(tool_duration)
-
-        messages.append({
-            "role": "user",
-            "content": [{
-                "type": "tool_result",
-                "tool_use_id": tool_use.id,
-                "content": tool_response,
-            }]
-        })
+            if first_tool_use_ts is not None:
+                raise
+            await _backoff(e, attempt)
+
+
+def _serialize_tool_result(tool_result: Any) -> str:
+    """Render call_tool content (text, image, resource blocks...) as text for a tool_result."""
+    if isinstance(tool_result, list):
+        parts = []
+        for item in tool_result:
+            if getattr(item, "type", None) == "text":
+                parts.append(item.text)
+            elif hasattr(item, "model_dump"):
+                parts.append(json.dumps(item.model_dump(mode="json", exclude_none=True)))
+            else:
+                parts.append(item if isinstance(item, str) else json.dumps(item))
+        return "\n".join(parts)
+    if isinstance(tool_result, dict):
+        return json.dumps(tool_result)
+    return str(tool_result)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (no tokenizer needed): ~4 characters per token."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _json_outline(text: str) -> str | None:
+    """Short structural description of a JSON payload, or None if it isn't JSON."""
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(value, dict):
+        keys = list(value)
+        shown = ", ".join(keys[:20]) + (f", … (+{len(keys) - 20})" if len(keys) > 20 else "")
+        return f"JSON object with {len(keys)} keys: {shown}"
+    if isinstance(value, list):
+        return f"JSON array with {len(value)} items"
+    return None
+
+
+def apply_result_budget(text: str, max_tokens: int, overflow: str = "truncate") -> tuple[str, bool]:
+    """Cut a tool result down to `max_tokens` (estimated), marking the cut for the model.
+
+    "truncate" keeps the beginning; "preview" keeps the beginning and the end and, for JSON,
+    describes the overall structure. Returns (text, was_cut).
+    """
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text, False
+    budget_chars = max_tokens * CHARS_PER_TOKEN
+    notice = (
+        f"[Tool result cut by the evaluation harness: ~{estimate_tokens(text):,} tokens "
+        f"({len(text.encode('utf-8')):,} bytes) exceeds the {max_tokens:,}-token budget."
+    )
+    if overflow == "preview":
+        outline = _json_outline(text)
+        head = text[: budget_chars * 3 // 4]
+        tail = text[-(budget_chars // 4):]
+        notice += f" Showing the first and last part{'; ' + outline if outline else ''}.]"
+        return f"{notice}\n{head}\n[… {len(text) - len(head) - len(tail):,} characters omitted …]\n{tail}", True
+    notice += " Showing the first part only.]"
+    return f"{notice}\n{text[:budget_chars]}", True
 
-        response = await asyncio.to_thread(
-            client.messages.create,
-            model=model,
-            max_tokens=4096,
-            system=EVALUATION_PROMPT,
-            messages=messages,
-            tools=tools,
-        )
+
+async def execute_tool(
+    connection: Any,
+    tool_use: Any,
+    max_result_tokens: int = 0,
+    overflow: str = "truncate",
+    timeout: float | None = None,
+) -> tuple[str, float, float, dict[str, Any]]:
+    """Run one tool_use block; returns (tool_response, start_ts, end_ts, payload).
+
+    `payload` has the size of the full result (bytes, estimated tokens), whether it was
+    cut to fit `max_result_tokens`, and its status: "ok", "error" if the call raised or
+    the server flagged its result with isError, or "timeout" if the call got no response
+    within `timeout` seconds (the request is then cancelled).
+    """
+    tool_start_ts = time.time()
+    status = "ok"
+    try:
+        tool_result = await connection.call_tool_result(tool_use.name, tool_use.input, timeout)
+        tool_response = _serialize_tool_result(tool_result.content)
+        if tool_result.isError:
+            status = "error"
+    except ToolCallTimeout as e:
+        status = "timeout"
+        tool_response = f"Error executing tool {tool_use.name}: {str(e)}. The call was cancelled.\n"
+    except Exception as e:
+        status = "error"
+        tool_response = f"Error executing tool {tool_use.name}: {str(e)}\n"
+        tool_response += traceback.format_exc()
+    end_ts = time.time()
+    payload = {"bytes": len(tool_response.encode("utf-8")), "tokens": estimate_tokens(tool_response), "status": status}
+    tool_response, payload["truncated"] = apply_result_budget(tool_response, max_result_tokens, overflow)
+    return tool_response, tool_start_ts, end_ts, payload
+
+
+def _interval_overlaps(intervals: list[tuple[float, float]]) -> list[float]:
+    """Seconds of each interval that ran concurrently with at least one other interval."""
+    overlaps = []
+    for i, (start, end) in enumerate(intervals):
+        others = sorted((max(s, start), min(e, end)) for j, (s, e) in enumerate(intervals) if j != i)
+        covered, cursor = 0.0, start
+        for s, e in others:
+            s = max(s, cursor)
+            if e > s:
+                covered += e - s
+                cursor = e
+        overlaps.append(covered)
+    return overlaps
+
+
+def _cacheable_prefix(tools: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """System prompt and tool list with cache breakpoints after the tools and after the system prompt.
+
+    The tools are rendered first in the prompt, so the two breakpoints cache the tool
+    definitions alone and tools + system prompt; every turn of every task shares them.
+    """
+    system = [{"type": "text", "text": EVALUATION_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    if not tools:
+        return system, tools
+    cached_tools = [*tools[:-1], {**tools[-1], "cache_control": {"type": "ephemeral"}}]
+    return system, cached_tools
+
+
+def new_api_metrics() -> dict[str, Any]:
+    """Empty API metrics for agent_loop to fill in."""
+    return {
+        "calls": 0,
+        "durations": [],
+        "cache_hit_durations": [],
+        "input_tokens": 0,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "output_tokens": 0,
+        "turns": [],
+    }
+
+
+async def agent_loop(
+    client: AsyncAnthropic,
+    model: str,
+    question: str,
+    tools: list[dict[str, Any]],
+    connection: Any,
+    prompt_cache: bool = True,
+    stream: bool = False,
+    max_result_tokens: int = DEFAULT_MAX_TOOL_RESULT_TOKENS,
+    result_overflow: str = "truncate",
+    tool_timeout: float | None = None,
+    task_timeout: float | None = None,
+    max_turns: int = 0,
+    temperature: float | None = None,
+    api_metrics: dict[str, Any] | None = None,
+    tool_metrics: dict[str, Any] | None = None,
+) -> tuple[str | None, dict[str, Any], dict[str, Any]]:
+    """Run the agent loop with MCP tools.
+
+    Returns the final response text, per-tool metrics, and API metrics (call latencies,
+    input token counts split into uncached, cache-write and cache-read, and a per-turn
+    breakdown of model vs tool wall time). With `stream`, each tool call starts as soon as
+    its tool_use block has streamed in, and time-to-first-token / time-to-tool-use are
+    recorded per turn. Tool results over `max_result_tokens` are cut (see apply_result_budget).
+
+    Budgets: each tool call gets `tool_timeout` seconds, the whole loop `task_timeout`
+    seconds and at most `max_turns` model calls. API metrics record how the loop ended
+    under "status": "completed", "timeout" (no response text) or "turn_limit".
+
+    `api_metrics` (from new_api_metrics) and `tool_metrics` are filled in place when given,
+    so the caller keeps the tokens and tool calls already spent if the loop raises.
+    """
+    messages = [{"role": "user", "content": question}]
+    if prompt_cache:
+        system, tools = _cacheable_prefix(tools)
+    else:
+        system = EVALUATION_PROMPT
+
+    if api_metrics is None:
+        api_metrics = new_api_metrics()
+    if tool_metrics is None:
+        tool_metrics = {}
+
+    # Tool calls started for the current turn, by tool_use id. While streaming they are
+    # dispatched as soon as their block is complete, before the model finishes the turn.
+    started: dict[str, asyncio.Task] = {}
+
+    def dispatch(tool_use: Any) -> None:
+        if tool_use.id not in started:
+            started[tool_use.id] = asyncio.create_task(
+                execute_tool(connection, tool_use, max_result_tokens, result_overflow, tool_timeout)
+            )
+
+    async def ask() -> Any:
+        request = dict(model=model, max_tokens=4096, system=system, messages=messages, tools=tools)
+        if temperature is not None:
+            request["temperature"] = temperature
+        start = time.time()
+        if stream:
+            response, first_token_ts, first_tool_use_ts = await stream_message(client, dispatch, **request)
+        else:
+            response = await create_message(client, **request)
+            first_token_ts = first_tool_use_ts = None
+        duration = time.time() - start
+        usage = response.usage
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        api_metrics["calls"] += 1
+        api_metrics["durations"].append(duration)
+        if cache_read:
+            api_metrics["cache_hit_durations"].append(duration)
+        api_metrics["input_tokens"] += usage.input_tokens
+        api_metrics["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", None) or 0
+        api_metrics["cache_read_input_tokens"] += cache_read
+        api_metrics["output_tokens"] += usage.output_tokens
+        api_metrics["turns"].append({
+            "model_seconds": duration,
+            "ttft_seconds": first_token_ts - start if first_token_ts else None,
+            "time_to_tool_use_seconds": first_tool_use_ts - start if first_tool_use_ts else None,
+            "tool_seconds": 0.0,
+            "tool_calls": 0,
+            "input_tokens": usage.input_tokens,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+            "cache_read_input_tokens": cache_read,
+            "output_tokens": usage.output_tokens,
+        })
         messages.append({"role": "assistant", "content": response.content})
+        return response
+
+    status = "completed"
+
+    async def converse() -> Any:
+        nonlocal status
+        response = await ask()
+        while response.stop_reason == "tool_use":
+            if max_turns and len(api_metrics["turns"]) >= max_turns:
+                status = "turn_limit"
+                break
+            tool_uses = [block for block in response.content if block.type == "tool_use"]
+
+            # Independent tool calls from one turn run concurrently and are answered in one message.
+            # tool_seconds is the time the turn waited on tools after the model finished.
+            tools_start = time.time()
+            for tool_use in tool_uses:
+                dispatch(tool_use)
+            outcomes = await asyncio.gather(*(started[tool_use.id] for tool_use in tool_uses))
+            started.clear()
+            api_metrics["turns"][-1]["tool_seconds"] = time.time() - tools_start
+            api_metrics["turns"][-1]["tool_calls"] = len(tool_uses)
+            overlaps = _interval_overlaps([(start, end) for _, start, end, _ in outcomes])
+
+            for tool_use, (_, start, end, payload), overlap in zip(tool_uses, outcomes, overlaps):
+                if tool_use.name not in tool_metrics:
+                    tool_metrics[tool_use.name] = {
+                        "count": 0,
+                        "durations": [],
+                        "overlaps": [],
+                        "result_bytes": [],
+                        "result_tokens": [],
+                        "truncated": 0,
+                        "errors": 0,
+                        "timeouts": 0,
+                    }
+                metrics = tool_metrics[tool_use.name]
+                metrics["count"] += 1
+                metrics["durations"].append(end - start)
+                metrics["overlaps"].append(overlap)
+                metrics["result_bytes"].append(payload["bytes"])
+                metrics["result_tokens"].append(payload["tokens"])
+                metrics["truncated"] += payload["truncated"]
+                metrics["errors"] += payload["status"] == "error"
+                metrics["timeouts"] += payload["status"] == "timeout"
+
+            messages.append({
+                "role": "user",
+                "content": [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": tool_use.id,
+                        "content": tool_response,
+                    }
+                    for tool_use, (tool_response, _, _, _) in zip(tool_uses, outcomes)
+                ],
+            })
+
+            response = await ask()
+        return response
 
+    try:
+        response = await asyncio.wait_for(converse(), task_timeout) if task_timeout else await converse()
+    except asyncio.TimeoutError:
+        status = "timeout"
+        response = None
+    finally:
+        # A streamed turn can dispatch tools and then stop for another reason (e.g. max_tokens
+        # or a budget); stopping cancels those calls on the server too.
+        for task in started.values():
+            task.cancel()
+    api_metrics["status"] = status
+
+    if response is None:
+        return None, tool_metrics, api_metrics
     response_text = next(
         (block.text for block in response.content if hasattr(block, "text")),
         None,
     )
-    return response_text, tool_metrics
+    return response_text, tool_metrics, api_metrics
 
 
 async def evaluate_single_task(
-    client: Anthropic,
+    client: AsyncAnthropic,
     model: str,
     qa_pair: dict[str, Any],
     tools: list[dict[str, Any]],
     connection: Any,
     task_index: int,
+    prompt_cache: bool = True,
+    stream: bool = False,
+    max_result_tokens: int = DEFAULT_MAX_TOOL_RESULT_TOKENS,
+    result_overflow: str = "truncate",
+    tool_timeout: float | None = None,
+    task_timeout: float | None = None,
+    max_turns: int = 0,
+    temperature: float | None = None,
 ) -> dict[str, Any]:
-    """Evaluate a single QA pair with the given tools."""
+    """Evaluate a single QA pair with the given tools (budgets as in agent_loop).
+
+    A task that raises (an API error that isn't retried, a cassette miss, a server that
+    stays unreachable) is scored as incorrect with status "error" and the error text,
+    instead of aborting the run. Its record keeps the tokens and tool calls spent before
+    the error, so cost and budgets count them.
+    """
     start_time = time.time()
+    error = None
+    api_metrics, tool_metrics = new_api_metrics(), {}
 
     print(f"Task {task_index + 1}: Running task with question: {qa_pair['question']}")
-    response, tool_metrics = await agent_loop(client, model, qa_pair["question"], tools, connection)
+    try:
+        async with connection.lease() as session:
+            response, _, _ = await agent_loop(
+                client,
+                model,
+                qa_pair["question"],
+                tools,
+                session,
+                prompt_cache=prompt_cache,
+                stream=stream,
+                max_result_tokens=max_result_tokens,
+                result_overflow=result_overflow,
+                tool_timeout=tool_timeout,
+                task_timeout=task_timeout,
+                max_turns=max_turns,
+                temperature=temperature,
+                api_metrics=api_metrics,
+                tool_metrics=tool_metrics,
+            )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"Task {task_index + 1}: failed with {error}")
+        response = None
+        api_metrics["status"] = "error"
 
+    response = response or ""
     response_value = extract_xml_content(response, "response")
     summary = extract_xml_content(response, "summary")
     feedback = extract_xml_content(response, "feedback")
@@ -176,11 +564,14 @@ async def evaluate_single_task(
         "expected": qa_pair["answer"],
         "actual": response_value,
         "score": int(response_value == qa_pair["answer"]) if response_value else 0,
+        "status": api_metrics["status"],
         "total_duration": duration_seconds,
         "tool_calls": tool_metrics,
         "num_tool_calls": sum(len(metrics["durations"]) for metrics in tool_metrics.values()),
+        "api": api_metrics,
         "summary": summary,
         "feedback": feedback,
+        "error": error,
     }
 
 
@@ -193,7 +584,26 @@ REPORT_HEADER = """
 - **Average Task Duration**: {average_duration_s:.2f}s
 - **Average Tool Calls per Task**: {average_tool_calls:.2f}
 - **Total Tool Calls**: {total_tool_calls}
+- **Tool Schema**: {tool_schema}
+- **Prompt Cache**: {prompt_cache}
+- **Turns per Task**: {turns_per_task}
+- **Tokens**: {tokens}
+- **Cost**: {cost}
+- **Reconnects**: {reconnects}
+- **Budgets**: {budgets}
+
+### Latency
+
+{latency_table}
+
+### Heaviest Tool Payloads
+
+{payload_table}
+
+### Most Expensive Tasks
 
+{costly_table}
+{trials_section}
 ---
 """
 
@@ -205,6 +615,7 @@ TASK_TEMPLATE = """
 **Actual Answer**: `{actual_answer}`
 **Correct**: {correct_indicator}
 **Duration**: {total_duration:.2f}s
+**Tokens**: {tokens}
 **Tool Calls**: {tool_calls}
 
 **Summary**
@@ -217,27 +628,524 @@ TASK_TEMPLATE = """
 """
 
 
-async def run_evaluation(
-    eval_path: Path,
-    connection: Any,
-    model: str = "claude-3-7-sonnet-20250219",
-) -> str:
-    """Run evaluation with MCP server tools."""
-    print("🚀 Starting Evaluation")
+def _describe_drift(snapshot: dict[str, Any], live_tools: list[dict[str, Any]], server_info: Any) -> str | None:
+    """Summarize how the live tool catalog differs from a snapshot, or None if it doesn't."""
+    drift = diff_tools(snapshot["tools"], live_tools)
+    parts = [
+        f"{label} {', '.join(names)}"
+        for label, names in (("added", drift["added"]), ("removed", drift["removed"]), ("changed", drift["changed"]))
+        if names
+    ]
+    live_version = getattr(server_info, "version", None)
+    if snapshot.get("server_version") and live_version and snapshot["server_version"] != live_version:
+        parts.append(f"server version {snapshot['server_version']} → {live_version}")
+    return "; ".join(parts) or None
+
+
+def _describe_prompt_cache(results: list[dict[str, Any]], enabled: bool) -> str:
+    """One-line prompt cache summary: tokens served from cache and the input latency that saved."""
+    uncached = sum(r["api"]["input_tokens"] for r in results)
+    written = sum(r["api"]["cache_creation_input_tokens"] for r in results)
+    read = sum(r["api"]["cache_read_input_tokens"] for r in results)
+    total = uncached + written + read
+    if not enabled:
+        return f"off ({total:,} input tokens processed uncached)"
+    hit_rate = read / total * 100 if total else 0
+    return (
+        f"on — {read:,} of {total:,} input tokens read from cache ({hit_rate:.1f}%), {written:,} written; "
+        f"~{read / PREFILL_TOKENS_PER_S:.2f}s of input processing avoided (est. at {PREFILL_TOKENS_PER_S:,} tok/s)"
+    )
 
-    client = Anthropic()
 
-    tools = await connection.list_tools()
-    print(f"📋 Loaded {len(tools)} tools from MCP server")
+def _percentile(values: list[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of a non-empty list."""
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
 
-    qa_pairs = parse_evaluation_file(eval_path)
-    print(f"📋 Loaded {len(qa_pairs)} evaluation tasks")
 
-    results = []
-    for i, qa_pair in enumerate(qa_pairs):
-        print(f"Processing task {i + 1}/{len(qa_pairs)}")
-        result = await evaluate_single_task(client, model, qa_pair, tools, connection, i)
-        results.append(result)
+def _distribution(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"count": 0, "sum": 0.0, "mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "sum": sum(values),
+        "mean": sum(values) / len(values),
+        "p50": _percentile(values, 50),
+        "p90": _percentile(values, 90),
+        "p99": _percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def pass_at_k(n: int, c: int, k: int) -> float:
+    """Unbiased estimate of the chance that at least one of k samples passes, from n trials with c passes."""
+    if n - c < k:
+        return 1.0
+    return 1.0 - math.comb(n - c, k) / math.comb(n, k)
+
+
+def trial_statistics(results: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Pass@k, mean accuracy with a 95% CI, and per-task spread for runs with repeated trials.
+
+    Trials of one question are correlated, so the confidence interval uses the standard
+    error of the per-question pass rates (clustered by question), not of all trials pooled.
+    A task is flagged `flaky` when its trials disagree, and `noisy_latency` when the
+    coefficient of variation of its duration exceeds HIGH_VARIANCE_CV. Returns None for
+    single-trial runs.
+    """
+    by_task: dict[int, list[dict[str, Any]]] = {}
+    for r in results:
+        by_task.setdefault(r["task_index"], []).append(r)
+    trials = max((len(runs) for runs in by_task.values()), default=0)
+    if trials < 2:
+        return None
+
+    tasks = []
+    for index, runs in sorted(by_task.items()):
+        passes = sum(r["score"] for r in runs)
+        durations = [r["total_duration"] for r in runs]
+        mean = statistics.fmean(durations)
+        stdev = statistics.stdev(durations) if len(durations) > 1 else 0.0
+        tasks.append({
+            "task_index": index,
+            "trials": len(runs),
+            "passes": passes,
+            "pass_rate": passes / len(runs),
+            "duration_mean": mean,
+            "duration_stdev": stdev,
+            "flaky": 0 < passes < len(runs),
+            "noisy_latency": bool(mean) and stdev / mean > HIGH_VARIANCE_CV,
+        })
+
+    rates = [t["pass_rate"] for t in tasks]
+    accuracy = statistics.fmean(rates)
+    margin = 1.96 * statistics.stdev(rates) / math.sqrt(len(rates)) if len(rates) > 1 else 0.0
+    return {
+        "trials": trials,
+        "accuracy_mean": accuracy,
+        "accuracy_ci95": [max(0.0, accuracy - margin), min(1.0, accuracy + margin)],
+        "pass_at_k": {
+            str(k): statistics.fmean(pass_at_k(t["trials"], t["passes"], k) for t in tasks if t["trials"] >= k)
+            for k in range(1, trials + 1)
+        },
+        "flaky_tasks": sum(t["flaky"] for t in tasks),
+        "tasks": tasks,
+    }
+
+
+def load_pricing(path: Path | None = None) -> dict[str, tuple[float, float]]:
+    """MODEL_PRICING, updated from a JSON file of {"model-prefix": [input, output]} USD per million tokens."""
+    pricing = dict(MODEL_PRICING)
+    if path is not None:
+        pricing.update({prefix: (float(rates[0]), float(rates[1])) for prefix, rates in json.loads(path.read_text()).items()})
+    return pricing
+
+
+def model_rates(model: str, pricing: dict[str, tuple[float, float]]) -> tuple[float, float] | None:
+    """(input, output) rates for `model` from the longest matching prefix, or None if unpriced."""
+    prefix = max((prefix for prefix in pricing if model.startswith(prefix)), key=len, default=None)
+    return pricing[prefix] if prefix is not None else None
+
+
+def total_tokens(api: dict[str, Any]) -> int:
+    return api["input_tokens"] + api["cache_creation_input_tokens"] + api["cache_read_input_tokens"] + api["output_tokens"]
+
+
+def usage_cost(api: dict[str, Any], rates: tuple[float, float] | None) -> float | None:
+    """USD cost of the token counts in `api` (task API metrics or one turn), or None without rates."""
+    if rates is None:
+        return None
+    input_rate, output_rate = rates
+    billed_input = (
+        api["input_tokens"]
+        + api["cache_creation_input_tokens"] * CACHE_WRITE_MULTIPLIER
+        + api["cache_read_input_tokens"] * CACHE_READ_MULTIPLIER
+    )
+    return (billed_input * input_rate + api["output_tokens"] * output_rate) / 1_000_000
+
+
+def costly_tasks(results: list[dict[str, Any]], limit: int = TOP_COSTLY_TASKS) -> list[dict[str, Any]]:
+    """The `limit` most expensive task runs (by cost, or by tokens when unpriced)."""
+    ranked = sorted(results, key=lambda r: (r.get("cost_usd") or 0.0, total_tokens(r["api"])), reverse=True)
+    return [
+        {
+            "task_index": r["task_index"],
+            "trial": r.get("trial", 0),
+            "cost_usd": r.get("cost_usd"),
+            "input_tokens": r["api"]["input_tokens"] + r["api"]["cache_creation_input_tokens"],
+            "cache_read_input_tokens": r["api"]["cache_read_input_tokens"],
+            "output_tokens": r["api"]["output_tokens"],
+            "turns": len(r["api"].get("turns", [])),
+            "tool_calls": r["num_tool_calls"],
+            "score": r["score"],
+        }
+        for r in ranked[:limit]
+    ]
+
+
+def compute_metrics(results: list[dict[str, Any]], run: dict[str, Any] | None = None) -> dict[str, Any]:
+    """Run-level latency and token metrics from task results.
+
+    Model latency is per API call; tool latency is per call for each tool, plus the wall
+    time each turn spent waiting on its (concurrent) tool calls. Reconnect counts and the
+    token/cost budget come from the `run` record, when there is one. `cost_usd` is None
+    when no task was priced.
+    """
+    turns = [turn for r in results for turn in r["api"].get("turns", [])]
+    tool_durations: dict[str, list[float]] = {}
+    payloads: dict[str, dict[str, Any]] = {}
+    failures: dict[str, dict[str, int]] = {}
+    task_status: dict[str, int] = {}
+    for r in results:
+        status = r.get("status", "completed")
+        task_status[status] = task_status.get(status, 0) + 1
+        for name, metrics in r["tool_calls"].items():
+            tool_durations.setdefault(name, []).extend(metrics["durations"])
+            payload = payloads.setdefault(name, {"bytes": [], "tokens": [], "truncated": 0})
+            payload["bytes"].extend(metrics.get("result_bytes", []))
+            payload["tokens"].extend(metrics.get("result_tokens", []))
+            payload["truncated"] += metrics.get("truncated", 0)
+            failed = failures.setdefault(name, {"errors": 0, "timeouts": 0})
+            failed["errors"] += metrics.get("errors", 0)
+            failed["timeouts"] += metrics.get("timeouts", 0)
+    model = _distribution([turn["model_seconds"] for turn in turns])
+    tool_wall = _distribution([turn["tool_seconds"] for turn in turns if turn["tool_calls"]])
+    busy = model["sum"] + tool_wall["sum"]
+    costs = [r["cost_usd"] for r in results if r.get("cost_usd") is not None]
+    return {
+        "tasks": len(results),
+        "correct": sum(r["score"] for r in results),
+        "task_duration_seconds": _distribution([r["total_duration"] for r in results]),
+        "turns_per_task": _distribution([len(r["api"].get("turns", [])) for r in results]),
+        "task_status": task_status,
+        "model_latency_seconds": model,
+        "ttft_seconds": _distribution([turn["ttft_seconds"] for turn in turns if turn.get("ttft_seconds") is not None]),
+        "time_to_tool_use_seconds": _distribution(
+            [turn["time_to_tool_use_seconds"] for turn in turns if turn.get("time_to_tool_use_seconds") is not None]
+        ),
+        "tool_wait_seconds": tool_wall,
+        "model_share": model["sum"] / busy if busy else 0.0,
+        "tool_latency_seconds": {name: _distribution(values) for name, values in sorted(tool_durations.items())},
+        # Heaviest first, by total tokens added to conversations.
+        "tool_result_bytes": {
+            name: {**_distribution(payload["bytes"]), "tokens": sum(payload["tokens"]), "truncated": payload["truncated"]}
+            for name, payload in sorted(payloads.items(), key=lambda item: -sum(item[1]["tokens"]))
+        },
+        # Timeouts are counted apart from errors: a hung tool is a different problem than a failing one.
+        "tool_failures": dict(sorted(failures.items())),
+        "tool_errors": sum(f["errors"] for f in failures.values()),
+        "tool_timeouts": sum(f["timeouts"] for f in failures.values()),
+        "tokens": {
+            "input": sum(r["api"]["input_tokens"] for r in results),
+            "cache_creation_input": sum(r["api"]["cache_creation_input_tokens"] for r in results),
+            "cache_read_input": sum(r["api"]["cache_read_input_tokens"] for r in results),
+            "output": sum(r["api"]["output_tokens"] for r in results),
+        },
+        "cost_usd": sum(costs) if costs else None,
+        "costly_tasks": costly_tasks(results),
+        "budget": (run or {}).get("budget"),
+        "connection": {"reconnects": 0, "downtime_seconds": 0.0, "replacements": 0, **(run or {}).get("connection", {})},
+        "trials": trial_statistics(results),
+    }
+
+
+def _latency_table(metrics: dict[str, Any]) -> str:
+    rows = [
+        ("Model (per API call)", metrics["model_latency_seconds"], f"{metrics['model_share'] * 100:.0f}%"),
+        ("Tools (wait per turn)", metrics["tool_wait_seconds"], f"{(1 - metrics['model_share']) * 100:.0f}%" if metrics["model_latency_seconds"]["count"] else "—"),
+        *((f"`{name}`", dist, "—") for name, dist in metrics["tool_latency_seconds"].items()),
+    ]
+    # Only streamed runs measure these.
+    if metrics["ttft_seconds"]["count"]:
+        rows.insert(1, ("Time to first token", metrics["ttft_seconds"], "—"))
+    if metrics["time_to_tool_use_seconds"]["count"]:
+        rows.insert(2, ("Time to first tool_use", metrics["time_to_tool_use_seconds"], "—"))
+    lines = [
+        "| Component | Calls | Total (s) | Share | p50 (s) | p90 (s) | p99 (s) |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for label, dist, share in rows:
+        lines.append(
+            f"| {label} | {dist['count']} | {dist['sum']:.2f} | {share} | {dist['p50']:.3f} | {dist['p90']:.3f} | {dist['p99']:.3f} |"
+        )
+    return "\n".join(lines)
+
+
+def _payload_table(metrics: dict[str, Any]) -> str:
+    payloads = metrics["tool_result_bytes"]
+    if not payloads:
+        return "No tool calls."
+    lines = [
+        "| Tool | Calls | Total tokens (est.) | Mean bytes | p90 bytes | Max bytes | Cut to budget |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for name, dist in payloads.items():
+        lines.append(
+            f"| `{name}` | {dist['count']} | {dist['tokens']:,} | {dist['mean']:,.0f} | {dist['p90']:,.0f} | {dist['max']:,.0f} | {dist['truncated']} |"
+        )
+    return "\n".join(lines)
+
+
+def _format_cost(cost: float | None) -> str:
+    return f"${cost:.4f}" if cost is not None else "—"
+
+
+def _costly_table(metrics: dict[str, Any]) -> str:
+    if not metrics["costly_tasks"]:
+        return "No tasks."
+    lines = [
+        "| Task | Cost | Input tokens | Cache read | Output tokens | Turns | Tool calls | Correct |",
+        "|---:|---:|---:|---:|---:|---:|---:|:---:|",
+    ]
+    for task in metrics["costly_tasks"]:
+        label = f"{task['task_index'] + 1}" + (f" (trial {task['trial'] + 1})" if metrics["trials"] else "")
+        lines.append(
+            f"| {label} | {_format_cost(task['cost_usd'])} | {task['input_tokens']:,} | {task['cache_read_input_tokens']:,} | "
+            f"{task['output_tokens']:,} | {task['turns']} | {task['tool_calls']} | {'✅' if task['score'] else '❌'} |"
+        )
+    return "\n".join(lines)
+
+
+def _describe_cost(metrics: dict[str, Any], model: str | None) -> str:
+    if metrics["cost_usd"] is None:
+        return f"unknown (no rate for {model or 'the model'}; see --pricing)"
+    tasks = metrics["tasks"]
+    return f"${metrics['cost_usd']:.4f} (${metrics['cost_usd'] / tasks:.4f} per task)" if tasks else "$0.0000"
+
+
+def _trials_section(trials: dict[str, Any] | None) -> str:
+    if trials is None:
+        return ""
+    k = trials["trials"]
+    low, high = trials["accuracy_ci95"]
+    lines = [
+        "",
+        "### Trials",
+        "",
+        f"- **Trials per task**: {k}",
+        f"- **Mean accuracy**: {trials['accuracy_mean'] * 100:.1f}% (95% CI {low * 100:.1f}–{high * 100:.1f}%, clustered by task)",
+        f"- **pass@1**: {trials['pass_at_k']['1'] * 100:.1f}%, **pass@{k}**: {trials['pass_at_k'][str(k)] * 100:.1f}%",
+        f"- **Flaky tasks** (trials disagree): {trials['flaky_tasks']}",
+        "",
+        "| Task | Passes | Duration mean (s) | Stddev (s) | Flags |",
+        "|---:|---:|---:|---:|---|",
+    ]
+    for task in trials["tasks"]:
+        flags = [label for key, label in (("flaky", "⚠️ flaky result"), ("noisy_latency", "⚠️ noisy latency")) if task[key]]
+        lines.append(
+            f"| {task['task_index'] + 1} | {task['passes']}/{task['trials']} | {task['duration_mean']:.2f} | "
+            f"{task['duration_stdev']:.2f} | {', '.join(flags)} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _prometheus_summary(name: str, help_text: str, series: list[tuple[dict[str, str], dict[str, float]]]) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+    for labels, dist in series:
+        for key, quantile in (("p50", "0.5"), ("p90", "0.9"), ("p99", "0.99")):
+            label_str = ",".join([*(f'{k}="{v}"' for k, v in labels.items()), f'quantile="{quantile}"'])
+            lines.append(f"{name}{{{label_str}}} {dist[key]}")
+        suffix = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {dist['sum']}")
+        lines.append(f"{name}_count{suffix} {dist['count']}")
+    return lines
+
+
+def _prometheus_trials(trials: dict[str, Any] | None) -> list[str]:
+    if trials is None:
+        return []
+    low, high = trials["accuracy_ci95"]
+    return [
+        "# HELP mcp_eval_pass_at_k Estimated chance that at least one of k trials of a task passes.",
+        "# TYPE mcp_eval_pass_at_k gauge",
+        *(f'mcp_eval_pass_at_k{{k="{k}"}} {value}' for k, value in trials["pass_at_k"].items()),
+        "# HELP mcp_eval_accuracy_mean Mean per-task pass rate over repeated trials.",
+        "# TYPE mcp_eval_accuracy_mean gauge",
+        f"mcp_eval_accuracy_mean {trials['accuracy_mean']}",
+        "# HELP mcp_eval_accuracy_ci95 Bounds of the 95% confidence interval of the mean accuracy.",
+        "# TYPE mcp_eval_accuracy_ci95 gauge",
+        f'mcp_eval_accuracy_ci95{{bound="lower"}} {low}',
+        f'mcp_eval_accuracy_ci95{{bound="upper"}} {high}',
+        "# HELP mcp_eval_flaky_tasks Tasks whose trials disagree.",
+        "# TYPE mcp_eval_flaky_tasks gauge",
+        f"mcp_eval_flaky_tasks {trials['flaky_tasks']}",
+    ]
+
+
+def format_prometheus(metrics: dict[str, Any]) -> str:
+    """Metrics in Prometheus text exposition format (e.g. for a node_exporter textfile collector)."""
+    lines = [
+        "# HELP mcp_eval_tasks_total Evaluation tasks run.",
+        "# TYPE mcp_eval_tasks_total gauge",
+        f"mcp_eval_tasks_total {metrics['tasks']}",
+        "# HELP mcp_eval_tasks_correct Evaluation tasks answered correctly.",
+        "# TYPE mcp_eval_tasks_correct gauge",
+        f"mcp_eval_tasks_correct {metrics['correct']}",
+        *_prometheus_summary("mcp_eval_task_duration_seconds", "Wall time per task.", [({}, metrics["task_duration_seconds"])]),
+        *_prometheus_summary("mcp_eval_turns_per_task", "Model turns per task.", [({}, metrics["turns_per_task"])]),
+        *_prometheus_summary("mcp_eval_model_latency_seconds", "Latency of one model API call.", [({}, metrics["model_latency_seconds"])]),
+        *_prometheus_summary("mcp_eval_ttft_seconds", "Time to first streamed token of a model call.", [({}, metrics["ttft_seconds"])]),
+        *_prometheus_summary(
+            "mcp_eval_time_to_tool_use_seconds",
+            "Time until the first complete tool_use block of a streamed model call.",
+            [({}, metrics["time_to_tool_use_seconds"])],
+        ),
+        *_prometheus_summary("mcp_eval_tool_wait_seconds", "Wall time a turn waited on its tool calls.", [({}, metrics["tool_wait_seconds"])]),
+        *_prometheus_summary(
+            "mcp_eval_tool_latency_seconds",
+            "Latency of one MCP tool call.",
+            [({"tool": name}, dist) for name, dist in metrics["tool_latency_seconds"].items()],
+        ),
+        *_prometheus_summary(
+            "mcp_eval_tool_result_bytes",
+            "Size of one MCP tool result before budgeting.",
+            [({"tool": name}, dist) for name, dist in metrics["tool_result_bytes"].items()],
+        ),
+        "# HELP mcp_eval_tool_results_truncated Tool results cut to the per-result token budget.",
+        "# TYPE mcp_eval_tool_results_truncated gauge",
+        *(f'mcp_eval_tool_results_truncated{{tool="{name}"}} {dist["truncated"]}' for name, dist in metrics["tool_result_bytes"].items()),
+        "# HELP mcp_eval_tokens Tokens reported in API usage.",
+        "# TYPE mcp_eval_tokens gauge",
+        *(f'mcp_eval_tokens{{kind="{kind}"}} {count}' for kind, count in metrics["tokens"].items()),
+        "# HELP mcp_eval_tasks_by_status Tasks by how they ended (completed, timeout, turn_limit, error).",
+        "# TYPE mcp_eval_tasks_by_status gauge",
+        *(f'mcp_eval_tasks_by_status{{status="{status}"}} {count}' for status, count in sorted(metrics["task_status"].items())),
+        "# HELP mcp_eval_tool_call_failures Tool calls that raised (error) or got no response in time (timeout).",
+        "# TYPE mcp_eval_tool_call_failures gauge",
+        *(
+            f'mcp_eval_tool_call_failures{{tool="{name}",kind="{kind}"}} {counts[kind + "s"]}'
+            for name, counts in metrics["tool_failures"].items()
+            for kind in ("error", "timeout")
+        ),
+        *_prometheus_trials(metrics["trials"]),
+        "# HELP mcp_eval_reconnects Times the MCP session was rebuilt after its transport died.",
+        "# TYPE mcp_eval_reconnects gauge",
+        f"mcp_eval_reconnects {metrics['connection']['reconnects']}",
+        "# HELP mcp_eval_reconnect_downtime_seconds Time spent without a live MCP session.",
+        "# TYPE mcp_eval_reconnect_downtime_seconds gauge",
+        f"mcp_eval_reconnect_downtime_seconds {metrics['connection']['downtime_seconds']}",
+    ]
+    if metrics["cost_usd"] is not None:
+        lines += [
+            "# HELP mcp_eval_cost_usd Estimated API cost of the run from the local rate table.",
+            "# TYPE mcp_eval_cost_usd gauge",
+            f"mcp_eval_cost_usd {metrics['cost_usd']}",
+        ]
+    if metrics["budget"]:
+        lines += [
+            "# HELP mcp_eval_tasks_skipped_budget Task runs not started because the token or cost budget was spent.",
+            "# TYPE mcp_eval_tasks_skipped_budget gauge",
+            f"mcp_eval_tasks_skipped_budget {metrics['budget']['skipped']}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(
+    records: list[dict[str, Any]],
+    metrics_path: Path | None = None,
+    prometheus_path: Path | None = None,
+) -> None:
+    """Write run metrics as JSON and/or Prometheus text format."""
+    if metrics_path is None and prometheus_path is None:
+        return
+    metrics = compute_metrics(_latest_results(records), _run_record(records))
+    if metrics_path is not None:
+        metrics_path.write_text(json.dumps(metrics, indent=2))
+        print(f"📈 Metrics saved to {metrics_path}")
+    if prometheus_path is not None:
+        prometheus_path.write_text(format_prometheus(metrics))
+        print(f"📈 Prometheus metrics saved to {prometheus_path}")
+
+
+def task_key(qa_pair: dict[str, Any]) -> str:
+    """Identity of an evaluation task in a results file: hash of its question and answer."""
+    digest = hashlib.sha256(f"{qa_pair['question']}\0{qa_pair['answer']}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def eval_digest(task_keys: Any) -> str:
+    """Identity of an evaluation file in the run history: hash of its tasks, not its formatting."""
+    return hashlib.sha256("\n".join(sorted(set(task_keys))).encode("utf-8")).hexdigest()[:16]
+
+
+def load_results(results_path: Path) -> list[dict[str, Any]]:
+    """Read a JSONL results file, skipping a partially written last line."""
+    if not results_path.exists():
+        return []
+    records = []
+    for line in results_path.read_text().splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def _append_result(results_path: Path, record: dict[str, Any]) -> None:
+    with results_path.open("a") as f:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+
+
+def _latest_results(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Latest record per task and trial (a resumed run may have rerun some), in evaluation file order."""
+    latest = {(record["task_key"], record.get("trial", 0)): record for record in records if record.get("type") != "run"}
+    return sorted(latest.values(), key=lambda r: (r["task_index"], r.get("trial", 0)))
+
+
+def _run_record(records: list[dict[str, Any]]) -> dict[str, Any]:
+    return next((record for record in reversed(records) if record.get("type") == "run"), {})
+
+
+def _describe_budgets(metrics: dict[str, Any]) -> str:
+    """Tasks stopped by a budget and tool calls that timed out, kept apart from tool errors."""
+    stopped = metrics["task_status"]
+    parts = [
+        f"{stopped.get('timeout', 0)} tasks timed out",
+        f"{stopped.get('turn_limit', 0)} hit the turn limit",
+        f"{metrics['tool_timeouts']} tool calls timed out",
+        f"{metrics['tool_errors']} tool calls failed",
+    ]
+    if stopped.get("error"):
+        parts.append(f"{stopped['error']} tasks failed with an error")
+    budget = metrics["budget"]
+    if budget and budget["skipped"]:
+        parts.append(f"{budget['skipped']} task runs not started (run budget spent)")
+    return ", ".join(parts)
+
+
+TASK_STATUS = {"timeout": " ⏱️ task timed out", "turn_limit": " 🔁 turn limit reached", "error": " 💥 task failed"}
+
+
+def _describe_reconnects(connection: dict[str, Any]) -> str:
+    if not connection["reconnects"] and not connection["replacements"]:
+        return "none"
+    parts = [f"{connection['reconnects']} ({connection['downtime_seconds']:.2f}s without a session)"]
+    if connection["replacements"]:
+        parts.append(f"{connection['replacements']} pooled sessions replaced")
+    return ", ".join(parts)
+
+
+def record_history(records: list[dict[str, Any]], history_path: Path | None) -> None:
+    """Add the run to the SQLite history store (see history.py)."""
+    if history_path is None:
+        return
+    results = _latest_results(records)
+    run = {"eval_digest": eval_digest(r["task_key"] for r in results), **_run_record(records)}
+    run_id = record_run(history_path, run, results, compute_metrics(results, run))
+    print(f"🗄️  Run {run_id} added to {history_path}")
+
+
+def render_report(records: list[dict[str, Any]]) -> str:
+    """Build the markdown report from results records alone."""
+    run = _run_record(records)
+    results = _latest_results(records)
+    metrics = compute_metrics(results, run)
+    tokens = metrics["tokens"]
+    turns = metrics["turns_per_task"]
 
     correct = sum(r["score"] for r in results)
     accuracy = (correct / len(results)) * 100 if results else 0
@@ -252,26 +1160,228 @@ async def run_evaluation(
         average_duration_s=average_duration_s,
         average_tool_calls=average_tool_calls,
         total_tool_calls=total_tool_calls,
+        tool_schema=run.get("tool_schema", "unknown (run did not finish)"),
+        prompt_cache=_describe_prompt_cache(results, any(r.get("prompt_cache") for r in results)),
+        turns_per_task=f"mean {turns['mean']:.1f}, p50 {turns['p50']:.0f}, p90 {turns['p90']:.0f}, max {turns['max']:.0f}",
+        tokens=(
+            f"{tokens['input'] + tokens['cache_creation_input'] + tokens['cache_read_input']:,} input "
+            f"({tokens['cache_read_input']:,} cache read, {tokens['cache_creation_input']:,} cache write), "
+            f"{tokens['output']:,} output"
+        ),
+        cost=_describe_cost(metrics, run.get("model")),
+        reconnects=_describe_reconnects(metrics["connection"]),
+        budgets=_describe_budgets(metrics),
+        latency_table=_latency_table(metrics),
+        payload_table=_payload_table(metrics),
+        costly_table=_costly_table(metrics),
+        trials_section=_trials_section(metrics["trials"]),
     )
 
     report += "".join([
         TASK_TEMPLATE.format(
-            task_num=i + 1,
-            question=qa_pair["question"],
-            expected_answer=qa_pair["answer"],
+            task_num=f"{result['task_index'] + 1} (trial {result['trial'] + 1})" if metrics["trials"] else result["task_index"] + 1,
+            question=result["question"],
+            expected_answer=result["expected"],
             actual_answer=result["actual"] or "N/A",
-            correct_indicator="✅" if result["score"] else "❌",
+            correct_indicator=("✅" if result["score"] else "❌") + TASK_STATUS.get(result.get("status"), "")
+            + (f" (`{result['error']}`)" if result.get("error") else ""),
             total_duration=result["total_duration"],
+            tokens=(
+                f"{total_tokens(result['api']) - result['api']['output_tokens']:,} input "
+                f"({result['api']['cache_read_input_tokens']:,} cache read), {result['api']['output_tokens']:,} output, "
+                f"cost {_format_cost(result.get('cost_usd'))}"
+            ),
             tool_calls=json.dumps(result["tool_calls"], indent=2),
             summary=result["summary"] or "N/A",
             feedback=result["feedback"] or "N/A",
         )
-        for i, (qa_pair, result) in enumerate(zip(qa_pairs, results))
+        for result in results
     ])
 
     return report
 
 
+async def run_evaluation(
+    eval_path: Path,
+    connection: Any,
+    model: str = "claude-3-7-sonnet-20250219",
+    concurrency: int = 1,
+    tools_snapshot_dir: Path | None = None,
+    client: Any = None,
+    prompt_cache: bool = True,
+    results_path: Path | None = None,
+    resume: bool = False,
+    metrics_path: Path | None = None,
+    prometheus_path: Path | None = None,
+    stream: bool = False,
+    max_result_tokens: int = DEFAULT_MAX_TOOL_RESULT_TOKENS,
+    result_overflow: str = "truncate",
+    tool_timeout: float | None = None,
+    task_timeout: float | None = None,
+    max_turns: int = 0,
+    trials: int = 1,
+    temperature: float | None = None,
+    history_path: Path | None = None,
+    pricing: dict[str, tuple[float, float]] | None = None,
+    max_tokens_total: int = 0,
+    max_cost: float = 0.0,
+) -> str:
+    """Run evaluation with MCP server tools, up to `concurrency` tasks at a time.
+
+    With `tools_snapshot_dir`, tasks start from the last saved tool catalog while the live
+    list is fetched in the background; drift between the two is reported and the snapshot
+    is updated.
+
+    With `results_path`, each finished task is appended to that JSONL file immediately;
+    `resume` skips tasks already recorded there.
+
+    `metrics_path` / `prometheus_path` receive latency and token metrics as JSON / Prometheus text.
+
+    `tool_timeout`, `task_timeout` and `max_turns` bound each tool call and each task (see agent_loop).
+
+    With `trials` > 1 every task runs that many times (concurrently, within `concurrency`)
+    and the report adds pass@k, a confidence interval and per-task variance; `temperature`
+    is passed to the model.
+
+    With `history_path`, the finished run is added to that SQLite history store.
+
+    Each task is priced with `pricing` (default MODEL_PRICING). Once the tasks recorded so
+    far have used `max_tokens_total` tokens or `max_cost` USD, no further tasks are started;
+    tasks already running finish, so a run can overshoot by up to `concurrency` tasks.
+    Skipped tasks are not recorded, so `resume` with a larger budget picks them up.
+    """
+    print("🚀 Starting Evaluation")
+
+    if client is None:
+        client = AsyncAnthropic(max_retries=0)
+
+    qa_pairs = parse_evaluation_file(eval_path)
+    print(f"📋 Loaded {len(qa_pairs)} evaluation tasks")
+
+    records = []
+    if results_path is not None:
+        if resume:
+            records = load_results(results_path)
+        else:
+            results_path.write_text("")
+    # Tasks that failed with an error are run again.
+    done = {
+        (record["task_key"], record.get("trial", 0))
+        for record in records
+        if record.get("type") != "run" and record.get("status") != "error"
+    }
+    pending = [
+        (i, trial, qa_pair)
+        for i, qa_pair in enumerate(qa_pairs)
+        for trial in range(trials)
+        if (task_key(qa_pair), trial) not in done
+    ]
+    if done:
+        print(f"⏭️  Resuming: {len(qa_pairs) * trials - len(pending)} task runs already recorded in {results_path}")
+
+    snapshot = load_tools_snapshot(tools_snapshot_dir, connection.server_key()) if tools_snapshot_dir else None
+    refresh = None
+    if snapshot is not None:
+        catalog = {"tools": snapshot["tools"]}
+        print(f"📋 Loaded {len(catalog['tools'])} tools from snapshot ({snapshot['saved_at']}), refreshing in background")
+
+        async def refresh_tools() -> list[dict[str, Any]]:
+            live = await connection.list_tools()
+            catalog["tools"] = live
+            return live
+
+        refresh = asyncio.create_task(refresh_tools())
+    else:
+        catalog = {"tools": await connection.list_tools()}
+        print(f"📋 Loaded {len(catalog['tools'])} tools from MCP server")
+
+    rates = model_rates(model, MODEL_PRICING if pricing is None else pricing)
+    budget = {"max_tokens_total": max_tokens_total, "max_cost": max_cost, "skipped": 0}
+
+    def budget_spent() -> bool:
+        tasks = [record for record in records if record.get("type") != "run"]
+        if max_tokens_total and sum(total_tokens(record["api"]) for record in tasks) >= max_tokens_total:
+            return True
+        return bool(max_cost) and sum(record.get("cost_usd") or 0.0 for record in tasks) >= max_cost
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_task(i: int, trial: int, qa_pair: dict[str, Any]) -> None:
+        async with semaphore:
+            if budget_spent():
+                if not budget["skipped"]:
+                    print("💸 Run budget spent; not starting the remaining tasks")
+                budget["skipped"] += 1
+                return
+            print(f"Processing task {i + 1}/{len(qa_pairs)}" + (f" (trial {trial + 1}/{trials})" if trials > 1 else ""))
+            # Tasks pick up the live catalog as soon as the background refresh lands.
+            result = await evaluate_single_task(
+                client,
+                model,
+                qa_pair,
+                catalog["tools"],
+                connection,
+                i,
+                prompt_cache=prompt_cache,
+                stream=stream,
+                max_result_tokens=max_result_tokens,
+                result_overflow=result_overflow,
+                tool_timeout=tool_timeout,
+                task_timeout=task_timeout,
+                max_turns=max_turns,
+                temperature=temperature,
+            )
+        record = {
+            "type": "task",
+            "task_key": task_key(qa_pair),
+            "task_index": i,
+            "trial": trial,
+            "prompt_cache": prompt_cache,
+            **result,
+            "cost_usd": usage_cost(result["api"], rates),
+        }
+        records.append(record)
+        if results_path is not None:
+            _append_result(results_path, record)
+
+    await asyncio.gather(*(run_task(i, trial, qa_pair) for i, trial, qa_pair in pending))
+
+    if refresh is not None:
+        live_tools = await refresh
+        drift = _describe_drift(snapshot, live_tools, connection.server_info)
+        if drift:
+            tool_schema = f"⚠️ drifted from snapshot ({drift}); early tasks may have used the stale schema"
+            print(f"⚠️ Tool schema drifted from snapshot: {drift}")
+        else:
+            tool_schema = "matches snapshot"
+    else:
+        live_tools = catalog["tools"]
+        tool_schema = "live (no snapshot)"
+    if tools_snapshot_dir:
+        save_tools_snapshot(tools_snapshot_dir, connection.server_key(), live_tools, connection.server_info)
+
+    server_info = connection.server_info
+    run_record = {
+        "type": "run",
+        "model": model,
+        "tool_schema": tool_schema,
+        "connection": connection.reconnect_stats(),
+        "finished_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "server": {"name": server_info.name, "version": server_info.version} if server_info else None,
+        "eval_file": str(eval_path),
+        "eval_digest": eval_digest(task_key(qa_pair) for qa_pair in qa_pairs),
+    }
+    if max_tokens_total or max_cost:
+        run_record["budget"] = budget
+    records.append(run_record)
+    if results_path is not None:
+        _append_result(results_path, run_record)
+
+    write_metrics(records, metrics_path, prometheus_path)
+    record_history(records, history_path)
+    return render_report(records)
+
+
 def parse_headers(header_list: list[str]) -> dict[str, str]:
     """Parse header strings in format 'Key: Value' into a dictionary."""
     headers = {}
@@ -302,6 +1412,14 @@ def parse_env_vars(env_list: list[str]) -> dict[str, str]:
     return env
 
 
+def _write_report(report: str, output: Path | None) -> None:
+    if output:
+        output.write_text(report)
+        print(f"\n✅ Report saved to {output}")
+    else:
+        print("\n" + report)
+
+
 async def main():
     parser = argparse.ArgumentParser(
         description="Evaluate MCP servers using test questions",
@@ -319,7 +1437,7 @@ Examples:
         """,
     )
 
-    parser.add_argument("eval_file", type=Path, help="Path to evaluation XML file")
+    parser.add_argument("eval_file", type=Path, nargs="?", help="Path to evaluation XML file")
     parser.add_argument("-t", "--transport", choices=["stdio", "sse", "http"], default="stdio", help="Transport type (default: stdio)")
     parser.add_argument("-m", "--model", default="claude-3-7-sonnet-20250219", help="Claude model to use (default: claude-3-7-sonnet-20250219)")
 
@@ -333,40 +1451,130 @@ Examples:
     remote_group.add_argument("-H", "--header", nargs="+", dest="headers", help="HTTP headers in 'Key: Value' format (sse/http only)")
 
     parser.add_argument("-o", "--output", type=Path, help="Output file for evaluation report (default: stdout)")
+    parser.add_argument("--pool-size", type=int, default=1, help="Open N server sessions and lease one per task (default: 1)")
+    parser.add_argument("-j", "--concurrency", type=int, default=1, help="Number of tasks to run in parallel (default: 1)")
+    parser.add_argument("--tools-snapshot-dir", type=Path, default=DEFAULT_TOOLS_SNAPSHOT_DIR, help=f"Where tool catalog snapshots are kept (default: {DEFAULT_TOOLS_SNAPSHOT_DIR})")
+    parser.add_argument("--no-tools-snapshot", action="store_true", help="Always wait for the live tool list and don't save a snapshot")
+
+    parser.add_argument("--results", type=Path, help="Append each finished task to this JSONL file as it completes")
+    parser.add_argument("--resume", action="store_true", help="Skip tasks already recorded in --results")
+    parser.add_argument("--render-only", action="store_true", help="Build the report from --results without running anything")
+    parser.add_argument("--metrics-json", type=Path, help="Write latency/token metrics (p50/p90/p99 per tool, model vs tool time) as JSON")
+    parser.add_argument("--prometheus", type=Path, help="Write the same metrics in Prometheus text format")
+    parser.add_argument("--history", type=Path, help="Add the finished run to this SQLite history store (see history.py)")
+    parser.add_argument("--stream", action="store_true", help="Stream responses; start each tool call as soon as its tool_use block is complete")
+    parser.add_argument("--max-tool-result-tokens", type=int, default=DEFAULT_MAX_TOOL_RESULT_TOKENS, help=f"Cut tool results above this many (estimated) tokens; 0 disables (default: {DEFAULT_MAX_TOOL_RESULT_TOKENS})")
+    parser.add_argument("--tool-result-overflow", choices=["truncate", "preview"], default="truncate", help="How oversized tool results are cut: keep the start, or a start+end preview (default: truncate)")
+    parser.add_argument("--no-prompt-cache", action="store_true", help="Don't mark the system prompt and tool definitions as cacheable")
+    parser.add_argument("--tool-timeout", type=float, help="Cancel a tool call after this many seconds without a response (default: no limit)")
+    parser.add_argument("--task-timeout", type=float, help="Stop a task after this many seconds of wall time (default: no limit)")
+    parser.add_argument("--max-turns", type=int, default=0, help="Stop a task after this many model turns; 0 means no limit (default: 0)")
+    parser.add_argument("--trials", type=int, default=1, help="Run every task K times and report pass@k and variance (default: 1)")
+    parser.add_argument("--temperature", type=float, help="Sampling temperature for the model (default: the API default)")
+    parser.add_argument("--max-reconnects", type=int, default=5, help="Reconnect attempts after the server connection drops; 0 disables (default: 5)")
+    parser.add_argument("--pricing", type=Path, help="JSON file of {\"model-prefix\": [input, output]} USD per million tokens, added to the built-in rates")
+    parser.add_argument("--max-tokens-total", type=int, default=0, help="Stop starting tasks once the run has used this many tokens; 0 means no limit (default: 0)")
+    parser.add_argument("--max-cost", type=float, default=0.0, help="Stop starting tasks once the run has cost this many USD; 0 means no limit (default: 0)")
+    parser.add_argument("--retry-tool-calls", action="store_true", help="Also retry tool calls not annotated read-only/idempotent after a reconnect")
+
+    cassette_group = parser.add_mutually_exclusive_group()
+    cassette_group.add_argument("--record", type=Path, metavar="CASSETTE", help="Save every model and tool exchange to a cassette file")
+    cassette_group.add_argument("--replay", type=Path, metavar="CASSETTE", help="Serve model and tool calls from a cassette instead of the API and server")
 
     args = parser.parse_args()
 
+    if (args.resume or args.render_only) and not args.results:
+        parser.error("--resume and --render-only need --results")
+
+    if args.render_only:
+        if not args.results.exists():
+            print(f"Error: Results file not found: {args.results}")
+            sys.exit(1)
+        records = load_results(args.results)
+        write_metrics(records, args.metrics_json, args.prometheus)
+        record_history(records, args.history)
+        _write_report(render_report(records), args.output)
+        return
+
+    if args.eval_file is None:
+        parser.error("the following arguments are required: eval_file")
     if not args.eval_file.exists():
         print(f"Error: Evaluation file not found: {args.eval_file}")
         sys.exit(1)
 
+    pricing = load_pricing(args.pricing)
+    if args.max_cost and model_rates(args.model, pricing) is None:
+        parser.error(f"--max-cost needs a rate for {args.model}; add one with --pricing")
+
     headers = parse_headers(args.headers) if args.headers else None
     env_vars = parse_env_vars(args.env) if args.env else None
 
-    try:
-        connection = create_connection(
-            transport=args.transport,
-            command=args.command,
-            args=args.args,
-            env=env_vars,
-            url=args.url,
-            headers=headers,
+    connection_kwargs = dict(
+        command=args.command,
+        args=args.args,
+        env=env_vars,
+        url=args.url,
+        headers=headers,
+        max_reconnect_attempts=args.max_reconnects,
+        retry_tool_calls=args.retry_tool_calls,
+    )
+    tools_snapshot_dir = None if args.no_tools_snapshot else args.tools_snapshot_dir
+
+    if args.replay:
+        if not args.replay.exists():
+            print(f"Error: Cassette not found: {args.replay}")
+            sys.exit(1)
+        cassette = Cassette(args.replay, "replay")
+        client = ReplayClient(cassette)
+        connection = ReplayConnection(cassette)
+        tools_snapshot_dir = None
+        print(f"📼 Replaying {args.replay}")
+    else:
+        try:
+            if args.pool_size > 1:
+                connection = create_connection_pool(args.pool_size, args.transport, **connection_kwargs)
+            else:
+                connection = create_connection(transport=args.transport, **connection_kwargs)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        client = AsyncAnthropic(max_retries=0)
+        if args.record:
+            cassette = Cassette(args.record, "record")
+            client = RecordingClient(client, cassette)
+            connection = RecordingConnection(connection, cassette)
+            print(f"📼 Recording to {args.record}")
+        print(f"🔗 Connecting to MCP server via {args.transport}...")
+
+    # The server starts while the first model turns run; the first tool call waits for it.
+    async with open_in_background(connection) as connection:
+        report = await run_evaluation(
+            args.eval_file,
+            connection,
+            args.model,
+            concurrency=args.concurrency,
+            tools_snapshot_dir=tools_snapshot_dir,
+            client=client,
+            prompt_cache=not args.no_prompt_cache,
+            results_path=args.results,
+            resume=args.resume,
+            metrics_path=args.metrics_json,
+            prometheus_path=args.prometheus,
+            stream=args.stream,
+            max_result_tokens=args.max_tool_result_tokens,
+            result_overflow=args.tool_result_overflow,
+            tool_timeout=args.tool_timeout,
+            task_timeout=args.task_timeout,
+            max_turns=args.max_turns,
+            trials=max(1, args.trials),
+            temperature=args.temperature,
+            history_path=args.history,
+            pricing=pricing,
+            max_tokens_total=args.max_tokens_total,
+            max_cost=args.max_cost,
         )
-    except ValueError as e:
-        print(f"Error: {e}")
-        sys.exit(1)
-
-    print(f"🔗 Connecting to MCP server via {args.transport}...")
 
-    async with connection:
-        print("✅ Connected successfully")
-        report = await run_evaluation(args.eval_file, connection, args.model)
-
-        if args.output:
-            args.output.write_text(report)
-            print(f"\n✅ Report saved to {args.output}")
-        else:
-            print("\n" + report)
+    _write_report(report, args.output)
 
 
 if __name__ == "__main__":
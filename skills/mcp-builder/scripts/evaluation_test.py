@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from contextlib import asynccontextmanager
+
+from evaluation import evaluate_single_task
+from mock_model import ScriptedClient
+
+
+class FailingSession:
+    """Stands in for an MCP session whose every tool call raises."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def call_tool_result(self, name, arguments, timeout=None):
+        self.calls += 1
+        raise RuntimeError("tool exploded")
+
+    @asynccontextmanager
+    async def lease(self):
+        yield self
+
+
+class FailAfter(ScriptedClient):
+    """ScriptedClient whose model call fails once `limit` calls have succeeded."""
+
+    def __init__(self, limit, **kwargs):
+        super().__init__(**kwargs)
+        create = self.messages.create
+
+        async def limited_create(**request):
+            if self.messages.calls >= limit:
+                raise RuntimeError("API unavailable")
+            return await create(**request)
+
+        self.messages.create = limited_create
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+class TestTaskErrors(unittest.TestCase):
+
+    def test_error_keeps_tokens_spent(self):
+        """Tokens spent before a task fails stay on its record, so cost and budgets count them"""
+        session = FailingSession()
+        client = FailAfter(2, turns=3)
+        qa_pair = {"question": "What is the key?", "answer": "mock"}
+        result = asyncio.run(
+            evaluate_single_task(client, "mock-model", qa_pair, [], session, 0, prompt_cache=False)
+        )
+        self.assertEqual(result["status"], "error")
+        self.assertIn("API unavailable", result["error"])
+        self.assertEqual(session.calls, 2)
+        self.assertEqual(result["api"]["calls"], 2)
+        self.assertEqual(len(result["api"]["turns"]), 2)
+        self.assertGreater(result["api"]["input_tokens"], 0)
+        self.assertGreater(result["api"]["output_tokens"], 0)
+        self.assertEqual(result["tool_calls"]["lookup"]["errors"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
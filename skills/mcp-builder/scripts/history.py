@@ -0,0 +1,379 @@
+"""Evaluation Run History
+
+Keeps every evaluation run in a local SQLite database, keyed by server version, model,
+evaluation file digest and timestamp, and renders a static HTML dashboard of accuracy,
+tool latency percentiles and token usage over time. Differences between the last two
+runs of each series are tested for statistical significance, and regressions are
+highlighted.
+"""
+
+import argparse
+import datetime as dt
+import html
+import json
+import math
+import sqlite3
+import statistics
+import sys
+from pathlib import Path
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    finished_at TEXT NOT NULL,
+    server_name TEXT,
+    server_version TEXT,
+    model TEXT NOT NULL,
+    eval_file TEXT,
+    eval_digest TEXT NOT NULL,
+    tasks INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    metrics TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task_key TEXT NOT NULL,
+    trial INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    tokens INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    tool TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_series ON runs (server_name, model, eval_digest, finished_at);
+CREATE INDEX IF NOT EXISTS task_results_run ON task_results (run_id);
+CREATE INDEX IF NOT EXISTS tool_calls_run ON tool_calls (run_id, tool);
+"""
+
+# Two-sided p-value below which a difference between the last two runs is reported.
+SIGNIFICANCE_LEVEL = 0.05
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+
+def _task_tokens(result: dict[str, Any]) -> int:
+    api = result["api"]
+    return (
+        api["input_tokens"] + api["cache_creation_input_tokens"] + api["cache_read_input_tokens"] + api["output_tokens"]
+    )
+
+
+def record_run(db_path: Path, run: dict[str, Any], results: list[dict[str, Any]], metrics: dict[str, Any]) -> int:
+    """Store one finished run (its run record, task results and metrics); returns the run id."""
+    server = run.get("server") or {}
+    tokens = metrics["tokens"]
+    with connect(db_path) as db:
+        cursor = db.execute(
+            "INSERT INTO runs (finished_at, server_name, server_version, model, eval_file, eval_digest,"
+            " tasks, correct, input_tokens, output_tokens, metrics) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run.get("finished_at") or dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+                server.get("name"),
+                server.get("version"),
+                run.get("model", "unknown"),
+                run.get("eval_file"),
+                run["eval_digest"],
+                metrics["tasks"],
+                metrics["correct"],
+                tokens["input"] + tokens["cache_creation_input"] + tokens["cache_read_input"],
+                tokens["output"],
+                json.dumps(metrics),
+            ),
+        )
+        run_id = cursor.lastrowid
+        db.executemany(
+            "INSERT INTO task_results VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, r["task_key"], r.get("trial", 0), r["score"], r["total_duration"], _task_tokens(r))
+                for r in results
+            ],
+        )
+        db.executemany(
+            "INSERT INTO tool_calls VALUES (?, ?, ?)",
+            [
+                (run_id, name, duration)
+                for r in results
+                for name, tool in r["tool_calls"].items()
+                for duration in tool["durations"]
+            ],
+        )
+    db.close()
+    return run_id
+
+
+def load_series(db: sqlite3.Connection) -> dict[tuple[str, str, str], list[dict[str, Any]]]:
+    """Runs grouped by (server name, model, eval digest), oldest first, with their samples."""
+    series: dict[tuple[str, str, str], list[dict[str, Any]]] = {}
+    for row in db.execute("SELECT * FROM runs ORDER BY finished_at, id"):
+        run = dict(row)
+        run["scores"] = [r["score"] for r in db.execute("SELECT score FROM task_results WHERE run_id = ?", (run["id"],))]
+        run["task_tokens"] = [r["tokens"] for r in db.execute("SELECT tokens FROM task_results WHERE run_id = ?", (run["id"],))]
+        run["tool_durations"] = {}
+        for r in db.execute("SELECT tool, duration FROM tool_calls WHERE run_id = ?", (run["id"],)):
+            run["tool_durations"].setdefault(r["tool"], []).append(r["duration"])
+        key = (run["server_name"] or "unknown server", run["model"], run["eval_digest"])
+        series.setdefault(key, []).append(run)
+    return series
+
+
+def _normal_p(z: float) -> float:
+    """Two-sided p-value of a standard normal statistic."""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def two_proportion_p(c1: int, n1: int, c2: int, n2: int) -> float:
+    """Two-sided p-value that two pass rates differ (pooled z-test)."""
+    if not n1 or not n2:
+        return 1.0
+    pooled = (c1 + c2) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    return _normal_p((c2 / n2 - c1 / n1) / se) if se else 1.0
+
+
+def mann_whitney_p(a: list[float], b: list[float]) -> float:
+    """Two-sided p-value that two samples come from different distributions.
+
+    Mann-Whitney U with the normal approximation and tie correction; no assumption that
+    latencies are normally distributed.
+    """
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return 1.0
+    ranked = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t**3 - t
+        i = j + 1
+    u1 = sum(rank for rank, (_, group) in zip(ranks, ranked) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    return _normal_p((u1 - n1 * n2 / 2) / math.sqrt(variance)) if variance > 0 else 1.0
+
+
+def _quantile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[round(q * 100) - 1]
+
+
+def compare_runs(previous: dict[str, Any], latest: dict[str, Any]) -> list[dict[str, Any]]:
+    """Significant changes from `previous` to `latest`: accuracy, per-tool latency, tokens per task."""
+    findings = []
+    p = two_proportion_p(sum(previous["scores"]), len(previous["scores"]), sum(latest["scores"]), len(latest["scores"]))
+    before = sum(previous["scores"]) / len(previous["scores"]) if previous["scores"] else 0.0
+    after = sum(latest["scores"]) / len(latest["scores"]) if latest["scores"] else 0.0
+    if p < SIGNIFICANCE_LEVEL:
+        findings.append({
+            "metric": "accuracy",
+            "before": f"{before * 100:.1f}%",
+            "after": f"{after * 100:.1f}%",
+            "p": p,
+            "regression": after < before,
+        })
+
+    for tool in sorted(set(previous["tool_durations"]) & set(latest["tool_durations"])):
+        a, b = previous["tool_durations"][tool], latest["tool_durations"][tool]
+        p = mann_whitney_p(a, b)
+        if p < SIGNIFICANCE_LEVEL:
+            findings.append({
+                "metric": f"{tool} latency (p50)",
+                "before": f"{statistics.median(a) * 1000:.0f} ms",
+                "after": f"{statistics.median(b) * 1000:.0f} ms",
+                "p": p,
+                "regression": statistics.median(b) > statistics.median(a),
+            })
+
+    p = mann_whitney_p(previous["task_tokens"], latest["task_tokens"])
+    if p < SIGNIFICANCE_LEVEL:
+        a, b = statistics.median(previous["task_tokens"]), statistics.median(latest["task_tokens"])
+        findings.append({
+            "metric": "tokens per task (p50)",
+            "before": f"{a:,.0f}",
+            "after": f"{b:,.0f}",
+            "p": p,
+            "regression": b > a,
+        })
+    return findings
+
+
+COLORS = ["#2563eb", "#dc2626", "#16a34a", "#9333ea", "#ea580c", "#0891b2", "#4b5563"]
+
+
+def _svg_chart(title: str, labels: list[str], lines: dict[str, list[float]], unit: str) -> str:
+    """Line chart as inline SVG; each point has a tooltip with its run label and value."""
+    width, height, pad, legend = 600, 200, 40, 130
+    values = [v for points in lines.values() for v in points]
+    top = max(values, default=0) * 1.1 or 1
+    step = (width - 2 * pad - legend) / max(len(labels) - 1, 1)
+
+    def xy(i: int, v: float) -> tuple[float, float]:
+        return pad + i * step, height - pad - v / top * (height - 2 * pad)
+
+    parts = [
+        f'<svg viewBox="0 0 {width} {height}" width="{width}" height="{height}" role="img">',
+        f'<text x="{pad}" y="16" class="title">{html.escape(title)}</text>',
+        f'<line x1="{pad}" y1="{height - pad}" x2="{width - pad - legend}" y2="{height - pad}" class="axis"/>',
+        f'<text x="4" y="{pad}" class="tick">{top:.3g}{html.escape(unit)}</text>',
+        f'<text x="4" y="{height - pad}" class="tick">0</text>',
+    ]
+    for n, (name, points) in enumerate(lines.items()):
+        color = COLORS[n % len(COLORS)]
+        coords = [xy(i, v) for i, v in enumerate(points)]
+        parts.append(f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{" ".join(f"{x:.1f},{y:.1f}" for x, y in coords)}"/>')
+        for (x, y), label, v in zip(coords, labels, points):
+            tip = html.escape(f"{name} — {label}: {v:.3g}{unit}")
+            parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="3" fill="{color}"><title>{tip}</title></circle>')
+        parts.append(f'<text x="{width - legend}" y="{pad + 14 * n}" class="legend" fill="{color}">{html.escape(name[:24])}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+DASHBOARD_STYLE = """
+body { font-family: system-ui, sans-serif; margin: 2rem; color: #111827; }
+section { margin-bottom: 3rem; }
+.charts { display: flex; flex-wrap: wrap; gap: 1rem; }
+svg { border: 1px solid #e5e7eb; }
+.title { font-size: 13px; font-weight: 600; }
+.tick, .legend { font-size: 11px; }
+.axis { stroke: #9ca3af; }
+table { border-collapse: collapse; margin-top: 1rem; }
+td, th { border: 1px solid #e5e7eb; padding: 0.25rem 0.6rem; text-align: left; }
+.regression { background: #fee2e2; }
+.improvement { background: #dcfce7; }
+"""
+
+
+def render_dashboard(db: sqlite3.Connection) -> str:
+    """Static HTML page with one section per (server, model, eval) series."""
+    sections = []
+    for (server, model, digest), runs in load_series(db).items():
+        labels = [f"#{r['id']} {r['server_version'] or '?'} {r['finished_at'][:16]}" for r in runs]
+        all_durations = [[d for ds in r["tool_durations"].values() for d in ds] for r in runs]
+        charts = [
+            _svg_chart(
+                "Accuracy", labels, {"accuracy": [r["correct"] / r["tasks"] * 100 if r["tasks"] else 0 for r in runs]}, "%"
+            ),
+            _svg_chart(
+                "Tool latency (all tools)",
+                labels,
+                {f"p{q}": [_quantile(d, q / 100) * 1000 for d in all_durations] for q in (50, 90, 99)},
+                " ms",
+            ),
+            _svg_chart(
+                "Tool latency p50 by tool",
+                labels,
+                {
+                    tool: [statistics.median(r["tool_durations"][tool]) * 1000 if tool in r["tool_durations"] else 0 for r in runs]
+                    for tool in sorted({tool for r in runs for tool in r["tool_durations"]})
+                },
+                " ms",
+            ),
+            _svg_chart(
+                "Tokens per task",
+                labels,
+                {
+                    "input": [r["input_tokens"] / r["tasks"] if r["tasks"] else 0 for r in runs],
+                    "output": [r["output_tokens"] / r["tasks"] if r["tasks"] else 0 for r in runs],
+                },
+                "",
+            ),
+        ]
+
+        if len(runs) >= 2:
+            findings = compare_runs(runs[-2], runs[-1])
+            if findings:
+                rows = "".join(
+                    f'<tr class="{"regression" if f["regression"] else "improvement"}">'
+                    f"<td>{html.escape(f['metric'])}</td><td>{html.escape(f['before'])}</td>"
+                    f"<td>{html.escape(f['after'])}</td><td>{f['p']:.4f}</td>"
+                    f"<td>{'regression' if f['regression'] else 'improvement'}</td></tr>"
+                    for f in findings
+                )
+                comparison = (
+                    f"<table><tr><th>Metric</th><th>Run #{runs[-2]['id']}</th><th>Run #{runs[-1]['id']}</th>"
+                    f"<th>p</th><th></th></tr>{rows}</table>"
+                )
+            else:
+                comparison = f"<p>No significant change between run #{runs[-2]['id']} and run #{runs[-1]['id']} (p &lt; {SIGNIFICANCE_LEVEL}).</p>"
+        else:
+            comparison = "<p>Only one run so far.</p>"
+
+        sections.append(
+            f"<section><h2>{html.escape(server)} · {html.escape(model)} · eval {html.escape(digest)}</h2>"
+            f"<p>{len(runs)} runs, latest {html.escape(runs[-1]['finished_at'])}"
+            f" (server version {html.escape(runs[-1]['server_version'] or 'unknown')})</p>"
+            f"<div class=\"charts\">{''.join(charts)}</div>{comparison}</section>"
+        )
+
+    body = "".join(sections) or "<p>No runs recorded yet.</p>"
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>MCP Evaluation History</title>"
+        f"<style>{DASHBOARD_STYLE}</style></head><body><h1>MCP Evaluation History</h1>{body}</body></html>"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Browse the evaluation run history written by evaluation.py --history",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # List recorded runs
+  python history.py runs eval-history.db
+
+  # Build the dashboard
+  python history.py dashboard eval-history.db -o dashboard.html
+        """,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    runs_parser = subparsers.add_parser("runs", help="List recorded runs")
+    runs_parser.add_argument("db", type=Path, help="History database")
+    dashboard_parser = subparsers.add_parser("dashboard", help="Write a static HTML dashboard")
+    dashboard_parser.add_argument("db", type=Path, help="History database")
+    dashboard_parser.add_argument("-o", "--output", type=Path, default=Path("dashboard.html"), help="Output HTML file (default: dashboard.html)")
+    args = parser.parse_args()
+
+    if not args.db.exists():
+        print(f"Error: History database not found: {args.db}")
+        sys.exit(1)
+    db = connect(args.db)
+    if args.command == "runs":
+        print("| Run | Finished | Server | Version | Model | Eval | Accuracy | Tokens |")
+        print("|---:|---|---|---|---|---|---:|---:|")
+        for r in db.execute("SELECT * FROM runs ORDER BY finished_at, id"):
+            accuracy = r["correct"] / r["tasks"] * 100 if r["tasks"] else 0
+            print(
+                f"| {r['id']} | {r['finished_at']} | {r['server_name'] or '?'} | {r['server_version'] or '?'} | "
+                f"{r['model']} | {r['eval_file'] or r['eval_digest']} | {accuracy:.1f}% | "
+                f"{r['input_tokens'] + r['output_tokens']:,} |"
+            )
+    else:
+        args.output.write_text(render_dashboard(db))
+        print(f"✅ Dashboard saved to {args.output}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
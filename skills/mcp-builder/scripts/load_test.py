@@ -0,0 +1,308 @@
+"""MCP Server Load Test
+
+Replays a trace of tool calls against an MCP server, without a model, at a fixed
+concurrency or request rate, and reports throughput, latency percentiles and error rates
+for each step so you can see where the server starts to degrade.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from itertools import cycle
+from pathlib import Path
+from typing import Any, Iterator
+
+from connections import ToolCallTimeout, create_connection, create_connection_pool
+from evaluation import parse_env_vars, parse_headers
+
+
+def load_trace(path: Path) -> list[dict[str, Any]]:
+    """Read tool calls from a trace file.
+
+    Accepts a hand-written JSONL/JSON list of {"tool": ..., "arguments": {...}} objects,
+    or a cassette recorded with `evaluation.py --record` (its call_tool entries are used).
+    """
+    text = path.read_text()
+    try:
+        items = json.loads(text)
+        if not isinstance(items, list):
+            items = [items]
+    except ValueError:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    calls = []
+    for item in items:
+        if "kind" in item:
+            if item["kind"] == "call_tool":
+                calls.append({"tool": item["request"]["name"], "arguments": item["request"]["arguments"]})
+        else:
+            calls.append({"tool": item.get("tool") or item["name"], "arguments": item.get("arguments", {})})
+    return calls
+
+
+@dataclass
+class StepResult:
+    """Outcome of one load step (one concurrency level or target rate)."""
+
+    label: str
+    duration: float
+    latencies: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+    tool_latencies: dict[str, list[float]] = field(default_factory=dict)
+    lease_waits: list[float] = field(default_factory=list)
+    reconnects: int = 0
+    replacements: int = 0
+
+    @property
+    def calls(self) -> int:
+        return len(self.latencies) + sum(self.errors.values())
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.errors.values()) / self.calls if self.calls else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "step": self.label,
+            "calls": self.calls,
+            "throughput_per_s": self.calls / self.duration if self.duration else 0.0,
+            "error_rate": self.error_rate,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "replacements": self.replacements,
+            **_latency_percentiles(self.latencies),
+            "lease_wait": _latency_percentiles(self.lease_waits),
+            "tools": {name: _latency_percentiles(values) for name, values in sorted(self.tool_latencies.items())},
+        }
+
+
+def _latency_percentiles(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "p50_ms": quantiles[49] * 1000 if quantiles else 0.0,
+        "p90_ms": quantiles[89] * 1000 if quantiles else 0.0,
+        "p99_ms": quantiles[98] * 1000 if quantiles else 0.0,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+
+async def _call(connection: Any, call: dict[str, Any], timeout: float, result: StepResult) -> None:
+    """One tool call; successful latencies and error kinds are added to `result`.
+
+    Latency is measured from when a session is leased, so time spent waiting for a free
+    pooled session is recorded apart (`lease_waits`) rather than blamed on the server.
+    """
+    queued = time.perf_counter()
+    try:
+        async with connection.lease() as session:
+            start = time.perf_counter()
+            result.lease_waits.append(start - queued)
+            response = await session.call_tool_result(call["tool"], call["arguments"], timeout)
+        if response.isError:
+            kind = "tool_error"
+        else:
+            latency = time.perf_counter() - start
+            result.latencies.append(latency)
+            result.tool_latencies.setdefault(call["tool"], []).append(latency)
+            return
+    except ToolCallTimeout:
+        kind = "timeout"
+    except Exception as e:
+        kind = type(e).__name__
+    result.errors[kind] = result.errors.get(kind, 0) + 1
+
+
+async def run_closed_loop(
+    connection: Any, calls: Iterator[dict[str, Any]], concurrency: int, duration: float, timeout: float
+) -> StepResult:
+    """`concurrency` workers each issue the next call as soon as their previous one finishes."""
+    result = StepResult(label=f"concurrency={concurrency}", duration=duration)
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            await _call(connection, next(calls), timeout, result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.duration = time.perf_counter() - start
+    return result
+
+
+async def run_open_loop(
+    connection: Any, calls: Iterator[dict[str, Any]], rate: float, duration: float, timeout: float
+) -> StepResult:
+    """Start calls at `rate` per second regardless of how fast the server answers."""
+    result = StepResult(label=f"rate={rate:g}/s", duration=duration)
+    in_flight = set()
+    start = time.perf_counter()
+    issued = 0
+    while (now := time.perf_counter()) - start < duration:
+        due = start + issued / rate
+        if due > now:
+            await asyncio.sleep(due - now)
+        task = asyncio.create_task(_call(connection, next(calls), timeout, result))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        issued += 1
+    await asyncio.gather(*in_flight)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def format_report(summaries: list[dict[str, Any]]) -> str:
+    """Markdown table of all steps; `p50 vs first` shows how latency grows with load.
+
+    Latencies are server time per call; the last column is time spent queued for a
+    pooled session, which grows when there are more callers than sessions.
+    """
+    base = summaries[0]["p50_ms"] if summaries and summaries[0]["p50_ms"] else None
+    lines = [
+        "| Step | Calls | Throughput (/s) | Errors | Reconnects | Replacements | p50 (ms) | p90 (ms) | p99 (ms) | Max (ms) | p50 vs first | Lease wait p50 / p99 (ms) |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for s in summaries:
+        errors = f"{s['error_rate'] * 100:.1f}%"
+        if s["errors"]:
+            errors += " (" + ", ".join(f"{kind}: {count}" for kind, count in s["errors"].items()) + ")"
+        growth = f"×{s['p50_ms'] / base:.2f}" if base else "—"
+        lines.append(
+            f"| {s['step']} | {s['calls']} | {s['throughput_per_s']:.1f} | {errors} | {s['reconnects']} | "
+            f"{s['replacements']} | {s['p50_ms']:.1f} | "
+            f"{s['p90_ms']:.1f} | {s['p99_ms']:.1f} | {s['max_ms']:.1f} | {growth} | "
+            f"{s['lease_wait']['p50_ms']:.1f} / {s['lease_wait']['p99_ms']:.1f} |"
+        )
+
+    # Mixed traces blend fast and slow tools; per-tool p50s show which one degrades.
+    tools = sorted({name for s in summaries for name in s["tools"]})
+    if len(tools) > 1:
+        lines += [
+            "",
+            "| Tool p50 (ms) | " + " | ".join(s["step"] for s in summaries) + " |",
+            "|---|" + "---:|" * len(summaries),
+        ]
+        for name in tools:
+            cells = [f"{s['tools'][name]['p50_ms']:.1f}" if name in s["tools"] else "—" for s in summaries]
+            lines.append(f"| `{name}` | " + " | ".join(cells) + " |")
+    return "\n".join(lines)
+
+
+def _parse_steps(value: str) -> list[float]:
+    try:
+        steps = [float(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated numbers, got {value!r}")
+    if not steps or any(step <= 0 for step in steps):
+        raise argparse.ArgumentTypeError(f"steps must be positive, got {value!r}")
+    return steps
+
+
+def _parse_concurrency(value: str) -> list[float]:
+    steps = _parse_steps(value)
+    if any(not step.is_integer() for step in steps):
+        raise argparse.ArgumentTypeError(f"concurrency levels must be whole numbers, got {value!r}")
+    return steps
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test an MCP server by replaying tool calls (no model involved)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Replay the tool calls from a recorded evaluation at 1, 4 and 16 concurrent callers
+  python load_test.py -t stdio -c python -a my_server.py --concurrency 1,4,16 run.cassette.jsonl
+
+  # Open-loop: 20 then 50 calls per second, 30 s each, against an HTTP server
+  python load_test.py -t http -u https://example.com/mcp --rate 20,50 --duration 30 trace.jsonl
+        """,
+    )
+
+    parser.add_argument("trace", type=Path, help="Trace file: JSONL of {\"tool\", \"arguments\"} or an evaluation cassette")
+    parser.add_argument("-t", "--transport", choices=["stdio", "sse", "http"], default="stdio", help="Transport type (default: stdio)")
+
+    stdio_group = parser.add_argument_group("stdio options")
+    stdio_group.add_argument("-c", "--command", help="Command to run MCP server (stdio only)")
+    stdio_group.add_argument("-a", "--args", nargs="+", help="Arguments for the command (stdio only)")
+    stdio_group.add_argument("-e", "--env", nargs="+", help="Environment variables in KEY=VALUE format (stdio only)")
+
+    remote_group = parser.add_argument_group("sse/http options")
+    remote_group.add_argument("-u", "--url", help="MCP server URL (sse/http only)")
+    remote_group.add_argument("-H", "--header", nargs="+", dest="headers", help="HTTP headers in 'Key: Value' format (sse/http only)")
+
+    load_group = parser.add_mutually_exclusive_group()
+    load_group.add_argument("--concurrency", type=_parse_concurrency, default=[1.0], help="Comma-separated concurrency levels to step through (default: 1)")
+    load_group.add_argument("--rate", type=_parse_steps, help="Comma-separated target rates in calls/s (open loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per step (default: 10)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-call deadline in seconds; late calls are cancelled (default: 30)")
+    parser.add_argument("--pool-size", type=int, default=1, help="Server sessions to spread calls over (default: 1)")
+    parser.add_argument("--max-reconnects", type=int, default=5, help="Reconnect attempts after the server connection drops; 0 disables (default: 5)")
+    parser.add_argument("--shuffle", action="store_true", help="Replay the trace in random order")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for --shuffle (default: 0)")
+    parser.add_argument("-o", "--output", type=Path, help="Also write the step results as JSON")
+
+    args = parser.parse_args()
+
+    if not args.trace.exists():
+        print(f"Error: Trace file not found: {args.trace}")
+        sys.exit(1)
+    trace = load_trace(args.trace)
+    if not trace:
+        print(f"Error: No tool calls in {args.trace}")
+        sys.exit(1)
+    if args.shuffle:
+        random.Random(args.seed).shuffle(trace)
+
+    connection_kwargs = dict(
+        command=args.command,
+        args=args.args,
+        env=parse_env_vars(args.env) if args.env else None,
+        url=args.url,
+        headers=parse_headers(args.headers) if args.headers else None,
+        max_reconnect_attempts=args.max_reconnects,
+    )
+    try:
+        if args.pool_size > 1:
+            connection = create_connection_pool(args.pool_size, args.transport, **connection_kwargs)
+        else:
+            connection = create_connection(transport=args.transport, **connection_kwargs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"🔗 Connecting to MCP server via {args.transport}...")
+    summaries = []
+    async with connection:
+        print(f"📋 Replaying {len(trace)} traced calls")
+        calls = cycle(trace)
+        for step in args.rate or args.concurrency:
+            before = connection.reconnect_stats()
+            if args.rate:
+                result = await run_open_loop(connection, calls, step, args.duration, args.timeout)
+            else:
+                result = await run_closed_loop(connection, calls, int(step), args.duration, args.timeout)
+            after = connection.reconnect_stats()
+            result.reconnects = after["reconnects"] - before["reconnects"]
+            result.replacements = after.get("replacements", 0) - before.get("replacements", 0)
+            summary = result.summary()
+            summaries.append(summary)
+            print(
+                f"  {summary['step']}: {summary['throughput_per_s']:.1f} calls/s, "
+                f"p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, "
+                f"{summary['error_rate'] * 100:.1f}% errors"
+            )
+
+    print("\n" + format_report(summaries))
+    if args.output:
+        args.output.write_text(json.dumps(summaries, indent=2))
+        print(f"\n✅ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,441 @@
+"""Evaluation Matrix
+
+Runs every combination of server, model and evaluation file in one invocation. Each
+server is connected once and each evaluation file is parsed once; all cells share them,
+and every task of every cell is scheduled under one global concurrency limit and, optionally,
+one shared limit on model API calls per second. The output
+is a single comparison report with accuracy and latency deltas against a baseline cell,
+for regression checks on server changes or model upgrades.
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import re
+import sys
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from anthropic import AsyncAnthropic
+
+from connections import create_connection, create_connection_pool, open_in_background
+from evaluation import (
+    DEFAULT_MAX_TOOL_RESULT_TOKENS,
+    compute_metrics,
+    eval_digest,
+    evaluate_single_task,
+    load_pricing,
+    model_rates,
+    parse_evaluation_file,
+    record_history,
+    render_report,
+    task_key,
+    usage_cost,
+)
+
+
+@dataclass
+class Cell:
+    """One (evaluation file, server, model) combination and its task records."""
+
+    eval_name: str
+    server: str
+    model: str
+    records: list[dict[str, Any]] = field(default_factory=list)
+
+
+def load_matrix(path: Path) -> dict[str, Any]:
+    """Read a matrix spec; eval paths are relative to the spec file.
+
+    {"servers": {"name": {"transport": "stdio", "command": ..., "args": [...], "pool_size": 1}, ...},
+     "models": ["..."], "evals": ["evaluation.xml", ...]}
+
+    Server entries take the arguments of create_connection (plus `pool_size`). The first
+    server and the first model form the baseline.
+    """
+    spec = json.loads(path.read_text())
+    if not spec.get("servers"):
+        raise ValueError(f"No servers in {path}")
+    spec["evals"] = [path.parent / e for e in spec.get("evals", [])]
+    return spec
+
+
+def eval_names(paths: list[Path]) -> dict[str, Path]:
+    """Label for each evaluation file: its stem, or parent/stem where stems collide.
+
+    The same file listed twice is run once.
+    """
+    resolved = list(dict.fromkeys(path.resolve() for path in paths))
+    stems = [path.stem for path in resolved]
+    names: dict[str, Path] = {}
+    for path in resolved:
+        name = path.stem if stems.count(path.stem) == 1 else f"{path.parent.name}/{path.stem}"
+        names[name if name not in names else str(path)] = path
+    return names
+
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second, in arrival order."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class _RateLimitedStream:
+    def __init__(self, messages: Any, limiter: RateLimiter, kwargs: dict[str, Any]):
+        self._messages = messages
+        self._limiter = limiter
+        self._kwargs = kwargs
+        self._manager = None
+
+    async def __aenter__(self):
+        await self._limiter.wait()
+        self._manager = self._messages.stream(**self._kwargs)
+        return await self._manager.__aenter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return await self._manager.__aexit__(exc_type, exc_val, exc_tb)
+
+
+class _RateLimitedMessages:
+    def __init__(self, messages: Any, limiter: RateLimiter):
+        self._messages = messages
+        self._limiter = limiter
+
+    async def create(self, **kwargs: Any) -> Any:
+        await self._limiter.wait()
+        return await self._messages.create(**kwargs)
+
+    def stream(self, **kwargs: Any) -> _RateLimitedStream:
+        return _RateLimitedStream(self._messages, self._limiter, kwargs)
+
+
+class RateLimitedClient:
+    """Async Anthropic client wrapper whose model calls (and their retries) share one RateLimiter."""
+
+    def __init__(self, client: Any, limiter: RateLimiter):
+        self._client = client
+        self.messages = _RateLimitedMessages(client.messages, limiter)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+def open_server(spec: dict[str, Any]) -> Any:
+    """Connection (or pool) for one server entry of the matrix spec."""
+    spec = dict(spec)
+    transport = spec.pop("transport", "stdio")
+    pool_size = spec.pop("pool_size", 1)
+    if pool_size > 1:
+        return create_connection_pool(pool_size, transport, **spec)
+    return create_connection(transport=transport, **spec)
+
+
+async def run_matrix(
+    spec: dict[str, Any],
+    concurrency: int = 4,
+    client: Any = None,
+    prompt_cache: bool = True,
+    stream: bool = False,
+    max_result_tokens: int = DEFAULT_MAX_TOOL_RESULT_TOKENS,
+    tool_timeout: float | None = None,
+    task_timeout: float | None = None,
+    max_turns: int = 0,
+    pricing: dict[str, tuple[float, float]] | None = None,
+    requests_per_second: float = 0.0,
+) -> list[Cell]:
+    """Run every (eval, server, model) cell, at most `concurrency` tasks at a time overall.
+
+    With `requests_per_second`, model API calls from all cells together are spaced out
+    to that rate.
+    """
+    if client is None:
+        client = AsyncAnthropic(max_retries=0)
+    if requests_per_second:
+        client = RateLimitedClient(client, RateLimiter(requests_per_second))
+    pricing = load_pricing() if pricing is None else pricing
+
+    eval_files = eval_names(spec["evals"])
+    evals = {}
+    for name, path in eval_files.items():
+        evals[name] = parse_evaluation_file(path)
+        print(f"📋 Loaded {len(evals[name])} tasks from {path}")
+
+    async with AsyncExitStack() as stack:
+        connections = {}
+        for name, server in spec["servers"].items():
+            print(f"🔗 Connecting to {name}...")
+            connections[name] = await stack.enter_async_context(open_in_background(open_server(server)))
+        names = list(connections)
+        catalogs = dict(zip(names, await asyncio.gather(*(connections[n].list_tools() for n in names))))
+
+        cells = [
+            Cell(eval_name, server, model)
+            for eval_name in evals
+            for server in spec["servers"]
+            for model in spec["models"]
+        ]
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run_task(cell: Cell, i: int, qa_pair: dict[str, Any]) -> None:
+            async with semaphore:
+                result = await evaluate_single_task(
+                    client,
+                    cell.model,
+                    qa_pair,
+                    catalogs[cell.server],
+                    connections[cell.server],
+                    i,
+                    prompt_cache=prompt_cache,
+                    stream=stream,
+                    max_result_tokens=max_result_tokens,
+                    tool_timeout=tool_timeout,
+                    task_timeout=task_timeout,
+                    max_turns=max_turns,
+                )
+            cell.records.append({
+                "type": "task",
+                "task_key": task_key(qa_pair),
+                "task_index": i,
+                "prompt_cache": prompt_cache,
+                **result,
+                "cost_usd": usage_cost(result["api"], model_rates(cell.model, pricing)),
+            })
+
+        # Task-major order, so every cell makes progress from the start.
+        longest = max((len(qa_pairs) for qa_pairs in evals.values()), default=0)
+        await asyncio.gather(*(
+            run_task(cell, i, evals[cell.eval_name][i])
+            for i in range(longest)
+            for cell in cells
+            if i < len(evals[cell.eval_name])
+        ))
+
+        finished_at = dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds")
+        for cell in cells:
+            server_info = connections[cell.server].server_info
+            cell.records.append({
+                "type": "run",
+                "model": cell.model,
+                "tool_schema": "live (no snapshot)",
+                "connection": connections[cell.server].reconnect_stats(),
+                "finished_at": finished_at,
+                # The spec's server name tells builds of the same server apart.
+                "server": {"name": cell.server, "version": server_info.version if server_info else None},
+                "eval_file": str(eval_files[cell.eval_name]),
+                "eval_digest": eval_digest(task_key(qa_pair) for qa_pair in evals[cell.eval_name]),
+            })
+    return cells
+
+
+def _metrics(cell: Cell) -> dict[str, Any]:
+    tasks = [r for r in cell.records if r["type"] == "task"]
+    return compute_metrics(sorted(tasks, key=lambda r: r["task_index"]), cell.records[-1])
+
+
+def _delta(value: float, base: float, unit: str = "") -> str:
+    return f"{value - base:+.1f}{unit}" if value != base else "—"
+
+
+def _percent_delta(value: float, base: float) -> str:
+    if not base or value == base:
+        return "—"
+    return f"{(value - base) / base * 100:+.0f}%"
+
+
+def matrix_summary(cells: list[Cell]) -> list[dict[str, Any]]:
+    """Per-cell headline metrics, with deltas against the first cell of the same eval file."""
+    rows = []
+    baselines = {}
+    for cell in cells:
+        metrics = _metrics(cell)
+        row = {
+            "eval": cell.eval_name,
+            "server": cell.server,
+            "model": cell.model,
+            "tasks": metrics["tasks"],
+            "accuracy": metrics["correct"] / metrics["tasks"] * 100 if metrics["tasks"] else 0.0,
+            "task_p50_s": metrics["task_duration_seconds"]["p50"],
+            "task_p90_s": metrics["task_duration_seconds"]["p90"],
+            "model_p50_s": metrics["model_latency_seconds"]["p50"],
+            "tool_wait_p50_s": metrics["tool_wait_seconds"]["p50"],
+            "tokens": sum(metrics["tokens"].values()),
+            "cost_usd": metrics["cost_usd"],
+            "reconnects": metrics["connection"]["reconnects"],
+            "tool_p50_s": {name: dist["p50"] for name, dist in metrics["tool_latency_seconds"].items()},
+            "scores": {r["task_index"]: r["score"] for r in cell.records if r["type"] == "task"},
+        }
+        base = baselines.setdefault(cell.eval_name, row)
+        row["baseline"] = row is base
+        row["accuracy_delta"] = row["accuracy"] - base["accuracy"]
+        row["regressed"] = sorted(i for i, s in row["scores"].items() if base["scores"].get(i) and not s)
+        row["fixed"] = sorted(i for i, s in row["scores"].items() if s and not base["scores"].get(i, 1))
+        rows.append(row)
+    return rows
+
+
+def _format_cost(cost: float | None) -> str:
+    return f"${cost:.4f}" if cost is not None else "—"
+
+
+def _cost_delta(cost: float | None, base: float | None) -> str:
+    return _percent_delta(cost, base) if cost is not None and base is not None else "—"
+
+
+def format_matrix_report(rows: list[dict[str, Any]]) -> str:
+    lines = ["# Evaluation Matrix", ""]
+    for eval_name in dict.fromkeys(row["eval"] for row in rows):
+        group = [row for row in rows if row["eval"] == eval_name]
+        base = group[0]
+        lines += [
+            f"## {eval_name}",
+            "",
+            f"Baseline: **{base['server']} / {base['model']}**",
+            "",
+            "| Server | Model | Accuracy | Δ Accuracy | Task p50 (s) | Δ | Task p90 (s) | Δ | Model p50 (s) | Tool wait p50 (s) | Tokens | Δ | Cost | Δ | Reconnects |",
+            "|---|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+        ]
+        for row in group:
+            lines.append(
+                f"| {row['server']} | {row['model']} | {row['accuracy']:.1f}% | {_delta(row['accuracy'], base['accuracy'], ' pp')} | "
+                f"{row['task_p50_s']:.2f} | {_percent_delta(row['task_p50_s'], base['task_p50_s'])} | "
+                f"{row['task_p90_s']:.2f} | {_percent_delta(row['task_p90_s'], base['task_p90_s'])} | "
+                f"{row['model_p50_s']:.2f} | {row['tool_wait_p50_s']:.2f} | "
+                f"{row['tokens']:,} | {_percent_delta(row['tokens'], base['tokens'])} | "
+                f"{_format_cost(row['cost_usd'])} | {_cost_delta(row['cost_usd'], base['cost_usd'])} | {row['reconnects']} |"
+            )
+
+        tools = sorted({name for row in group for name in row["tool_p50_s"]})
+        if tools:
+            lines += [
+                "",
+                "| Tool p50 (ms) | " + " | ".join(f"{row['server']} / {row['model']}" for row in group) + " |",
+                "|---|" + "---:|" * len(group),
+            ]
+            for name in tools:
+                cells = []
+                for row in group:
+                    if name not in row["tool_p50_s"]:
+                        cells.append("—")
+                        continue
+                    value = row["tool_p50_s"][name]
+                    change = "" if row is base or name not in base["tool_p50_s"] else f" ({_percent_delta(value, base['tool_p50_s'][name])})"
+                    cells.append(f"{value * 1000:.1f}{change}")
+                lines.append(f"| `{name}` | " + " | ".join(cells) + " |")
+
+        changes = [row for row in group if row["regressed"] or row["fixed"]]
+        if changes:
+            lines += ["", "Tasks whose result differs from the baseline:", ""]
+            for row in changes:
+                parts = []
+                if row["regressed"]:
+                    parts.append("regressed " + ", ".join(f"#{i + 1}" for i in row["regressed"]))
+                if row["fixed"]:
+                    parts.append("fixed " + ", ".join(f"#{i + 1}" for i in row["fixed"]))
+                lines.append(f"- **{row['server']} / {row['model']}**: " + "; ".join(parts))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", text).strip("-")
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Run several MCP servers x models x evaluation files in one parallel run and compare them",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Compare two server builds on one evaluation, 8 tasks in flight overall
+  python matrix.py -j 8 matrix.json -o comparison.md
+
+  # Same servers, but override the models and evaluation files from the command line
+  python matrix.py matrix.json -m claude-3-7-sonnet-20250219 claude-3-5-haiku-20241022 --eval a.xml b.xml
+        """,
+    )
+    parser.add_argument("matrix", type=Path, help="JSON matrix spec with servers, models and evals")
+    parser.add_argument("-m", "--models", nargs="+", help="Models to run (overrides the spec)")
+    parser.add_argument("--eval", nargs="+", type=Path, dest="evals", help="Evaluation files (overrides the spec)")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="Tasks in flight across all cells (default: 4)")
+    parser.add_argument("--rps", type=float, default=0.0, help="Model API calls per second across all cells; 0 means no limit (default: 0)")
+    parser.add_argument("--stream", action="store_true", help="Stream responses (see evaluation.py --stream)")
+    parser.add_argument("--no-prompt-cache", action="store_true", help="Don't mark the system prompt and tool definitions as cacheable")
+    parser.add_argument("--max-tool-result-tokens", type=int, default=DEFAULT_MAX_TOOL_RESULT_TOKENS, help=f"Per-result token budget; 0 disables (default: {DEFAULT_MAX_TOOL_RESULT_TOKENS})")
+    parser.add_argument("--tool-timeout", type=float, help="Cancel a tool call after this many seconds (default: no limit)")
+    parser.add_argument("--task-timeout", type=float, help="Stop a task after this many seconds of wall time (default: no limit)")
+    parser.add_argument("--max-turns", type=int, default=0, help="Stop a task after this many model turns; 0 means no limit (default: 0)")
+    parser.add_argument("--pricing", type=Path, help="JSON file of {\"model-prefix\": [input, output]} USD per million tokens (see evaluation.py --pricing)")
+    parser.add_argument("-o", "--output", type=Path, help="Output file for the comparison report (default: stdout)")
+    parser.add_argument("--json", type=Path, help="Also write the per-cell summary as JSON")
+    parser.add_argument("--history", type=Path, help="Add every cell to this SQLite history store (see history.py)")
+    parser.add_argument("--cell-reports", type=Path, metavar="DIR", help="Also write each cell's full evaluation report to DIR")
+    args = parser.parse_args()
+
+    if not args.matrix.exists():
+        print(f"Error: Matrix file not found: {args.matrix}")
+        sys.exit(1)
+    try:
+        spec = load_matrix(args.matrix)
+        if args.models:
+            spec["models"] = args.models
+        if args.evals:
+            spec["evals"] = args.evals
+        if not spec.get("models") or not spec["evals"]:
+            raise ValueError("The matrix needs at least one model and one evaluation file")
+        for path in spec["evals"]:
+            if not path.exists():
+                raise ValueError(f"Evaluation file not found: {path}")
+        for server in spec["servers"].values():
+            open_server(server)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    cells = await run_matrix(
+        spec,
+        concurrency=args.concurrency,
+        prompt_cache=not args.no_prompt_cache,
+        stream=args.stream,
+        max_result_tokens=args.max_tool_result_tokens,
+        tool_timeout=args.tool_timeout,
+        task_timeout=args.task_timeout,
+        max_turns=args.max_turns,
+        pricing=load_pricing(args.pricing),
+        requests_per_second=args.rps,
+    )
+    for cell in cells:
+        record_history(cell.records, args.history)
+    rows = matrix_summary(cells)
+    report = format_matrix_report(rows)
+
+    if args.cell_reports:
+        args.cell_reports.mkdir(parents=True, exist_ok=True)
+        for cell in cells:
+            path = args.cell_reports / f"{_slug(cell.eval_name)}__{_slug(cell.server)}__{_slug(cell.model)}.md"
+            path.write_text(render_report(cell.records))
+        print(f"📄 Cell reports saved to {args.cell_reports}")
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+        print(f"📈 Matrix summary saved to {args.json}")
+    if args.output:
+        args.output.write_text(report)
+        print(f"\n✅ Report saved to {args.output}")
+    else:
+        print("\n" + report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
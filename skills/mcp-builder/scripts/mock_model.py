@@ -0,0 +1,145 @@
+"""Scripted stand-in for the async Anthropic client.
+
+Plays a fixed script for every task: `turns` rounds of `tools_per_turn` parallel
+tool_use blocks, then a final answer in the format EVALUATION_PROMPT asks for. No
+network and no API key are needed, and the output is deterministic, so evaluation.py can
+be tested and benchmarked against mock_server.py in isolation.
+"""
+
+import asyncio
+import itertools
+import json
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from anthropic.types import Message
+
+CHARS_PER_TOKEN = 4
+
+
+def _question(messages: list[dict[str, Any]]) -> str:
+    first = messages[0]["content"]
+    return first if isinstance(first, str) else json.dumps(first, default=str)
+
+
+def _completed_turns(messages: list[dict[str, Any]]) -> int:
+    return sum(1 for m in messages if m["role"] == "user" and isinstance(m["content"], list))
+
+
+class ScriptedMessages:
+    """`messages.create` / `messages.stream` that follow the script."""
+
+    def __init__(
+        self,
+        turns: int,
+        tools_per_turn: int,
+        tool_name: str,
+        arguments: Callable[[str, int, int], dict[str, Any]],
+        answer: Callable[[str], str],
+        latency_s: float,
+    ):
+        self.turns = turns
+        self.tools_per_turn = tools_per_turn
+        self.tool_name = tool_name
+        self.arguments = arguments
+        self.answer = answer
+        self.latency_s = latency_s
+        self.calls = 0
+        self._ids = itertools.count()
+
+    def _reply(self, kwargs: dict[str, Any]) -> Message:
+        self.calls += 1
+        messages = kwargs["messages"]
+        question = _question(messages)
+        turn = _completed_turns(messages)
+        if turn < self.turns:
+            content = [{"type": "text", "text": f"Step {turn + 1}."}] + [
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_mock_{next(self._ids)}",
+                    "name": self.tool_name,
+                    "input": self.arguments(question, turn, i),
+                }
+                for i in range(self.tools_per_turn)
+            ]
+            stop_reason = "tool_use"
+        else:
+            text = (
+                f"<summary>Called {self.tool_name} {self.turns * self.tools_per_turn} times.</summary>"
+                f"<feedback>Scripted model; no feedback.</feedback>"
+                f"<response>{self.answer(question)}</response>"
+            )
+            content = [{"type": "text", "text": text}]
+            stop_reason = "end_turn"
+        prompt_chars = len(json.dumps([kwargs.get("system"), kwargs.get("tools"), messages], default=str))
+        return Message.model_validate({
+            "id": f"msg_mock_{next(self._ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": kwargs["model"],
+            "content": content,
+            "stop_reason": stop_reason,
+            "usage": {
+                "input_tokens": prompt_chars // CHARS_PER_TOKEN,
+                "output_tokens": len(json.dumps(content)) // CHARS_PER_TOKEN,
+            },
+        })
+
+    async def create(self, **kwargs: Any) -> Message:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return self._reply(kwargs)
+
+    def stream(self, **kwargs: Any) -> "_ScriptedStream":
+        return _ScriptedStream(self._reply(kwargs), self.latency_s)
+
+
+class _ScriptedStream:
+    """Emits the scripted message block by block, spreading the latency across blocks."""
+
+    def __init__(self, message: Message, latency_s: float):
+        self._message = message
+        self._latency_s = latency_s
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def __aiter__(self):
+        step = self._latency_s / (len(self._message.content) + 1)
+        await asyncio.sleep(step)
+        yield SimpleNamespace(type="content_block_delta", index=0)
+        for index, block in enumerate(self._message.content):
+            await asyncio.sleep(step)
+            yield SimpleNamespace(type="content_block_stop", index=index, content_block=block)
+
+    async def get_final_message(self) -> Message:
+        return self._message
+
+
+class ScriptedClient:
+    """Drop-in for AsyncAnthropic in run_evaluation(client=...).
+
+    By default each tool call is `lookup(key=...)` against mock_server.py and the final
+    answer is "mock"; pass `answer` to map questions to answers.
+    """
+
+    def __init__(
+        self,
+        turns: int = 2,
+        tools_per_turn: int = 1,
+        tool_name: str = "lookup",
+        arguments: Callable[[str, int, int], dict[str, Any]] | None = None,
+        answer: Callable[[str], str] | None = None,
+        latency_s: float = 0.0,
+    ):
+        self.messages = ScriptedMessages(
+            turns,
+            tools_per_turn,
+            tool_name,
+            arguments or (lambda question, turn, i: {"key": f"{turn}-{i}"}),
+            answer or (lambda question: "mock"),
+            latency_s,
+        )
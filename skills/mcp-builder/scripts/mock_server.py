@@ -0,0 +1,116 @@
+"""Mock MCP Server
+
+A stand-in MCP server with configurable tool latency and payload size, for testing and
+benchmarking the evaluation harness and connection code without a real backend.
+Serves over stdio or streamable HTTP.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+
+from mcp.server.fastmcp import FastMCP
+from mcp.types import ToolAnnotations
+
+
+def make_payload(key: str, size: int) -> str:
+    """Deterministic text of exactly `size` characters derived from `key`."""
+    block = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return (block * (size // len(block) + 1))[:size]
+
+
+def build_server(
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    payload_bytes: int = 256,
+    extra_tools: int = 0,
+    seed: int = 0,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    crash_after: int = 0,
+) -> FastMCP:
+    """Create the mock server.
+
+    Every tool call waits `latency_ms` (± uniform `jitter_ms`). `extra_tools` adds
+    that many no-op tools, to benchmark with a large tool catalog. With `crash_after`,
+    the process exits abruptly on that tool call, to exercise reconnects.
+    """
+    mcp = FastMCP("mock_mcp", host=host, port=port, log_level="WARNING")
+    rng = random.Random(seed)
+    calls = 0
+
+    async def delay() -> None:
+        nonlocal calls
+        calls += 1
+        if crash_after and calls >= crash_after:
+            os._exit(1)
+        seconds = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    # Read-only, so the harness may retry them across a reconnect.
+    read_only = ToolAnnotations(readOnlyHint=True)
+
+    @mcp.tool(annotations=read_only)
+    async def lookup(key: str) -> str:
+        """Return the record stored under `key` (a deterministic payload of fixed size)."""
+        await delay()
+        return make_payload(key, payload_bytes)
+
+    @mcp.tool(annotations=read_only)
+    async def add(a: int, b: int) -> int:
+        """Add two integers."""
+        await delay()
+        return a + b
+
+    @mcp.tool()
+    async def fail(message: str = "mock failure") -> str:
+        """Always fail with `message` (for exercising error handling)."""
+        await delay()
+        raise ValueError(message)
+
+    for i in range(extra_tools):
+
+        async def noop(value: str = "") -> str:
+            await delay()
+            return value
+
+        mcp.add_tool(
+            noop,
+            name=f"noop_{i:03d}",
+            description=f"No-op tool #{i} that echoes `value`. Present only to enlarge the tool catalog.",
+        )
+
+    return mcp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock MCP server with configurable latency and payload size")
+    parser.add_argument("-t", "--transport", choices=["stdio", "http"], default="stdio", help="Transport type (default: stdio)")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for http (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port for http; the endpoint is /mcp (default: 8000)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay per tool call in ms (default: 0)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform ± jitter on the delay in ms (default: 0)")
+    parser.add_argument("--payload-bytes", type=int, default=256, help="Size of each lookup result (default: 256)")
+    parser.add_argument("--extra-tools", type=int, default=0, help="Number of additional no-op tools (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the jitter (default: 0)")
+    parser.add_argument("--crash-after", type=int, default=0, help="Exit abruptly on the Nth tool call (default: never)")
+    args = parser.parse_args()
+
+    server = build_server(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        payload_bytes=args.payload_bytes,
+        extra_tools=args.extra_tools,
+        seed=args.seed,
+        host=args.host,
+        port=args.port,
+        crash_after=args.crash_after,
+    )
+    server.run("streamable-http" if args.transport == "http" else "stdio")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,18 +4,51 @@ Excel Formula Recalculation Script
 Recalculates all formulas in an Excel file using LibreOffice
 """
 
+import argparse
 import json
 import sys
+import signal
+import socket
 import subprocess
 import os
 import platform
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
 from openpyxl import load_workbook
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-def setup_libreoffice_macro():
-    """Setup LibreOffice macro for recalculation if not already configured"""
-    if platform.system() == 'Darwin':
+# LibreOffice's Python-UNO bridge; without it every recalc starts its own soffice
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+WORKER_PROFILE_DIR = Path.home() / '.cache' / 'xlsx-recalc' / 'worker'
+WORKER_MAX_DOCUMENTS = 200  # restart soffice after this many documents to shed leaked memory
+WORKER_START_TIMEOUT = 60
+WORKER_HEALTH_TIMEOUT = 5
+BATCH_PROFILE_ROOT = Path.home() / '.cache' / 'xlsx-recalc' / 'batch'
+WORKBOOK_SUFFIXES = {'.xlsx', '.xlsm', '.xls', '.ods'}
+
+
+def setup_libreoffice_macro(user_installation=None):
+    """Setup LibreOffice macro for recalculation if not already configured
+    
+    With user_installation, the macro goes into that profile directory instead of the
+    user's default profile (see -env:UserInstallation).
+    """
+    if user_installation is not None:
+        macro_dir = os.path.join(user_installation, 'user', 'basic', 'Standard')
+    elif platform.system() == 'Darwin':
         macro_dir = os.path.expanduser('~/Library/Application Support/LibreOffice/4/user/basic/Standard')
     else:
         macro_dir = os.path.expanduser('~/.config/libreoffice/4/user/basic/Standard')
@@ -28,7 +61,7 @@ def setup_libreoffice_macro():
                 return True
     
     if not os.path.exists(macro_dir):
-        subprocess.run(['soffice', '--headless', '--terminate_after_init'], 
+        subprocess.run(['soffice', '--headless', '--terminate_after_init', *_profile_args(user_installation)], 
                       capture_output=True, timeout=10)
         os.makedirs(macro_dir, exist_ok=True)
     
@@ -50,27 +83,262 @@ def setup_libreoffice_macro():
         return False
 
 
-def recalc(filename, timeout=30):
+def _profile_args(user_installation):
+    if user_installation is None:
+        return []
+    return [f'-env:UserInstallation={Path(user_installation).absolute().as_uri()}']
+
+
+def _call_with_timeout(fn, timeout):
+    """Run fn() in a thread and return its result; raise TimeoutError if it takes longer than timeout"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = fn()
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f'LibreOffice did not respond within {timeout} seconds')
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('value')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _kill_process_group(pid, sig=signal.SIGTERM):
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _process_identity(pid):
+    """(start time, command line) of a running pid, or None if it is gone or can't be inspected"""
+    try:
+        if os.path.exists('/proc/self/stat'):
+            with open(f'/proc/{pid}/stat') as f:
+                # Field 22, counted after the parenthesised command name, which may contain spaces
+                started = f.read().rsplit(')', 1)[1].split()[19]
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+            return started, cmdline
+        if platform.system() == 'Windows':
+            return None
+        started = subprocess.run(['ps', '-o', 'lstart=', '-p', str(pid)], capture_output=True, text=True, timeout=5)
+        cmdline = subprocess.run(['ps', '-o', 'command=', '-p', str(pid)], capture_output=True, text=True, timeout=5)
+        if started.returncode != 0 or not started.stdout.strip():
+            return None
+        return started.stdout.strip(), cmdline.stdout.strip()
+    except (OSError, IndexError, subprocess.SubprocessError):
+        return None
+
+
+def _wait_for_exit(pid, proc, timeout):
+    """Whether pid exited within timeout; proc is its Popen if this process started it"""
+    if proc is not None and proc.pid == pid:
+        try:
+            proc.wait(timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            return False
+    if not hasattr(os, 'killpg'):
+        return True
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except (ProcessLookupError, PermissionError):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+class LibreOfficeWorker:
     """
-    Recalculate formulas in Excel file and report any errors
-    
-    Args:
-        filename: Path to Excel file
-        timeout: Maximum time to wait for recalculation (seconds)
-    
-    Returns:
-        dict with error locations and counts
+    A headless soffice kept running between recalcs and driven over a UNO socket
+
+    The process outlives this script: its pid, port and document count are kept in
+    worker.json in the profile directory, so the next invocation connects to it instead
+    of paying LibreOffice's multi-second cold start. It runs with its own user profile,
+    so it doesn't collide with a desktop LibreOffice. Before each document the worker
+    is health-checked; it is restarted if it stopped answering, crashed, or has
+    processed max_documents documents.
+
+    A lock file in the profile directory serialises recalc.py processes sharing the
+    worker, so two of them never restart it at once. The recorded pid is only signalled
+    while it still has the recorded start time and this profile on its command line;
+    after a reboot or pid reuse the stale state is just dropped.
     """
-    if not Path(filename).exists():
-        return {'error': f'File {filename} does not exist'}
-    
-    abs_path = str(Path(filename).absolute())
-    
-    if not setup_libreoffice_macro():
+
+    def __init__(self, profile_dir=WORKER_PROFILE_DIR, max_documents=WORKER_MAX_DOCUMENTS):
+        self.profile_dir = Path(profile_dir)
+        self.max_documents = max_documents
+        self.state_file = self.profile_dir / 'worker.json'
+        self.desktop = None
+        self.proc = None
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            self.state = json.loads(self.state_file.read_text())
+        except (OSError, ValueError):
+            self.state = {}
+
+    @contextmanager
+    def _locked(self):
+        """Hold the worker's lock file, and pick up state another process may have written"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.profile_dir / 'worker.lock', 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._load_state()
+            yield
+
+    def _owns(self, pid):
+        """Whether pid is still the soffice this worker started"""
+        if self.proc is not None and self.proc.pid == pid:
+            return self.proc.poll() is None
+        identity = _process_identity(pid)
+        if identity is None or identity[0] != self.state.get('started'):
+            return False
+        return _profile_args(self.profile_dir / 'profile')[0] in identity[1]
+
+    def _save_state(self):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.state_file.write_text(json.dumps(self.state))
+
+    def _connect(self):
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local)
+        ctx = resolver.resolve(f'uno:socket,host=127.0.0.1,port={self.state["port"]};urp;StarOffice.ComponentContext')
+        desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+        desktop.getComponents()  # a full round trip, not just an open socket
+        return desktop
+
+    def healthy(self):
+        """Whether the recorded soffice answers over UNO (connects to it if so)"""
+        if not self.state.get('port'):
+            return False
+        try:
+            self.desktop = _call_with_timeout(self._connect, WORKER_HEALTH_TIMEOUT)
+            return True
+        except Exception:
+            self.desktop = None
+            return False
+
+    def start(self):
+        """(Re)start soffice and wait until it accepts UNO connections (call with the lock held)"""
+        # A second soffice on the same profile would hand its work to the old one and exit
+        self._stop(force=not self.healthy())
+        port = _free_port()
+        cmd = [
+            'soffice', '--headless', '--invisible', '--nologo', '--nodefault', '--norestore', '--nolockcheck',
+            *_profile_args(self.profile_dir / 'profile'),
+            f'--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext',
+        ]
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, start_new_session=True)
+        self.proc = proc
+        identity = _process_identity(proc.pid)
+        self.state = {'pid': proc.pid, 'started': identity and identity[0], 'port': port, 'documents': 0}
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                self.state = {}
+                raise RuntimeError(f'soffice exited with code {proc.returncode} during startup')
+            if self.healthy():
+                self._save_state()
+                return
+            time.sleep(0.25)
+        self._stop(force=True)
+        raise RuntimeError(f'soffice did not accept UNO connections within {WORKER_START_TIMEOUT} seconds')
+
+    def stop(self, force=False):
+        """Shut down the recorded soffice, if any; force kills it without letting it clean up"""
+        with self._locked():
+            self._stop(force)
+
+    def _stop(self, force=False):
+        kill = getattr(signal, 'SIGKILL', signal.SIGTERM)
+        pid = self.state.get('pid')
+        if pid and self._owns(pid):
+            _kill_process_group(pid, kill if force else signal.SIGTERM)
+            if not _wait_for_exit(pid, self.proc, 10):
+                _kill_process_group(pid, kill)
+                _wait_for_exit(pid, self.proc, 5)
+        self.desktop = None
+        self.state = {}
+        if self.state_file.exists():
+            self.state_file.unlink()
+
+    def _recalculate(self, url, timeout):
+        def run():
+            doc = self.desktop.loadComponentFromURL(url, '_blank', 0, (PropertyValue(Name='Hidden', Value=True),))
+            if doc is None:
+                raise RuntimeError('LibreOffice could not open the file')
+            try:
+                doc.calculateAll()
+                doc.store()
+            finally:
+                doc.close(True)
+
+        try:
+            _call_with_timeout(run, timeout)
+        except TimeoutError:
+            # A hung calculation blocks the whole process; only a restart frees it
+            self._stop(force=True)
+            raise
+        finally:
+            if self.state:
+                self.state['documents'] += 1
+                self._save_state()
+
+    def recalculate(self, path, timeout=30):
+        """
+        Load, recalculate, store and close one workbook in the worker
+
+        Returns:
+            None on success, or a dict with an 'error' message
+        """
+        url = uno.systemPathToFileUrl(str(Path(path).absolute()))
+        with self._locked():
+            return self._recalculate_with_retry(url, timeout)
+
+    def _recalculate_with_retry(self, url, timeout):
+        for attempt in range(2):
+            try:
+                if self.state.get('documents', 0) >= self.max_documents or not self.healthy():
+                    self.start()
+                self._recalculate(url, timeout)
+                return None
+            except TimeoutError as e:
+                return {'error': str(e)}
+            except Exception as e:
+                # Retry once on a fresh soffice if this one died; otherwise the file is at fault
+                if attempt or self.healthy():
+                    return {'error': f'LibreOffice failed to recalculate: {e}'}
+
+
+def _recalc_one_shot(abs_path, timeout, user_installation=None):
+    """Recalculate with a soffice started just for this file; returns None or an error dict"""
+    if not setup_libreoffice_macro(user_installation):
         return {'error': 'Failed to setup LibreOffice macro'}
     
     cmd = [
-        'soffice', '--headless', '--norestore',
+        'soffice', '--headless', '--norestore', *_profile_args(user_installation),
         'vnd.sun.star.script:Standard.Module1.RecalculateAndSave?language=Basic&location=application',
         abs_path
     ]
@@ -97,7 +365,11 @@ def recalc(filename, timeout=30):
             return {'error': 'LibreOffice macro not configured properly'}
         else:
             return {'error': error_msg}
-    
+    return None
+
+
+def check_workbook(filename):
+    """Scan a recalculated workbook for Excel errors and count its formulas"""
     # Check for Excel errors in the recalculated file - scan ALL cells
     try:
         wb = load_workbook(filename, data_only=True)
@@ -155,24 +427,149 @@ def recalc(filename, timeout=30):
         return {'error': str(e)}
 
 
+def recalc(filename, timeout=30, worker=None, user_installation=None):
+    """
+    Recalculate formulas in Excel file and report any errors
+    
+    Args:
+        filename: Path to Excel file
+        timeout: Maximum time to wait for recalculation (seconds)
+        worker: LibreOfficeWorker to recalculate in; None starts soffice just for this file
+        user_installation: LibreOffice profile directory for that soffice (default: the user's)
+    
+    Returns:
+        dict with error locations and counts
+    """
+    if not Path(filename).exists():
+        return {'error': f'File {filename} does not exist'}
+    
+    abs_path = str(Path(filename).absolute())
+    
+    if worker is not None:
+        error = worker.recalculate(abs_path, timeout)
+    else:
+        error = _recalc_one_shot(abs_path, timeout, user_installation)
+    if error:
+        return error
+    
+    return check_workbook(filename)
+
+
+def find_workbooks(paths):
+    """Expand directories (recursively) into the workbooks they contain; files are kept as given"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(
+                p for p in path.rglob('*')
+                if p.suffix.lower() in WORKBOOK_SUFFIXES and not p.name.startswith('~$')
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+def recalc_batch(filenames, jobs=4, timeout=30, persistent=True, profile_root=BATCH_PROFILE_ROOT,
+                 max_documents=WORKER_MAX_DOCUMENTS):
+    """
+    Recalculate many workbooks in parallel
+    
+    Each of the `jobs` slots has its own LibreOffice profile under profile_root, so the
+    soffice instances don't collide on the user's profile (a second soffice on one
+    profile hands its work to the first and exits). A slot runs one file at a time, in a
+    LibreOfficeWorker when `persistent` and the UNO bridge is available, otherwise in a
+    soffice started per file from a profile provisioned once with the macro. Persistent
+    workers restart after max_documents files and are stopped when the batch is done.
+    
+    Yields:
+        (filename, result) pairs in completion order, results as from recalc()
+    """
+    slots = queue.Queue()
+    workers = []
+    for i in range(max(1, jobs)):
+        slot_dir = Path(profile_root) / f'slot-{i}'
+        worker = LibreOfficeWorker(slot_dir, max_documents) if persistent and uno is not None else None
+        if worker is not None:
+            workers.append(worker)
+        slots.put((worker, slot_dir / 'profile'))
+    
+    def run(filename):
+        worker, user_installation = slots.get()
+        try:
+            return filename, recalc(filename, timeout, worker, user_installation)
+        finally:
+            slots.put((worker, user_installation))
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for future in as_completed([pool.submit(run, filename) for filename in filenames]):
+                yield future.result()
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python recalc.py <excel_file> [timeout_seconds]")
-        print("\nRecalculates all formulas in an Excel file using LibreOffice")
-        print("\nReturns JSON with error details:")
-        print("  - status: 'success' or 'errors_found'")
-        print("  - total_errors: Total number of Excel errors found")
-        print("  - total_formulas: Number of formulas in the file")
-        print("  - error_summary: Breakdown by error type with locations")
-        print("    - #VALUE!, #DIV/0!, #REF!, #NAME?, #NULL!, #NUM!, #N/A")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description='Recalculates all formulas in an Excel file using LibreOffice',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Returns JSON with error details:
+  - status: 'success' or 'errors_found'
+  - total_errors: Total number of Excel errors found
+  - total_formulas: Number of formulas in the file
+  - error_summary: Breakdown by error type with locations
+    - #VALUE!, #DIV/0!, #REF!, #NAME?, #NULL!, #NUM!, #N/A
+
+When LibreOffice's Python-UNO bridge is importable, a headless soffice is kept
+running between invocations so repeat recalcs skip LibreOffice's cold start.
+Stop it with --stop-worker.
+
+With --batch, every file (directories are searched recursively) is recalculated by a
+pool of -j LibreOffice instances, each in its own profile, and one JSON object per file
+is printed as a line as soon as it finishes. The exit status is 1 if any file could not
+be recalculated.
+
+--timeout sets the per-file timeout in both modes; the positional timeout_seconds is
+still accepted for a single file.
+""",
+    )
+    parser.add_argument('excel_file', nargs='?', help='Excel file to recalculate')
+    parser.add_argument('timeout_seconds', nargs='?', type=int, help='Same as --timeout')
+    parser.add_argument('--one-shot', action='store_true', help="Start soffice just for this file instead of using the persistent worker")
+    parser.add_argument('--max-documents', type=int, default=WORKER_MAX_DOCUMENTS, help=f'Restart a worker after this many documents (default: {WORKER_MAX_DOCUMENTS})')
+    parser.add_argument('--stop-worker', action='store_true', help='Shut down the persistent worker and exit')
+    parser.add_argument('--batch', nargs='+', metavar='PATH', help='Recalculate these workbooks and directories of workbooks in parallel')
+    parser.add_argument('-j', '--jobs', type=int, default=min(4, os.cpu_count() or 1), help='LibreOffice instances for --batch (default: up to 4)')
+    parser.add_argument('--timeout', type=int, help='Maximum time to wait for each recalculation in seconds (default: 30)')
+    args = parser.parse_args()
+    if args.timeout is not None and args.timeout_seconds is not None and args.timeout != args.timeout_seconds:
+        parser.error('give the timeout either as timeout_seconds or as --timeout, not both')
+    timeout = next((t for t in (args.timeout, args.timeout_seconds) if t is not None), 30)
+
+    if args.stop_worker:
+        LibreOfficeWorker().stop()
+        return
     
-    filename = sys.argv[1]
-    timeout = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    if args.batch:
+        files = find_workbooks(args.batch)
+        failed = 0
+        for filename, result in recalc_batch(files, args.jobs, timeout, persistent=not args.one_shot,
+                                             max_documents=args.max_documents):
+            failed += 'error' in result
+            print(json.dumps({'file': str(filename), **result}), flush=True)
+        sys.exit(1 if failed else 0)
+    if not args.excel_file:
+        parser.print_help()
+        sys.exit(1)
+
+    worker = None
+    if uno is not None and not args.one_shot:
+        worker = LibreOfficeWorker(max_documents=args.max_documents)
     
-    result = recalc(filename, timeout)
+    result = recalc(args.excel_file, timeout, worker)
     print(json.dumps(result, indent=2))
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()